@@ -2,12 +2,13 @@
 
 import os
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from ask.models import Question, ChoiceSet, AskPage
 from signalbox.models import Answer
 from django.conf import settings
 import floppyforms as forms
 from signalbox.models.listeners import user_input_received
+from signalbox.wide import record_answer
 from ask.models.fields import FIELD_NAMES
 from django.utils.encoding import smart_text
 import ask.validators as valid
@@ -103,6 +104,8 @@ def save_question_response(response, reply, page=None, question=None, variable_n
         else:
             revision.comment = "Existing answers changed"
 
-    answer.save(force_save=True)  # force save because answer may be readonly if versioning off
-                                  # but we know we just created this one here
+    with transaction.atomic():
+        answer.save(force_save=True)  # force save because answer may be readonly if versioning off
+                                      # but we know we just created this one here
+        record_answer(answer)
     return answer
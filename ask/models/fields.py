@@ -85,6 +85,9 @@ class SignalboxField(object):
 
     prepend_null_choice = False
 
+    # how answers are typed in columnar exports (see signalbox.columnar)
+    export_type = "string"
+
     extra_attrs = {}
     error_messages = {'required': "An answer to this question is required."}
     choices = None
@@ -240,6 +243,7 @@ class Likert(SignalboxField, floppyforms.ChoiceField):
 
     widget = custom_widgets.InlineRadioSelect
     validators = [validators.is_int, ]
+    export_type = "category"
 
     @staticmethod
     def voice_function(*args, **kwargs):
@@ -257,6 +261,7 @@ class Slider(SignalboxField, floppyforms.IntegerField):
 
     widget = custom_widgets.SliderInput
     has_choices = False
+    export_type = "integer"
 
     @staticmethod
     def voice_function(*args, **kwargs):
@@ -281,6 +286,7 @@ class Checkboxes(SignalboxField, floppyforms.TypedMultipleChoiceField):
 
     widget = floppyforms.widgets.CheckboxSelectMultiple
     label_choices = stata.label_choices_checkboxes
+    export_type = "list"
 
     @staticmethod
     def label_choices(question):
@@ -321,6 +327,7 @@ class Pulldown(SignalboxField, floppyforms.ChoiceField):
 
     widget = floppyforms.Select
     prepend_null_choice = True
+    export_type = "category"
 
     @staticmethod
     def voice_function(*args, **kwargs):
@@ -333,6 +340,7 @@ class Date(SignalboxField, floppyforms.DateField):
     widget = floppyforms.widgets.TextInput
     input_formats = settings.DATE_INPUT_FORMATS
     has_choices = False
+    export_type = "date"
     extra_attrs = {'attrs': {'class': 'datepicker'}}
 
     @staticmethod
@@ -347,6 +355,7 @@ class DateTime(SignalboxField, floppyforms.DateTimeField):
     widget = floppyforms.widgets.TextInput
     input_formats = settings.DATETIME_INPUT_FORMATS
     has_choices = False
+    export_type = "datetime"
     extra_attrs = {'attrs': {'class': 'datetimepicker'}}
 
     @staticmethod
@@ -359,6 +368,7 @@ class Time(SignalboxField, floppyforms.TimeField):
     """Presents an html datetime-picker object. Degrades to text input."""
 
     has_choices = False
+    export_type = "time"
     extra_attrs = {'attrs': {'class': 'timepicker'}}
 
     @staticmethod
@@ -396,6 +406,7 @@ class Integer(SignalboxField, floppyforms.IntegerField):
         MaxValueValidator(int(getattr(self, 'max', sys.maxsize)))]
 
     has_choices = False
+    export_type = "integer"
     error_messages = {'invalid': _(
         "This question needs an answer in whole numbers."), }
 
@@ -408,6 +419,7 @@ class Decimal(SignalboxField, floppyforms.DecimalField):
     """Textbox to enter a number to two decimal places."""
 
     has_choices = False
+    export_type = "decimal"
 
     # xxx set these as a kwarg
     decimal_places = 2
@@ -6,16 +6,24 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Permission
 
 import selectable.forms as selectable
 from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.http import HttpResponseForbidden
+from django.shortcuts import render
 from signalbox.lookups import UserLookup, MembershipLookup
 from signalbox.utilities.linkedinline import LinkedInline
+from signalbox.utilities.paginator import EstimatedCountPaginator
 from signalbox.models import *
 from signalbox.allocation import *
+from signalbox.archive import archived_objects
+from signalbox.forms import TimeShiftForm
+from signalbox.timeshift import timeshift_study
 from .views import *
 from django.conf import settings
 
@@ -27,6 +35,48 @@ if settings.USE_VERSIONING:
 ConditionalVersionAdmin = settings.USE_VERSIONING and VersionAdmin or admin.ModelAdmin
 
 
+def _page_counts(result_list, counts):
+    """Set each count in `counts` on the objects of a changelist page, one grouped query per count."""
+
+    objects = list(result_list)
+    ids = [i.pk for i in objects]
+    for name, (model, lookup) in counts.items():
+        found = dict(model.objects.filter(**{lookup + '__in': ids}).order_by().values(
+            lookup).annotate(n=Count('pk')).values_list(lookup, 'n'))
+        for i in objects:
+            setattr(i, name, found.get(i.pk, 0))
+
+
+class ChangelistQueryMixin(object):
+    """Fetch a changelist page in a fixed number of queries, however many rows it shows.
+
+    Set list_select_related to the relations walked by list_display, and
+    changelist_counts to {attribute: (model, lookup from model to this one)}
+    for counts of related rows (read them with an admin method rather than a
+    model method which queries per row). Counts are only made for the rows
+    on the page, so the queryset used to paginate, and by the change and
+    delete views, is left unannotated. Large unfiltered tables are paginated
+    with an estimated count.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    changelist_counts = {}
+
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super(ChangelistQueryMixin, self).get_changelist(request, **kwargs)
+        counts = self.changelist_counts
+        if not counts:
+            return ChangeList
+
+        class PageCountsChangeList(ChangeList):
+            def get_results(self, request):
+                super(PageCountsChangeList, self).get_results(request)
+                _page_counts(self.result_list, counts)
+
+        return PageCountsChangeList
+
+
 class ConditionInline(admin.StackedInline):
     model = StudyCondition
     extra = 1
@@ -46,8 +96,35 @@ class StudyAdminForm(forms.ModelForm):
         return self.cleaned_data
 
 
+def timeshift_action(scope):
+    """Make an admin action which shifts observation times for the selected objects.
+
+    `scope` maps each selected object to a (Study, StudyCondition or None) tuple.
+    """
+
+    def timeshift(modeladmin, request, queryset):
+        if not request.user.has_perm('signalbox.can_add_observations'):
+            return HttpResponseForbidden("You don't have permission")
+
+        form = TimeShiftForm('apply' in request.POST and request.POST or None)
+        if form.is_valid():
+            delta = form.delta()
+            n = sum(timeshift_study(s, delta, condition=c) for s, c in map(scope, queryset))
+            messages.add_message(request, messages.WARNING,
+                "{} observations shifted by {}.".format(n, delta))
+            return None
+
+        return render(request, 'admin/signalbox/timeshift.html', {
+            'form': form, 'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME})
+
+    timeshift.short_description = "Shift times of observations without replies."
+    return timeshift
+
+
 class StudyAdmin(admin.ModelAdmin):
     save_on_top = True
+    actions = [timeshift_action(lambda study: (study, None))]
     list_filter = ['visible', 'paused', ]
     list_display = ['slug', 'visible', 'paused', 'visible_profile_fields', 'required_profile_fields']
     list_editable = ['visible', 'paused']
@@ -98,6 +175,8 @@ class StudyAdmin(admin.ModelAdmin):
                 'auto_randomise',
                 'auto_add_observations',
                 'randomisation_probability',
+                'randomisation_method',
+                'randomisation_block_sizes',
                 'show_study_condition_to_user'
             )
         }),
@@ -141,8 +220,9 @@ class ReminderInstanceInline(LinkedInline):
     exclude = ['reminder']
 
 
-class ObservationAdmin(ConditionalVersionAdmin):
+class ObservationAdmin(ChangelistQueryMixin, ConditionalVersionAdmin):
     save_on_top = True
+    list_select_related = ['dyad__user', 'created_by_script__script_type']
     date_hierarchy = 'due'
     search_fields = ['token', 'dyad__study__slug', 'dyad__user__first_name',
                      'dyad__user__last_name', 'dyad__user__username']
@@ -171,6 +251,14 @@ class ObservationAdmin(ConditionalVersionAdmin):
                              (len(obs), ", ".join([str(i[1].id) for i in obs])))
     resend_obs.short_description = "Resend these observations."
 
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # archived ObservationData is shown read-only beneath the inline
+        extra_context = extra_context or {}
+        obs = self.get_object(request, object_id)
+        if obs is not None and obs.has_archived_history():
+            extra_context['archived_data'] = archived_objects(obs, model='signalbox.ObservationData')
+        return super(ObservationAdmin, self).change_view(request, object_id, form_url, extra_context)
+
 
 class MembershipAdminForm(forms.ModelForm):
     user = selectable.AutoCompleteSelectField(lookup_class=UserLookup)
@@ -181,7 +269,7 @@ class MembershipAdminForm(forms.ModelForm):
         model = Membership
 
 
-class MembershipAdmin(admin.ModelAdmin):
+class MembershipAdmin(ChangelistQueryMixin, admin.ModelAdmin):
     """Main Admin view for managing a user once they have joined the study.
 
     Condition and study fields are set to readonly to prevent accidentally
@@ -193,6 +281,8 @@ class MembershipAdmin(admin.ModelAdmin):
     save_on_top = True
     list_display = ('user', 'active', 'questions_answered', 'study',
                     'condition', 'date_randomised')
+    list_select_related = ['user', 'study', 'condition__study']
+    changelist_counts = {'n_answers': (Answer, 'reply__observation__dyad')}
     list_filter = ('date_joined', 'study', 'user__userprofile__site',)
     search_fields = ('user__username', 'user__last_name', 'user__first_name',
                      'user__email',)
@@ -215,6 +305,9 @@ class MembershipAdmin(admin.ModelAdmin):
 
     save_on_top = True
 
+    def questions_answered(self, obj):
+        return obj.n_answers
+
 
 # Define an inline admin descriptor for UserProfile model
 # which acts a bit like a singleton
@@ -314,6 +407,7 @@ class ScoreSheetAdmin(admin.ModelAdmin):
 
 
 class StudyConditionAdmin(admin.ModelAdmin):
+    actions = [timeshift_action(lambda cond: (cond.study, cond))]
     list_display = ['tag', 'study']
     list_filter = ['study']
     filter_horizontal = ['scripts']
@@ -332,9 +426,11 @@ class ContactRecordAdmin(admin.ModelAdmin):
     readonly_fields = ['participant', 'added', 'added_by', 'reason', 'notes']
 
 
-class AnswerAdmin(ConditionalVersionAdmin):
+class AnswerAdmin(ChangelistQueryMixin, ConditionalVersionAdmin):
     date_hierarchy = 'last_modified'
     save_on_top = True
+    list_select_related = ['question', 'reply__observation__dyad__study',
+                           'reply__observation__dyad__user']
     readonly_fields = ['question', 'other_variable_name', 'reply',
                        'answer', 'choices', 'meta']
     search_fields = [
@@ -355,10 +451,11 @@ class AnswerInline(LinkedInline):
     extra = 0
 
 
-class ReplyAdmin(ConditionalVersionAdmin):
+class ReplyAdmin(ChangelistQueryMixin, ConditionalVersionAdmin):
 
     date_hierarchy = 'last_submit'
     save_on_top = True
+    list_select_related = ['user', 'observation']
     readonly_fields = ['is_preferred_reply', 'number_replies_made_for_observation', 'complete', 'observation', 'user', 'asker',
                     'last_submit', 'started', 'token']
     list_display = ['token', 'entry_method', 'user', 'complete',
@@ -381,6 +478,21 @@ class ReplyAdmin(ConditionalVersionAdmin):
         }),)
 
 
+class RandomisationSlotInline(admin.TabularInline):
+    model = RandomisationSlot
+    readonly_fields = ['sequence', 'block', 'condition', 'membership', 'allocated']
+    can_delete = False
+    max_num = 0
+
+
+class RandomisationListAdmin(admin.ModelAdmin):
+    """Lists are sealed once generated, so everything is read only."""
+    list_display = ['study', 'site', 'remaining', 'created']
+    list_filter = ['study']
+    readonly_fields = ['study', 'site', 'seed', 'block_sizes', 'created']
+    inlines = [RandomisationSlotInline]
+
+
 class ObservationDataAdmin(admin.ModelAdmin):
     list_display = ['added', 'key', 'value', 'observation']
     list_filter = ['added', 'key']
@@ -393,7 +505,14 @@ class TextMessageCallbackAdmin(admin.ModelAdmin):
     list_filter = ['status', 'likely_related_user']
 
 
+class ExportProfileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'owner', 'watermark', 'last_exported']
+    filter_horizontal = ['studies']
+    readonly_fields = ['last_exported']
+
+
 admin.site.register(TextMessageCallback, TextMessageCallbackAdmin)
+admin.site.register(ExportProfile, ExportProfileAdmin)
 admin.site.register(ObservationCreator)
 admin.site.register(Reply, ReplyAdmin)
 admin.site.register(Alert)
@@ -411,6 +530,7 @@ admin.site.register(ScriptType, )
 admin.site.register(ContactReason, )
 admin.site.register(ContactRecord, ContactRecordAdmin)
 admin.site.register(StudyCondition, StudyConditionAdmin)
+admin.site.register(RandomisationList, RandomisationListAdmin)
 admin.site.register(UserMessage, UserMessageAdmin)
 
 admin.site.unregister(Permission, )
@@ -1,18 +1,22 @@
 """Functions to allocate Memberships to a StudyCondition"""
 
-from collections import Counter
+from bisect import bisect_right
+from collections import Counter, defaultdict
 from datetime import datetime
 import random
-from django.db.models import Count
-from itertools import chain, repeat, permutations
+import uuid
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Value, When
+from signalbox.utilities.djangobits import supergetattr
+from itertools import accumulate, chain, repeat, permutations
 
 
 def weighted_choice(items):
     """Returns 1 of items: a list of tuples in the form (item, weight)"""
 
     things, weights = list(zip(*items))
-    pools = list(chain(*[list(repeat(i, w)) for i, w in items]))
-    return random.choice(list(pools))
+    cumulative = list(accumulate(weights))
+    return things[bisect_right(cumulative, random.random() * cumulative[-1])]
 
 """
 
@@ -35,27 +39,56 @@ def weighted_choice(items):
 """
 
 
-def balanced_groups_adaptive_randomisation(membership):
+def locked_allocation_counts(study):
+    """Return a list of (StudyCondition, count) for a Study, locking the counters.
+
+    Must be called inside a transaction; concurrent allocations to the same
+    Study wait here until the transaction holding the lock commits. Counters
+    missing for a condition are created from the current Membership count.
+    """
+    from signalbox.models import AllocationCounter
+
+    conditions = list(study.studycondition_set.all())
+    counters = AllocationCounter.objects.select_for_update().filter(condition__in=conditions)
+    found = set(counters.values_list('condition_id', flat=True))
+
+    for cond in conditions:
+        if cond.id not in found:
+            try:
+                with transaction.atomic():
+                    AllocationCounter.objects.create(
+                        condition=cond, count=cond.membership_set.all().count())
+            except IntegrityError:
+                # created concurrently
+                pass
+
+    counts = dict(counters.values_list('condition_id', 'count'))
+    return [(cond, counts[cond.id]) for cond in conditions]
+
+
+def balanced_groups_adaptive_randomisation(membership, counted=None):
     """Simple adaptive randomisation, balancing allocations but respecting Condition weights.
 
     The algorithm either:
         - performs weighted randomisation as normal (probability determined by randomisation_probability
           field on study model)
         - allocates to the group with the fewest participants (weighted by Condition weights)
+
+    `counted` is a list of (StudyCondition, n_allocated); see locked_allocation_counts().
     """
 
     p_randomise = membership.study.randomisation_probability
-    conditions = membership.study.studycondition_set.all()
+    counted = counted or [(cond, cond.membership_set.all().count())
+        for cond in membership.study.studycondition_set.all()]
 
     if p_randomise > random.uniform(0, 1):
         # be random
-        choices = [(i, i.weight) for i in conditions]
+        choices = [(i, i.weight) for i, _ in counted]
         choice = weighted_choice(choices)
         return choice
     else:
         # be deterministic
-        total_weight = sum([i.weight for i in conditions])
-        counted = [(cond, cond.membership_set.all().count()) for cond in conditions]
+        total_weight = sum([i.weight for i, _ in counted])
         weighted_counts = [(cond, count / (cond.weight/total_weight))
             for cond, count in counted]
         sorted_weighted = sorted(weighted_counts, key=lambda x: x[1])
@@ -64,6 +97,156 @@ def balanced_groups_adaptive_randomisation(membership):
         return has_fewest
 
 
+def permuted_blocks(conditions, multiples, seed, n_blocks):
+    """Yield (block_number, [StudyCondition]) for n_blocks permuted blocks.
+
+    Each block holds every condition `weight * m` times, where m is drawn from
+    `multiples`, in a random order. The sequence is determined by `seed`.
+    """
+
+    rng = random.Random(seed)
+    for block in range(n_blocks):
+        m = rng.choice(multiples)
+        slots = list(chain(*[repeat(c, c.weight * m) for c in conditions]))
+        rng.shuffle(slots)
+        yield (block, slots)
+
+
+def generate_randomisation_list(study, site=None, n_blocks=10, seed=None):
+    """Create, or extend by n_blocks, the RandomisationList for a Study and StudySite.
+
+    Extending regenerates the sequence from the stored seed, so a list can
+    always be reproduced from its seed, block sizes and the condition weights.
+    """
+    from signalbox.models import RandomisationList, RandomisationSlot
+
+    conditions = list(study.studycondition_set.all().order_by('id'))
+    if not conditions:
+        raise ValueError("Study does not contain any conditions")
+
+    with transaction.atomic():
+        rlist = RandomisationList.objects.select_for_update().filter(study=study, site=site).first()
+        if not rlist:
+            rlist = RandomisationList.objects.create(study=study, site=site,
+                seed=str(seed or uuid.uuid4().hex), block_sizes=study.randomisation_block_sizes)
+
+        done = rlist.randomisationslot_set.aggregate(blocks=Max('block'), seq=Max('sequence'))
+        first_block = done['blocks'] is not None and done['blocks'] + 1 or 0
+        sequence = done['seq'] or 0
+
+        multiples = [int(i) for i in rlist.block_sizes.split(",") if i.strip()]
+        slots = []
+        for block, conds in permuted_blocks(conditions, multiples, rlist.seed, first_block + n_blocks):
+            if block < first_block:
+                continue
+            for cond in conds:
+                sequence += 1
+                slots.append(RandomisationSlot(randomisation_list=rlist,
+                    sequence=sequence, block=block, condition=cond))
+        RandomisationSlot.objects.bulk_create(slots)
+
+    return rlist
+
+
+def pop_randomisation_slot(membership, attempts=5):
+    """Claim the next free slot in the Membership's stratum -> StudyCondition or None.
+
+    Each attempt is a single conditional UPDATE; it only fails (and is retried)
+    if a concurrent allocation claimed the same slot first.
+    """
+    from signalbox.models import RandomisationSlot
+
+    site = supergetattr(membership, 'user.userprofile.site', None)
+    free = RandomisationSlot.objects.filter(randomisation_list__study=membership.study,
+        randomisation_list__site=site, membership__isnull=True)
+
+    for _ in range(attempts):
+        nextslot = free.order_by('sequence').values('pk')[:1]
+        if free.filter(pk__in=nextslot).update(membership=membership, allocated=datetime.now()):
+            return RandomisationSlot.objects.get(membership=membership).condition
+        if not free.exists():
+            break
+    return None
+
+
+def allocate_from_randomisation_list(membership):
+    """Allocate a Membership using its Study's pre-generated lists -> (bool, message)."""
+
+    if not membership.pk:
+        # saving may trigger allocation by the listeners
+        membership.save()
+        if membership.condition:
+            return (True, "Added user to {}".format(membership.condition))
+
+    condition = pop_randomisation_slot(membership)
+    if not condition:
+        return (False, "No randomisation slots left for this site; generate more.")
+
+    membership.condition = condition
+    membership.date_randomised = membership.date_randomised or datetime.now()
+    membership.save()
+    return (True, "Added user to {}".format(membership.condition))
+
+
+def _slot_updates(assignments):
+    """Write (RandomisationSlot, Membership) pairs with one UPDATE per chunk."""
+    from signalbox.models import RandomisationSlot
+
+    now = datetime.now()
+    for i in range(0, len(assignments), 500):
+        chunk = assignments[i:i + 500]
+        RandomisationSlot.objects.filter(id__in=[s.id for s, _ in chunk]).update(
+            allocated=now,
+            membership=Case(*[When(id=s.id, then=Value(m.id)) for s, m in chunk],
+                output_field=IntegerField()))
+
+
+def allocate_many(study, memberships, sites=None):
+    """Allocate many saved, unallocated Memberships of a Study in one pass.
+
+    Conditions are chosen in memory (with the counters or randomisation lists
+    locked) and written with one UPDATE per condition. Must be called inside a
+    transaction. `sites` optionally maps Membership ids to StudySite ids, to
+    avoid looking up each user's profile. Raises ValueError if a randomisation
+    list runs out.
+    """
+    from signalbox.models import AllocationCounter, Membership, RandomisationSlot
+
+    now = datetime.now()
+    if study.randomisation_method == 'blocked':
+        sites = sites or dict((m.id, supergetattr(m, 'user.userprofile.site_id', None))
+            for m in memberships)
+        bysite = defaultdict(list)
+        [bysite[sites.get(m.id)].append(m) for m in memberships]
+
+        assignments = []
+        for site, mems in list(bysite.items()):
+            slots = list(RandomisationSlot.objects.select_for_update().filter(
+                randomisation_list__study=study, randomisation_list__site=site,
+                membership__isnull=True).select_related('condition').order_by('sequence')[:len(mems)])
+            if len(slots) < len(mems):
+                raise ValueError("Only {} randomisation slots left for site {}".format(len(slots), site))
+            for slot, m in zip(slots, mems):
+                m.condition = slot.condition
+                assignments.append((slot, m))
+        _slot_updates(assignments)
+    else:
+        counted = locked_allocation_counts(study)
+        for m in memberships:
+            m.condition = balanced_groups_adaptive_randomisation(m, counted)
+            counted = [(c, n + (c == m.condition)) for c, n in counted]
+
+    bycondition = defaultdict(list)
+    for m in memberships:
+        m.date_randomised = m.date_randomised or now
+        bycondition[m.condition].append(m.id)
+    for condition, ids in list(bycondition.items()):
+        Membership.objects.filter(id__in=ids).update(condition=condition, date_randomised=now)
+        AllocationCounter.objects.filter(condition=condition).update(count=F('count') + len(ids))
+
+    return memberships
+
+
 def allocate(membership):
     """Accepts a Membership and a function used to randomise to a StudyCondition. Returns a tuple
 
@@ -76,7 +259,13 @@ def allocate(membership):
     if not membership.study.studycondition_set.all():
         return (False, "Study does not contain any conditions")
 
-    membership.condition = balanced_groups_adaptive_randomisation(membership)
-    membership.date_randomised = membership.date_randomised or datetime.now()
-    membership.save()
+    if membership.study.randomisation_method == 'blocked':
+        return allocate_from_randomisation_list(membership)
+
+    with transaction.atomic():
+        # counters stay locked until the membership (and its counter) is saved
+        counted = locked_allocation_counts(membership.study)
+        membership.condition = balanced_groups_adaptive_randomisation(membership, counted)
+        membership.date_randomised = membership.date_randomised or datetime.now()
+        membership.save()
     return (True, "Added user to {}".format(membership.condition))
@@ -0,0 +1,95 @@
+"""Anonymous downloads of a questionnaire's answers, e.g. for external dashboards.
+
+Askers which allow unauthenticated download of anonymous data publish their
+answers under a secret token. stream_answers() yields them as JSON Lines,
+one Answer per line in id order, a page at a time; clients pass the last id
+they saw as ?after= for the next page (see next_cursor()).
+
+Question metadata is built from the Asker's Questions rather than its
+Answers, and cached until any questionnaire changes: listeners call
+invalidate_question_metadata(), which moves on a version number shared by
+every Asker's cache key.
+
+answer_state() gives the time the newest Answer was modified and the number
+of Answers, from one aggregate query; views derive ETag and Last-Modified
+headers from it, so clients polling with If-None-Match or If-Modified-Since
+get a 304 when nothing has changed.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from ask.models import Question
+from signalbox.models import Answer
+
+VERSION_KEY = "signalbox.anonymous.questionnaires.version"
+CACHE_KEY = "signalbox.anonymous.metadata.{}.{}"
+
+
+def asker_answers(asker):
+    return Answer.objects.filter(reply__asker=asker)
+
+
+def questionnaires_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = str(time.time())
+        cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_question_metadata():
+    cache.set(VERSION_KEY, str(time.time()), None)
+
+
+def question_metadata(asker):
+    """Return {question_id: Question.dict_for_dataframe()} for an Asker's Questions, cached."""
+
+    key = CACHE_KEY.format(asker.id, questionnaires_version())
+    metadata = cache.get(key)
+    if metadata is None:
+        questions = Question.objects.filter(page__asker=asker).select_related(
+            'choiceset').order_by('page__order', 'order')
+        metadata = [(q.id, q.dict_for_dataframe()) for q in questions]
+        cache.set(key, metadata, settings.ANONYMOUS_METADATA_CACHE_SECONDS)
+    return metadata
+
+
+def answer_state(asker):
+    """Return (time the newest Answer was modified, number of Answers) for an Asker."""
+
+    state = asker_answers(asker).aggregate(modified=Max('last_modified'), n=Count('id'))
+    return state['modified'], state['n']
+
+
+def etag(asker, state, *extra):
+    """An ETag which changes when the Asker's Answers (see answer_state()) or any questionnaire do."""
+
+    modified, n = state
+    parts = [asker.id, questionnaires_version(), modified and modified.isoformat(), n] + list(extra)
+    return hashlib.md5(":".join(str(i) for i in parts).encode('utf-8')).hexdigest()
+
+
+def next_cursor(asker, after, limit):
+    """The `after` value for the page following this one, or None if this is the last page."""
+
+    if limit < 1:
+        raise ValueError("limit must be at least 1, not {}".format(limit))
+    ids = list(asker_answers(asker).filter(id__gt=after).order_by('id').values_list(
+        'id', flat=True)[limit - 1:limit + 1])
+    return len(ids) == 2 and ids[0] or None
+
+
+def stream_answers(asker, after=0, limit=None):
+    """Yield one JSON line per Answer with id greater than `after`, at most `limit` of them."""
+
+    limit = limit or settings.ANONYMOUS_EXPORT_PAGE_SIZE
+    rows = asker_answers(asker).filter(id__gt=after).order_by('id').values_list(
+        'id', 'reply_id', 'question__variable_name', 'other_variable_name', 'answer')[:limit]
+    for pk, reply, variable, other, answer in rows.iterator():
+        yield json.dumps({'id': pk, 'reply': reply, 'variable_name': variable or other,
+            'answer': answer}) + "\n"
@@ -0,0 +1,145 @@
+"""Move old ObservationData, ReplyData and reversion history into compressed files.
+
+Rows older than a threshold are serialised as JSON lines and appended, one
+gzip member per chunk, to append-only segment files under
+settings.ARCHIVE_ROOT, partitioned by model, Study and month:
+
+    <ARCHIVE_ROOT>/<app_label.model>/<study id or 'none'>/<YYYY-MM>.jsonl.gz
+
+Each member is recorded as an ArchiveChunk, and ArchiveEntry rows index the
+objects (e.g. 'signalbox.observation.12') which have history in it, so the
+history for one object can be read back without scanning the files. Chunks
+are written and the rows deleted in the same transaction; bytes appended by
+a transaction which then rolls back are never indexed and so never read.
+
+Archiving reuses the chunking and rate limiting in signalbox.retention.
+"""
+
+from collections import OrderedDict, defaultdict
+import gzip
+import json
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from signalbox.models import ArchiveChunk, ArchiveEntry
+from signalbox.retention import RetentionPolicy
+
+
+def parent_key(instance):
+    """The key history for a model instance is indexed under, e.g. 'signalbox.observation.12'."""
+
+    return "{}.{}.{}".format(instance._meta.app_label, instance._meta.model_name, instance.pk)
+
+
+class ArchivePolicy(RetentionPolicy):
+    """A RetentionPolicy which writes rows to segment files before deleting them.
+
+    `parent` is a prefix and a list of lookups which together give the
+    parent_key() of the object each row belongs to; `study` is a lookup for
+    the Study id used to partition the files.
+    """
+
+    def __init__(self, name, model, date_field, days, parent, study=None, **kwargs):
+        super(ArchivePolicy, self).__init__(name, model, date_field, days, **kwargs)
+        self.parent_prefix, self.parent_fields = parent
+        self.study = study
+
+    def remove(self, rows):
+        fields = [self.date_field, self.study or 'pk'] + self.parent_fields
+        meta = dict((i[0], i[1:]) for i in rows.values_list('pk', *fields))
+
+        partitions = defaultdict(list)
+        for record in serializers.serialize('python', rows):
+            when, study = meta[record['pk']][:2]
+            record['parent'] = ".".join(
+                [self.parent_prefix] + [str(i) for i in meta[record['pk']][2:]]).strip(".")
+            partitions[(self.study and study, when.strftime("%Y-%m"))].append(record)
+
+        for (study, month), records in list(partitions.items()):
+            write_chunk(self.model, study, month, records)
+        rows.delete()
+
+
+def segment_path(model, study, month):
+    return os.path.join(settings.ARCHIVE_ROOT, model.lower(), str(study or "none"),
+        "{}.jsonl.gz".format(month))
+
+
+def write_chunk(model, study, month, records):
+    """Append serialised records to a segment file and index them -> ArchiveChunk."""
+
+    path = segment_path(model, study, month)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    lines = "".join(json.dumps(r, cls=DjangoJSONEncoder) + "\n" for r in records)
+    data = gzip.compress(lines.encode('utf-8'))
+    with open(path, 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    chunk = ArchiveChunk.objects.create(model=model, study_id=study, month=month, path=path,
+        offset=offset, length=len(data), rows=len(records))
+    ArchiveEntry.objects.bulk_create(
+        [ArchiveEntry(chunk=chunk, parent=p) for p in set(r['parent'] for r in records)])
+    return chunk
+
+
+def read_chunk(chunk):
+    """Return the serialised records stored in an ArchiveChunk -> [dict]."""
+
+    with open(chunk.path, 'rb') as f:
+        f.seek(chunk.offset)
+        data = gzip.decompress(f.read(chunk.length))
+    return [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+
+
+def archived_records(instance, model=None):
+    """Return archived records belonging to a model instance, oldest chunk first -> [dict].
+
+    `model` optionally restricts the result to rows of one archived model,
+    e.g. 'signalbox.ObservationData'.
+    """
+
+    key = parent_key(instance)
+    chunks = ArchiveChunk.objects.filter(archiveentry__parent=key).distinct().order_by('id')
+    if model:
+        chunks = chunks.filter(model=model)
+    return [r for chunk in chunks for r in read_chunk(chunk) if r['parent'] == key]
+
+
+def archived_objects(instance, model=None):
+    """As archived_records(), but as unsaved model instances."""
+
+    return [i.object for i in serializers.deserialize('python', archived_records(instance, model))]
+
+
+def has_archived_history(instance):
+    return ArchiveEntry.objects.filter(parent=parent_key(instance)).exists()
+
+
+def archive_policies():
+    """Return the configured ArchivePolicies, by name, skipping any without a number of days."""
+
+    policies = [
+        ArchivePolicy('observation_data', 'signalbox.ObservationData', 'added',
+            settings.ARCHIVE_OBSERVATION_DATA_DAYS,
+            parent=('signalbox.observation', ['observation_id']),
+            study='observation__dyad__study',
+            # external_id rows link observations to Twilio callbacks, so are kept
+            excludes={'key': 'external_id'}),
+        ArchivePolicy('reply_data', 'signalbox.ReplyData', 'created',
+            settings.ARCHIVE_REPLY_DATA_DAYS,
+            parent=('signalbox.reply', ['reply_id']),
+            study='reply__observation__dyad__study'),
+    ]
+    if apps.is_installed('reversion'):
+        policies.append(ArchivePolicy('versions', 'reversion.Version', 'revision__date_created',
+            settings.ARCHIVE_VERSION_DAYS,
+            parent=('', ['content_type__app_label', 'content_type__model', 'object_id'])))
+    return OrderedDict((p.name, p) for p in policies if p.days is not None)
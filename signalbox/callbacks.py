@@ -0,0 +1,85 @@
+"""Turn queued Twilio status callbacks into TextMessageCallbacks in bulk.
+
+The sms_callback view only INSERTs a PendingTextMessageCallback, so Twilio
+gets a response well within its webhook timeout even during a large SMS
+campaign. ingest_text_message_callbacks() then takes the queue in batches:
+it drops repeats of the same (sid, status), matches users and Observations
+for the whole batch at once, and bulk_creates the TextMessageCallbacks.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+from signalbox.models import (ObservationData, PendingTextMessageCallback, TextMessageCallback,
+    UserProfile)
+from signalbox.models.observation import likely_user_for_numbers
+
+
+def users_for_numbers(numbers):
+    """Map telephone numbers to user ids -> {number: user_id}.
+
+    E.164 numbers (as sent by Twilio) are matched in a single query; any left
+    over fall back to matching the last digits (see likely_user_for_numbers).
+    """
+
+    numbers = set(filter(bool, numbers))
+    matched = UserProfile.objects.filter(mobile_e164__in=numbers).order_by('-user_id')
+    users = dict(matched.values_list('mobile_e164', 'user_id'))
+    for number in numbers - set(users.keys()):
+        user = likely_user_for_numbers([number])
+        if user:
+            users[number] = user.id
+    return users
+
+
+def ingest_text_message_callbacks(batch_size=None):
+    """Save one batch of queued callbacks as TextMessageCallbacks -> (int N taken, int N saved)."""
+
+    batch_size = batch_size or settings.CALLBACK_BATCH_SIZE
+    with transaction.atomic():
+        pending = list(PendingTextMessageCallback.objects.select_for_update().order_by('id')[:batch_size])
+        if not pending:
+            return (0, 0)
+
+        sids = set(p.sid for p in pending)
+        seen = set(TextMessageCallback.objects.filter(sid__in=sids).values_list('sid', 'status'))
+        fresh = []
+        for p in pending:
+            if (p.sid, p.status) not in seen:
+                seen.add((p.sid, p.status))
+                fresh.append((p, json.loads(p.post)))
+
+        users = users_for_numbers([n for _, post in fresh for n in (post.get('From'), post.get('To'))])
+        observations = dict(ObservationData.objects.filter(key="external_id", value__in=sids)
+            .values_list('value', 'observation_id'))
+
+        TextMessageCallback.objects.bulk_create([TextMessageCallback(
+                sid=p.sid, status=p.status, post=post, observation_id=observations.get(p.sid),
+                likely_related_user_id=users.get(post.get('From')) or users.get(post.get('To')))
+            for p, post in fresh])
+        PendingTextMessageCallback.objects.filter(id__in=[p.id for p in pending]).delete()
+
+    return (len(pending), len(fresh))
+
+
+def ingest_all_text_message_callbacks(batch_size=None):
+    """Ingest batches until the queue is empty -> (int N taken, int N saved)."""
+
+    taken = saved = 0
+    while True:
+        t, s = ingest_text_message_callbacks(batch_size=batch_size)
+        if not t:
+            return (taken, saved)
+        taken, saved = taken + t, saved + s
+
+
+def run_consumer(interval=5, once=False, batch_size=None):
+    """Ingest queued callbacks every `interval` seconds, yielding (taken, saved) each round."""
+
+    while True:
+        yield ingest_all_text_message_callbacks(batch_size=batch_size)
+        if once:
+            break
+        time.sleep(interval)
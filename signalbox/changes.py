@@ -0,0 +1,191 @@
+"""Incremental exports: only the Replies which changed since an ExportProfile last ran.
+
+A delta is a directory holding, in the wide layout of signalbox.export:
+
+    answers.csv   one row per new or changed Reply, a column per variable
+    meta.csv      details of those Replies
+    deleted.csv   ids of Replies to remove
+    delta.json    the profile and the window covered
+
+A Reply has changed if any of its Answers were modified, if it was saved
+(Reply.last_submit), or if a ReplyChange was logged for it (when Answers or
+Replies are deleted, Replies are updated in bulk, their Observations are
+timeshifted, or their Membership's exported fields change). Other changes to
+Observations or Memberships which bypass save(), e.g. queryset updates,
+aren't seen until a full export. Each window starts
+settings.EXPORT_OVERLAP_SECONDS before the previous watermark so rows
+committed late by long transactions aren't missed; upserts are idempotent,
+so repeating a few is harmless.
+
+merge_deltas() applies deltas in order to a local mirror: a SQLite database,
+or a directory of Parquet files (which needs pyarrow or fastparquet).
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import json
+import os
+import sqlite3
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from signalbox.export import wide_frames
+from signalbox.models import Answer, ExportProfile, Reply, ReplyChange
+
+SQLITE_EXTENSIONS = ['.sqlite', '.sqlite3', '.db']
+TABLES = ['answers', 'meta']
+
+
+def study_replies(studies):
+    """Return a queryset of the Replies belonging to some Studies."""
+
+    return Reply.objects.filter(
+        Q(observation__dyad__study__in=studies) | Q(membership__study__in=studies))
+
+
+def log_reply_changes(reply_ids, deleted=False):
+    """Record that the exported rows of some (existing) Replies have changed."""
+
+    studies = Reply.objects.filter(id__in=reply_ids).values_list(
+        'id', 'observation__dyad__study', 'membership__study')
+    ReplyChange.objects.bulk_create([ReplyChange(reply_id=i, study_id=a or b, deleted=deleted)
+        for i, a, b in studies])
+
+
+def changed_replies(studies, since):
+    """Find Replies in some Studies which changed after `since` -> (set of ids, set of deleted ids)."""
+
+    replies = study_replies(studies)
+    changed = set(Answer.objects.filter(reply__in=replies, last_modified__gt=since).values_list(
+        'reply_id', flat=True))
+    changed.update(replies.filter(last_submit__gt=since).values_list('id', flat=True))
+
+    logged = ReplyChange.objects.filter(study__in=studies, changed__gt=since).values_list(
+        'reply_id', 'deleted')
+    changed.update(i for i, deleted in logged if not deleted)
+    return changed, set(i for i, deleted in logged if deleted)
+
+
+def export_changes(profile, directory, full=False, now=None):
+    """Write a delta for an ExportProfile and move its watermark on -> dict report.
+
+    The first export for a profile, or one with `full`, includes every Reply.
+    """
+
+    with transaction.atomic():
+        profile = ExportProfile.objects.select_for_update().get(pk=profile.pk)
+        until = now or datetime.now()
+        since = not full and profile.watermark and \
+            profile.watermark - timedelta(seconds=settings.EXPORT_OVERLAP_SECONDS) or None
+
+        studies = list(profile.studies.all())
+        replies = study_replies(studies)
+        changed, deleted = set(), set()
+        if since:
+            changed, deleted = changed_replies(studies, since)
+            replies = replies.filter(id__in=changed)
+
+        answerdata, meta = wide_frames(Answer.objects.filter(
+            reply__in=replies, question__variable_name__isnull=False))
+        # replies left without any answers are removed from mirrors too
+        removed = sorted((changed | deleted) - set(meta.index))
+
+        path = os.path.join(directory, "{}-{}".format(profile.name, until.strftime("%Y%m%dT%H%M%S")))
+        os.makedirs(path)
+        answerdata.to_csv(os.path.join(path, 'answers.csv'), encoding='utf-8')
+        meta.to_csv(os.path.join(path, 'meta.csv'), encoding='utf-8')
+        pd.DataFrame({'reply': removed}).to_csv(os.path.join(path, 'deleted.csv'), index=False)
+
+        report = OrderedDict([('profile', profile.name), ('since', since and since.isoformat()),
+            ('until', until.isoformat()), ('upserts', len(meta)), ('deletions', len(removed)),
+            ('path', path)])
+        with open(os.path.join(path, 'delta.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+
+        profile.watermark = until
+        profile.last_exported = datetime.now()
+        profile.save()
+    return report
+
+
+def _read_frame(path):
+    frame = pd.read_csv(path, index_col='reply', dtype=object)
+    frame.index = frame.index.astype(int)
+    return frame
+
+
+def read_delta(path):
+    """Read a delta written by export_changes() -> dict."""
+
+    with open(os.path.join(path, 'delta.json')) as f:
+        delta = json.load(f)
+    for table in TABLES:
+        delta[table] = _read_frame(os.path.join(path, table + '.csv'))
+    delta['deleted'] = list(pd.read_csv(os.path.join(path, 'deleted.csv'))['reply'].astype(int))
+    delta['touched'] = [int(i) for i in set(delta['meta'].index) | set(delta['deleted'])]
+    return delta
+
+
+def _quote(name):
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+def _merge_sqlite(mirror, delta):
+    connection = sqlite3.connect(mirror)
+    try:
+        connection.execute("CREATE TABLE IF NOT EXISTS deltas (path TEXT, until TEXT)")
+        applied = connection.execute("SELECT max(until) FROM deltas").fetchone()[0]
+        if applied and delta['until'] <= applied:
+            return False
+
+        for table in TABLES:
+            frame = delta[table]
+            columns = [i[1] for i in connection.execute("PRAGMA table_info({})".format(_quote(table)))]
+            if columns:
+                for column in [c for c in frame.columns if c not in columns]:
+                    connection.execute("ALTER TABLE {} ADD COLUMN {}".format(_quote(table), _quote(column)))
+                connection.executemany("DELETE FROM {} WHERE reply = ?".format(_quote(table)),
+                    [(i,) for i in delta['touched']])
+            if len(frame):
+                frame.to_sql(table, connection, if_exists='append', index_label='reply')
+
+        connection.execute("INSERT INTO deltas VALUES (?, ?)", (delta['path'], delta['until']))
+        connection.commit()
+    finally:
+        connection.close()
+    return True
+
+
+def _merge_parquet(mirror, delta):
+    if not os.path.exists(mirror):
+        os.makedirs(mirror)
+    state = os.path.join(mirror, 'deltas.json')
+    applied = os.path.exists(state) and json.load(open(state)) or []
+    if applied and delta['until'] <= applied[-1]['until']:
+        return False
+
+    for table in TABLES:
+        path = os.path.join(mirror, table + '.parquet')
+        frame = delta[table]
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            frame = pd.concat([existing[~existing.index.isin(delta['touched'])], frame])
+        frame.to_parquet(path)
+
+    applied.append({'path': delta['path'], 'until': delta['until']})
+    with open(state, 'w') as f:
+        json.dump(applied, f, indent=2)
+    return True
+
+
+def merge_deltas(mirror, paths):
+    """Apply deltas, oldest first, to a SQLite or Parquet mirror -> [paths applied].
+
+    Deltas no newer than the last one applied to the mirror are skipped.
+    """
+
+    merge = os.path.splitext(mirror)[1] in SQLITE_EXTENSIONS and _merge_sqlite or _merge_parquet
+    deltas = sorted((read_delta(p) for p in paths), key=lambda d: d['until'])
+    return [d['path'] for d in deltas if merge(mirror, d)]
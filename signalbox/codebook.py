@@ -0,0 +1,144 @@
+"""Codebooks and labelling syntax for exported data, built from question metadata.
+
+The Questions in an export are found with one query over the filtered
+Answers (rather than by loading each Answer's Question), and their
+ChoiceSets come with them. render_codebook() then produces, for each of
+FORMATS:
+
+    stata   make_labels.do, from signalbox/stata/process-variables.dotemplate
+    spss    labels.sps: VARIABLE LABELS and VALUE LABELS commands
+    r       labels.R: labels and factors for a data frame called `data`
+    json    codebook.json: variables, types and choices for other tools
+
+Questionnaires rarely change, so rendered codebooks are cached by format and
+by the set of Questions they describe (which stands for the Asker or Study
+exported). Keys include the questionnaire version from signalbox.anonymous,
+which listeners move on whenever a questionnaire changes.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+from ask.models import Question
+from signalbox.anonymous import questionnaires_version
+
+CACHE_KEY = "signalbox.codebook.{}.{}.{}"
+
+FILENAMES = OrderedDict([
+    ('stata', 'make_labels.do'),
+    ('spss', 'labels.sps'),
+    ('r', 'labels.R'),
+    ('json', 'codebook.json'),
+])
+
+
+def codebook_questions(answers):
+    """Return the distinct Questions (with their ChoiceSets) used by a queryset of Answers."""
+
+    return list(Question.objects.filter(id__in=answers.values('question').distinct()).select_related(
+        'choiceset').order_by('variable_name'))
+
+
+def _choices(question):
+    return question.choiceset and question.choiceset.get_choices() or []
+
+
+def _has_value_labels(question):
+    # checkboxes are exported as lists of scores, which can't carry value labels
+    return bool(_choices(question)) and question.field_class().export_type != "list"
+
+
+def _quoted(text):
+    return '"{}"'.format(" ".join((text or "").splitlines()).replace('"', '""'))
+
+
+def _r_quoted(text):
+    return json.dumps(" ".join((text or "").splitlines()))
+
+
+def stata_codebook(questions):
+    choicesets = set(q.choiceset for q in questions if _choices(q))
+    return get_template('signalbox/stata/process-variables.dotemplate').render(
+        Context({'questions': questions, 'choicesets': choicesets}))
+
+
+def spss_codebook(questions):
+    lines = ["VARIABLE LABELS"]
+    lines += ["  {} {}".format(q.variable_name, _quoted((q.text or "")[:250])) for q in questions]
+    lines.append(".")
+
+    labelled = [q for q in questions if _has_value_labels(q)]
+    if labelled:
+        lines.append("VALUE LABELS")
+        for n, q in enumerate(labelled):
+            values = " ".join("{} {}".format(c.score, _quoted(c.label)) for c in _choices(q))
+            lines.append("  {}{} {}".format(n and "/" or "", q.variable_name, values))
+        lines.append(".")
+    return "\n".join(lines) + "\n"
+
+
+def r_codebook(questions):
+    lines = ["# Label exported data; load answers.xlsx into a data frame called `data` first", ""]
+    for q in questions:
+        column = "data[[{}]]".format(_r_quoted(q.variable_name))
+        lines.append("if ({} %in% names(data)) {{".format(_r_quoted(q.variable_name)))
+        if _has_value_labels(q):
+            choices = _choices(q)
+            lines.append("    {0} <- factor({0}, levels=c({1}), labels=c({2}))".format(column,
+                ", ".join(str(c.score) for c in choices),
+                ", ".join(_r_quoted(c.label) for c in choices)))
+        lines.append("    attr({}, \"label\") <- {}".format(column, _r_quoted(q.text)))
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def json_codebook(questions):
+    variables = []
+    for q in questions:
+        variables.append(OrderedDict([
+            ('variable_name', q.variable_name),
+            ('text', q.text),
+            ('q_type', q.q_type),
+            ('export_type', q.field_class().export_type),
+            ('choiceset', q.choiceset and q.choiceset.name or None),
+            ('choices', [OrderedDict([('score', c.score), ('mapped_score', c.mapped_score),
+                ('label', c.label), ('is_default', c.is_default_value)]) for c in _choices(q)]),
+        ]))
+    return json.dumps({'variables': variables}, indent=2)
+
+
+RENDERERS = {
+    'stata': stata_codebook,
+    'spss': spss_codebook,
+    'r': r_codebook,
+    'json': json_codebook,
+}
+
+
+def render_codebook(questions, file_format):
+    """Render a codebook for some Questions, cached until questionnaires change -> string."""
+
+    if file_format not in RENDERERS:
+        raise ValueError("Unknown codebook format: {}".format(file_format))
+
+    ids = ",".join(str(q.id) for q in sorted(questions, key=lambda q: q.id))
+    key = CACHE_KEY.format(file_format, questionnaires_version(),
+        hashlib.md5(ids.encode('utf-8')).hexdigest())
+    text = cache.get(key)
+    if text is None:
+        text = RENDERERS[file_format](sorted(questions, key=lambda q: q.variable_name))
+        cache.set(key, text, settings.CODEBOOK_CACHE_SECONDS)
+    return text
+
+
+def codebooks(answers):
+    """Render every codebook format for a queryset of Answers -> OrderedDict {filename: string}."""
+
+    questions = codebook_questions(answers)
+    return OrderedDict((filename, render_codebook(questions, file_format))
+        for file_format, filename in FILENAMES.items())
@@ -0,0 +1,240 @@
+"""Typed columnar exports (Parquet or Arrow IPC) in the wide layout of signalbox.export.
+
+Each Question's column type comes from the export_type of its field class in
+ask.models.fields: integers, decimals, dates, datetimes and times become
+typed columns, checkboxes become lists of integers, and choice questions
+become dictionary-encoded columns holding the labels from their ChoiceSet.
+Answer strings are converted a whole column at a time with pandas.
+
+Replies are written study by study, in batches of at most BATCH_REPLIES, so
+each Parquet row group (or Arrow record batch) holds Replies from a single
+Study. The Question's type and text are stored in the field metadata.
+
+Needs pyarrow, which is optional: columnar_available() says whether it is
+installed.
+"""
+
+from collections import OrderedDict
+import json
+
+import pandas as pd
+from django.conf import settings
+from signalbox.export import ROW_FIELDS_MAP, wide_frames
+from signalbox.models import Reply
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ['parquet', 'arrow']
+BATCH_REPLIES = 100000
+
+# types of the metadata columns, named as in ROW_FIELDS_MAP
+META_TYPES = OrderedDict([
+    ('reply', 'integer'),
+    ('collector', 'string'),
+    ('observation', 'integer'),
+    ('entry_method', 'string'),
+    ('observation_index', 'integer'),
+    ('due', 'datetime'),
+    ('canonical', 'boolean'),
+    ('started', 'datetime'),
+    ('finished', 'datetime'),
+    ('participant', 'string'),
+    ('relates_to_participant', 'string'),
+    ('study', 'category'),
+    ('condition', 'string'),
+    ('randomised_on', 'datetime'),
+])
+
+
+def columnar_available():
+    return pa is not None
+
+
+def arrow_type(export_type):
+    return {
+        'string': pa.string(),
+        'boolean': pa.bool_(),
+        'integer': pa.int64(),
+        'decimal': pa.float64(),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('us'),
+        'time': pa.time64('us'),
+        'list': pa.list_(pa.int64()),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+    }[export_type]
+
+
+def question_export_type(question):
+    export_type = question.field_class().export_type
+    if export_type == 'category' and not question.choiceset:
+        return 'string'
+    return export_type
+
+
+def _strings(values, question=None):
+    return pa.array(values.where(values.notnull(), None).astype(object), type=pa.string(),
+        from_pandas=True)
+
+
+def _booleans(values, question=None):
+    return pa.array(values.where(values.notnull(), None).astype(object), type=pa.bool_(),
+        from_pandas=True)
+
+
+def _integers(values, question=None):
+    numbers = pd.to_numeric(values, errors='coerce')
+    missing = numbers.isnull() | (numbers != numbers.round())
+    return pa.array(numbers.fillna(0).astype('int64').values, mask=missing.values, type=pa.int64())
+
+
+def _decimals(values, question=None):
+    return pa.array(pd.to_numeric(values, errors='coerce').astype('float64').values,
+        type=pa.float64(), from_pandas=True)
+
+
+def _dates(values, question=None):
+    dates = pd.to_datetime(values, errors='coerce')
+    return pa.array(dates.values.astype('datetime64[D]'), mask=dates.isnull().values,
+        type=pa.date32())
+
+
+def _datetimes(values, question=None):
+    times = pd.to_datetime(values, errors='coerce')
+    return pa.array(times.values.astype('datetime64[us]'), mask=times.isnull().values,
+        type=pa.timestamp('us'))
+
+
+def _times(values, question=None):
+    # saved as HH:MM or HH:MM:SS
+    text = values.astype(object).where(values.notnull(), None)
+    text = text.where(text.str.count(":") != 1, text + ":00")
+    deltas = pd.to_timedelta(text, errors='coerce')
+    micros = deltas.values.astype('timedelta64[us]').astype('int64')
+    return pa.array(micros, mask=deltas.isnull().values, type=pa.time64('us'))
+
+
+def _lists(values, question=None):
+    # saved as the repr of a list of strings, e.g. "['1', '3']"
+    items = values.astype(object).where(values.notnull(), None).str.findall(r"-?\d+")
+    strings = pa.array(items.where(items.notnull(), None).tolist(), type=pa.list_(pa.string()))
+    return strings.cast(pa.list_(pa.int64()))
+
+
+def _dictionary(categorical):
+    codes = categorical.codes.astype('int32')
+    return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0, type=pa.int32()),
+        pa.array([str(i) for i in categorical.categories], type=pa.string()))
+
+
+def _categories(values, question=None):
+    if question is None:
+        return _dictionary(pd.Categorical(values.where(values.notnull(), None)))
+
+    labels = OrderedDict((str(score), label or str(score)) for score, label in question.choices())
+    named = values.map(labels)
+    # keep answers which aren't in the ChoiceSet rather than losing them
+    named = named.fillna(values)
+    extra = sorted(set(named.dropna()) - set(labels.values()))
+    categories = list(OrderedDict.fromkeys(list(labels.values()) + extra))
+    return _dictionary(pd.Categorical(named, categories=categories))
+
+
+CONVERTERS = {
+    'string': _strings,
+    'boolean': _booleans,
+    'integer': _integers,
+    'decimal': _decimals,
+    'date': _dates,
+    'datetime': _datetimes,
+    'time': _times,
+    'list': _lists,
+    'category': _categories,
+}
+
+
+def export_schema(questions):
+    """Build the Arrow schema for a list of Questions -> pyarrow.Schema."""
+
+    fields = [pa.field(name, arrow_type(t)) for name, t in META_TYPES.items()]
+    for q in questions:
+        metadata = {'q_type': q.q_type, 'text': q.text or ""}
+        if q.choiceset:
+            metadata['choices'] = json.dumps(q.choices())
+        fields.append(pa.field(q.variable_name, arrow_type(question_export_type(q)),
+            metadata=metadata))
+    return pa.schema(fields)
+
+
+def _reply_meta(answers):
+    """One row of metadata per Reply, with the study key used to partition them -> DataFrame."""
+
+    fields = OrderedDict((k.replace('reply__', '', 1), v) for k, v in ROW_FIELDS_MAP.items())
+    rows = Reply.objects.filter(id__in=answers.values('reply')).values_list(
+        *(list(fields.keys()) + ['membership__study__slug']))
+    meta = pd.DataFrame.from_records(list(rows), columns=list(fields.values()) + ['partition'])
+    meta['partition'] = meta['study'].fillna(meta['partition']).fillna("")
+    return meta.sort_values(['partition', 'reply']).set_index('reply', drop=False)
+
+
+def _wide_answers(answers):
+    rows = answers.values_list('reply_id', 'question__variable_name', 'answer').iterator()
+    long = pd.DataFrame.from_records(list(rows), columns=['reply', 'variable_name', 'answer'])
+    long = long.drop_duplicates(['reply', 'variable_name'], keep='last')
+    return long.pivot(index='reply', columns='variable_name', values='answer')
+
+
+def _batch_table(schema, questions, meta, wide):
+    columns = []
+    for name, export_type in META_TYPES.items():
+        columns.append(CONVERTERS[export_type](meta[name]))
+    wide = wide.reindex(meta.index)
+    for q in questions:
+        if q.variable_name in wide.columns:
+            values = wide[q.variable_name]
+        else:
+            values = pd.Series([None] * len(meta), index=meta.index, dtype=object)
+        columns.append(CONVERTERS[question_export_type(q)](values, q))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_columnar(answers, path, questions, file_format='parquet'):
+    """Write a queryset of Answers to a Parquet or Arrow file -> number of Replies written.
+
+    `questions` lists the Questions to include, in column order.
+    """
+
+    if not columnar_available():
+        raise ImportError("pyarrow is needed for Parquet and Arrow exports")
+    if file_format not in FORMATS:
+        raise ValueError("Unknown format: {}".format(file_format))
+
+    schema = export_schema(questions)
+    if settings.MATERIALISE_WIDE_REPLIES:
+        wide, meta = wide_frames(answers)
+        meta = meta.reset_index()
+        meta['partition'] = meta['study'].fillna("")
+        meta = meta.sort_values(['partition', 'reply']).set_index('reply', drop=False)
+    else:
+        meta = _reply_meta(answers)
+        wide = _wide_answers(answers)
+
+    sink = None
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        sink = pa.OSFile(path, 'wb')
+        writer = pa.RecordBatchFileWriter(sink, schema)
+    try:
+        for study, group in meta.groupby('partition', sort=False):
+            for start in range(0, len(group), BATCH_REPLIES):
+                batch = group.iloc[start:start + BATCH_REPLIES]
+                writer.write_table(_batch_table(schema, questions, batch, wide))
+    finally:
+        writer.close()
+        if sink:
+            sink.close()
+    return len(meta)
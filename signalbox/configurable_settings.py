@@ -48,6 +48,65 @@ LOGIN_FROM_OBSERVATION_TOKEN = get_env_variable('LOGIN_FROM_OBSERVATION_TOKEN',
 # see signalbox.setting for possible values.
 DEFAULT_USER_PROFILE_FIELDS = get_env_variable('DEFAULT_USER_PROFILE_FIELDS', default="").split(",")
 
+# Observations are split into this many partitions (by id) so that several
+# send_worker processes can share the sending without double-sending
+SEND_PARTITIONS = int(get_env_variable('SEND_PARTITIONS', default=16))
+
+# seconds a send_worker holds a partition without renewing its lease
+SEND_LEASE_SECONDS = int(get_env_variable('SEND_LEASE_SECONDS', default=120))
+
+# seconds to cache each study's summary of duplicate replies; changes to
+# replies and answers clear it anyway
+DUPLICATE_REPLY_CACHE_SECONDS = int(get_env_variable('DUPLICATE_REPLY_CACHE_SECONDS', default=3600))
+
+# retention: rows older than this many days are removed by the apply_retention
+# command (see signalbox.retention); set to null to keep them forever
+RETENTION_EMPTY_REPLY_DAYS = get_env_variable('RETENTION_EMPTY_REPLY_DAYS', default=7)
+RETENTION_PREVIEW_REPLY_DAYS = get_env_variable('RETENTION_PREVIEW_REPLY_DAYS', default=30)
+RETENTION_OBSERVATION_DATA_DAYS = get_env_variable('RETENTION_OBSERVATION_DATA_DAYS', default=365)
+RETENTION_REPLY_DATA_DAYS = get_env_variable('RETENTION_REPLY_DATA_DAYS', default=365)
+RETENTION_TEXT_MESSAGE_CALLBACK_DAYS = get_env_variable('RETENTION_TEXT_MESSAGE_CALLBACK_DAYS', default=180)
+RETENTION_REPLY_CHANGE_DAYS = get_env_variable('RETENTION_REPLY_CHANGE_DAYS', default=90)
+
+# rows removed per transaction, and the most removed per second (0 for no limit)
+RETENTION_CHUNK_SIZE = int(get_env_variable('RETENTION_CHUNK_SIZE', default=1000))
+RETENTION_MAX_ROWS_PER_SECOND = int(get_env_variable('RETENTION_MAX_ROWS_PER_SECOND', default=2000))
+
+# archiving: rows older than this many days are moved to compressed files in
+# ARCHIVE_ROOT by the archive_history command (see signalbox.archive)
+ARCHIVE_ROOT = get_env_variable('ARCHIVE_ROOT', default="archive")
+ARCHIVE_OBSERVATION_DATA_DAYS = get_env_variable('ARCHIVE_OBSERVATION_DATA_DAYS', default=180)
+ARCHIVE_REPLY_DATA_DAYS = get_env_variable('ARCHIVE_REPLY_DATA_DAYS', default=180)
+ARCHIVE_VERSION_DAYS = get_env_variable('ARCHIVE_VERSION_DAYS', default=365)
+
+# queued Twilio callbacks saved per transaction by the ingest_callbacks command
+CALLBACK_BATCH_SIZE = int(get_env_variable('CALLBACK_BATCH_SIZE', default=1000))
+
+# seconds to cache each participant's home page task list; changes to their
+# observations and memberships clear it anyway
+DASHBOARD_CACHE_SECONDS = int(get_env_variable('DASHBOARD_CACHE_SECONDS', default=300))
+
+# most answers per page of the anonymous JSON Lines download, and seconds to
+# cache each questionnaire's metadata (changes to questionnaires clear it)
+ANONYMOUS_EXPORT_PAGE_SIZE = int(get_env_variable('ANONYMOUS_EXPORT_PAGE_SIZE', default=10000))
+ANONYMOUS_METADATA_CACHE_SECONDS = int(get_env_variable('ANONYMOUS_METADATA_CACHE_SECONDS', default=86400))
+
+# seconds to cache rendered codebooks and labelling syntax for exports
+CODEBOOK_CACHE_SECONDS = int(get_env_variable('CODEBOOK_CACHE_SECONDS', default=86400))
+
+# incremental exports start this many seconds before the previous watermark,
+# to pick up rows committed late by long transactions (see signalbox.changes)
+EXPORT_OVERLAP_SECONDS = int(get_env_variable('EXPORT_OVERLAP_SECONDS', default=300))
+
+# keep a WideReply row per Reply, updated as answers are saved, so exports
+# don't pivot the Answer table (see signalbox.wide); fill it for existing
+# data with the rebuild_wide_replies command before turning it on
+MATERIALISE_WIDE_REPLIES = get_env_variable('MATERIALISE_WIDE_REPLIES', default=False)
+
+# admin changelists estimate the number of rows in unfiltered tables larger
+# than this rather than counting them (postgresql only)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(get_env_variable('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=50000))
+
 # File uploads #
 ALLOWED_UPLOAD_MIME_TYPES = [
     'application/pdf',
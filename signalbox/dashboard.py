@@ -0,0 +1,100 @@
+"""Data for a participant's home page, from a few queries and cached per user.
+
+The task list previously called ready_to_send(), show_in_tasklist() and
+can_add_answers() on every Observation the user has, each following foreign
+keys lazily. Here the conditions which only depend on columns are applied in
+the database, and the remaining time-dependent checks run in Python on the
+few Observations left, with the related rows already joined.
+
+Dashboards are cached for settings.DASHBOARD_CACHE_SECONDS; listeners clear
+a user's dashboard when their Observations or Memberships change.
+"""
+
+from datetime import datetime, timedelta
+import itertools
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from signalbox.models import Membership, Observation
+
+CACHE_KEY = "signalbox.dashboard.user.{}"
+
+
+def tasklist_observations(user, now=None):
+    """Return the Observations a user should see in their task list, by study then due date.
+
+    Equivalent to checking ready_to_send(), show_in_tasklist() and
+    can_add_answers() for each of the user's Observations.
+    """
+
+    now = now or datetime.now()
+    if not user.userprofile.has_all_required_details():
+        return []
+
+    candidates = Observation.objects.filter(
+        Q(created_by_script__asker__isnull=False) |
+        Q(created_by_script__external_asker_url__gt=""),
+        dyad__user=user,
+        created_by_script__show_in_tasklist=True,
+        due__lt=now,
+        status__lt=1, status__gt=-99,
+        attempt_count__lt=F('dyad__study__max_redial_attempts'),
+        dyad__active=True,
+        dyad__study__paused=False,
+    ).select_related('created_by_script__script_type', 'created_by_script__asker',
+        'dyad__study', 'dyad__condition').order_by('dyad__study__name', 'dyad__study', 'due')
+
+    return [i for i in candidates if i.still_open() and not i.curfew_applies()]
+
+
+def _expiring_today(memberships, now):
+    """Check whether any Observation of these memberships closes within the next day -> Boolean."""
+
+    observations = Observation.objects.filter(dyad__in=memberships,
+        created_by_script__completion_window__gt=0)
+    windows = set(observations.values_list('created_by_script__completion_window', flat=True))
+
+    closing = Q(pk__in=[])
+    for window in windows:
+        opened = now - timedelta(minutes=window)
+        closing |= Q(created_by_script__completion_window=window,
+            due__gte=opened, due__lt=opened + timedelta(days=1))
+    return observations.filter(closing).exists()
+
+
+def build_dashboard(user, now=None):
+    """Compute the dashboard for a user without the cache -> dict."""
+
+    now = now or datetime.now()
+    memberships = list(user.membership_set.select_related('study', 'condition').annotate(
+        n_observations=Count('observation')).order_by('study__name'))
+    # see Membership.is_current()
+    current = [m for m in memberships if m.n_observations and m.active]
+
+    tasks = tasklist_observations(user, now=now)
+    by_study = [(study, list(obs)) for study, obs in
+        itertools.groupby(tasks, lambda x: x.dyad.study)]
+
+    return {
+        'tasks': tasks,
+        'by_study': by_study,
+        'expiring_today': bool(current) and _expiring_today(current, now),
+        'current_memberships': current,
+        'other_memberships': [m for m in memberships if m not in current],
+    }
+
+
+def user_dashboard(user):
+    """Return the (possibly cached) dashboard for a user -> dict; see build_dashboard()."""
+
+    key = CACHE_KEY.format(user.id)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, settings.DASHBOARD_CACHE_SECONDS)
+    return dashboard
+
+
+def invalidate_user_dashboard(user_id):
+    cache.delete(CACHE_KEY.format(user_id))
@@ -0,0 +1,105 @@
+"""Summaries of Observations with more than one Reply (e.g. from double data entry).
+
+Counts are computed with grouped queries over all Replies and Answers of the
+Studies requested, rather than per Observation, and cached per Study. The
+listeners in signalbox.models.listeners invalidate a Study's summary when its
+Answers, Replies or choice of canonical Reply change.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from signalbox.models import Answer, Reply
+
+CACHE_KEY = "signalbox.duplicates.study.{}"
+
+
+def _as_int(condition):
+    return Sum(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+
+
+def reply_counts(replies):
+    """Group a queryset of Replies by Observation -> {observation_id: dict}.
+
+    Only Observations with more than one Reply are included. Each dict holds
+    the Observation's study id and its numbers of Replies and canonical Replies.
+    """
+
+    counts = replies.filter(observation__isnull=False).values(
+        'observation', 'observation__dyad__study').annotate(
+        n=Count('id'), n_canonical=_as_int(Q(is_canonical_reply=True))).filter(n__gt=1)
+    return dict((i['observation'], {'study': i['observation__dyad__study'],
+        'replies': i['n'], 'canonical': i['n_canonical']}) for i in counts)
+
+
+def differing_questions(answers, counts):
+    """Find Questions answered differently by the Replies to each Observation.
+
+    `answers` is a queryset of Answers, already restricted to the
+    Observations of interest; `counts` is the result of reply_counts() for
+    the same Observations. A Question differs if
+    some Replies did not answer it or the answers given are not all the same.
+    Returns {observation_id: set([question_id])}.
+    """
+
+    grouped = answers.filter(question__isnull=False).values(
+        'reply__observation', 'question').annotate(
+        n_replies=Count('reply', distinct=True),
+        n_values=Count('answer', distinct=True),
+        n_missing=_as_int(Q(answer__isnull=True)))
+
+    diffs = defaultdict(set)
+    for i in grouped:
+        obs = i['reply__observation']
+        if obs not in counts:
+            continue
+        if i['n_replies'] < counts[obs]['replies'] or i['n_values'] + bool(i['n_missing']) > 1:
+            diffs[obs].add(i['question'])
+    return diffs
+
+
+def _summarise(studies):
+    counts = reply_counts(Reply.objects.filter(observation__dyad__study__in=studies))
+    # one grouped pass for every duplicated observation in these studies
+    diffs = counts and differing_questions(
+        Answer.objects.filter(reply__observation__dyad__study__in=studies), counts) or {}
+
+    summaries = dict((s.id, {'duplicated': 0, 'unresolved': 0, 'observations': {}}) for s in studies)
+    for obs, details in list(counts.items()):
+        summary = summaries[details.pop('study')]
+        summary['duplicated'] += 1
+        summary['unresolved'] += not details['canonical']
+        details['differing_questions'] = diffs.get(obs, set())
+        summary['observations'][obs] = details
+    return summaries
+
+
+def duplicate_reply_summaries(studies):
+    """Return {study_id: summary} for a list of Studies, using the cache where possible.
+
+    Each summary is a dict with the number of Observations which have
+    duplicate replies ('duplicated'), the number of those without a canonical
+    Reply ('unresolved'), and per-Observation details ('observations').
+    """
+
+    keys = dict((CACHE_KEY.format(s.id), s) for s in studies)
+    cached = cache.get_many(list(keys.keys()))
+    missing = [s for k, s in list(keys.items()) if k not in cached]
+
+    summaries = dict((keys[k].id, v) for k, v in list(cached.items()))
+    if missing:
+        fresh = _summarise(missing)
+        cache.set_many(dict((CACHE_KEY.format(k), v) for k, v in list(fresh.items())),
+            settings.DUPLICATE_REPLY_CACHE_SECONDS)
+        summaries.update(fresh)
+    return summaries
+
+
+def duplicate_reply_summary(study):
+    return duplicate_reply_summaries([study])[study.id]
+
+
+def invalidate_duplicate_reply_summary(study_id):
+    cache.delete(CACHE_KEY.format(study_id))
@@ -0,0 +1,225 @@
+"""Enrol a cohort of participants into a Study from a CSV file.
+
+Each row of the CSV describes one participant: a username and email, and
+optionally first_name, last_name, password and any of
+settings.USER_PROFILE_FIELDS (the `site` column holds a StudySite name).
+
+Rows are validated together, then Users, UserProfiles, Memberships,
+Observations and ReminderInstances are created with bulk INSERTs inside one
+transaction. Post-save listeners are bypassed, so participants are allocated
+in a single pass (see signalbox.allocation.allocate_many) and nothing is
+sent: the scheduler picks up the new Observations on its next run.
+"""
+
+import csv
+from collections import OrderedDict
+import io
+
+import phonenumbers
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password, UNUSABLE_PASSWORD_PREFIX
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from signalbox.allocation import allocate_many
+from signalbox.models import (Membership, Observation, ReminderInstance, ScriptReminder,
+    Study, StudySite, UserProfile)
+
+User = get_user_model()
+
+USER_COLUMNS = ['username', 'email', 'first_name', 'last_name', 'password']
+PHONE_COLUMNS = ['mobile', 'landline']
+BATCH_SIZE = 500
+
+
+class EnrolmentError(Exception):
+    """Raised when a CSV of participants fails validation; `errors` lists (line, message)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(EnrolmentError, self).__init__("{} problems found in enrolment file".format(len(errors)))
+
+
+def read_participants_csv(fileobj):
+    """Read a CSV file (text or bytes) into a list of dicts -> [dict]."""
+
+    text = fileobj.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(text))
+    return [dict((k.strip(), (v or "").strip()) for k, v in list(row.items()) if k) for row in reader]
+
+
+def _clean_phone(value, valid_country_codes):
+    number = phonenumbers.parse(value, settings.DEFAULT_TELEPHONE_COUNTRY_CODE)
+    if not phonenumbers.is_possible_number(number):
+        raise ValidationError("Not a phone number")
+    if number.country_code not in valid_country_codes:
+        raise ValidationError("Country code not allowed.")
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def validate_participants(study, rows):
+    """Check rows read from a CSV and convert them for saving -> [dict].
+
+    Lookups needed for validation (existing usernames, sites, allowed
+    country codes) are made once for the whole file. Raises EnrolmentError
+    listing every problem found.
+    """
+
+    errors = []
+    if not rows:
+        raise EnrolmentError([(1, "No participants found")])
+
+    allowed = set(USER_COLUMNS + settings.USER_PROFILE_FIELDS)
+    unknown = set(rows[0].keys()) - allowed
+    if unknown:
+        errors.append((1, "Unknown columns: {}".format(", ".join(sorted(unknown)))))
+
+    required = set(filter(bool, settings.DEFAULT_USER_PROFILE_FIELDS)).union(
+        study.profile_fields_dict()['required'])
+    sites = dict(StudySite.objects.values_list('name', 'id'))
+    valid_country_codes = set(int(x) for codes in
+        Study.objects.values_list('valid_telephone_country_codes', flat=True)
+        for x in codes.split(",") if x.strip())
+
+    usernames = [r.get('username', "") for r in rows]
+    taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    seen = set()
+
+    cleaned = []
+    for line, row in enumerate(rows, start=2):
+        username = row.get('username', "")
+        if not username:
+            errors.append((line, "username is required"))
+        elif username in taken or username in seen:
+            errors.append((line, "username {} is already in use".format(username)))
+        seen.add(username)
+
+        try:
+            validate_email(row.get('email', ""))
+        except ValidationError:
+            errors.append((line, "invalid email address '{}'".format(row.get('email', ""))))
+
+        profile = dict((k, row[k]) for k in settings.USER_PROFILE_FIELDS if row.get(k))
+        for field in required - set(profile):
+            errors.append((line, "{} is required for this study".format(field)))
+
+        for field in PHONE_COLUMNS:
+            if field in profile:
+                try:
+                    profile[field] = _clean_phone(profile[field], valid_country_codes)
+                except (ValidationError, phonenumbers.NumberParseException) as e:
+                    errors.append((line, "{}: {}".format(field, e)))
+
+        if 'site' in profile:
+            if profile['site'] not in sites:
+                errors.append((line, "unknown site '{}'".format(profile['site'])))
+            profile['site_id'] = sites.get(profile.pop('site'))
+
+        user = dict((k, row.get(k, "")) for k in USER_COLUMNS)
+        cleaned.append({'user': user, 'profile': profile})
+
+    if errors:
+        raise EnrolmentError(errors)
+    return cleaned
+
+
+def _observations_for(memberships, scripts_by_condition):
+    """Build unsaved Observations for memberships, reusing schedules where possible."""
+
+    times_cache = {}
+    for membership in memberships:
+        for script in scripts_by_condition.get(membership.condition_id, []):
+            key = (script.id, membership.date_randomised)
+            if key not in times_cache:
+                times_cache[key] = list(script.datetimes(membership.date_randomised))
+            for obs in script.build_observations(membership, times=times_cache[key]):
+                if script.jitter:
+                    obs.add_jitter(script.jitter)
+                obs.due = obs.due_original
+                obs.next_eligible_at = obs.compute_next_eligible_at()
+                yield obs
+
+
+def bulk_enrol(study, participants, dry_run=False, progress=None):
+    """Create and allocate participants validated by validate_participants() -> dict of counts.
+
+    `progress` is an optional callable, called with (stage, n) as each stage
+    completes. With dry_run, everything is done and then rolled back.
+    """
+
+    progress = progress or (lambda stage, n: None)
+    counts = OrderedDict()
+
+    with transaction.atomic():
+        users = []
+        for p in participants:
+            details = p['user']
+            password = details['password'] and make_password(details['password']) or \
+                UNUSABLE_PASSWORD_PREFIX
+            users.append(User(username=details['username'], email=details['email'],
+                first_name=details['first_name'], last_name=details['last_name'],
+                password=password))
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        userids = dict(User.objects.filter(
+            username__in=[u.username for u in users]).values_list('username', 'id'))
+        counts['users'] = len(userids)
+        progress('users', counts['users'])
+
+        profiles = [UserProfile(user_id=userids[p['user']['username']], **p['profile'])
+            for p in participants]
+        [i.set_normalised_numbers() for i in profiles]
+        UserProfile.objects.bulk_create(profiles, batch_size=BATCH_SIZE)
+        counts['profiles'] = len(participants)
+        progress('profiles', counts['profiles'])
+
+        Membership.objects.bulk_create(
+            [Membership(study=study, user_id=i) for i in list(userids.values())],
+            batch_size=BATCH_SIZE)
+        memberships = list(Membership.objects.filter(
+            study=study, user_id__in=list(userids.values())).select_related('study'))
+        counts['memberships'] = len(memberships)
+        progress('memberships', counts['memberships'])
+
+        if not study.auto_randomise:
+            return _finish(counts, dry_run)
+
+        sites = dict((userids[p['user']['username']], p['profile'].get('site_id'))
+            for p in participants)
+        allocate_many(study, memberships,
+            sites=dict((m.id, sites[m.user_id]) for m in memberships))
+        counts['allocated'] = len(memberships)
+        progress('allocated', counts['allocated'])
+
+        if not study.auto_add_observations:
+            return _finish(counts, dry_run)
+
+        scripts_by_condition = dict((c.id, list(c.scripts.all().select_related('script_type')))
+            for c in study.studycondition_set.all())
+        observations = list(_observations_for(memberships, scripts_by_condition))
+        Observation.objects.bulk_create(observations, batch_size=BATCH_SIZE)
+        counts['observations'] = len(observations)
+        progress('observations', counts['observations'])
+
+        scriptreminders = {}
+        for sr in ScriptReminder.objects.filter(script__in=set(
+                s for scripts in scripts_by_condition.values() for s in scripts)):
+            scriptreminders.setdefault(sr.script_id, []).append(sr)
+        saved = Observation.objects.filter(dyad__in=memberships).values_list(
+            'id', 'created_by_script_id', 'due')
+        reminders = [ReminderInstance(reminder_id=sr.reminder_id, observation_id=obsid,
+                due=sr.calculate_date(Observation(due=due)))
+            for obsid, scriptid, due in saved for sr in scriptreminders.get(scriptid, [])]
+        ReminderInstance.objects.bulk_create(reminders, batch_size=BATCH_SIZE)
+        counts['reminders'] = len(reminders)
+        progress('reminders', counts['reminders'])
+
+        return _finish(counts, dry_run)
+
+
+def _finish(counts, dry_run):
+    if dry_run:
+        transaction.set_rollback(True)
+    return counts
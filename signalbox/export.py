@@ -0,0 +1,100 @@
+"""The wide layout shared by data exports: one row per Reply, one column per variable.
+
+Answers are reshaped into an `answers` frame, indexed by Reply id with a
+column per Question.variable_name, and a `meta` frame of Reply, Observation
+and Membership details with the same index. With
+settings.MATERIALISE_WIDE_REPLIES on, both are read from WideReply rows
+instead (see signalbox.wide).
+"""
+
+from collections import OrderedDict
+import json
+
+import pandas as pd
+from django.conf import settings
+from signalbox.models import WideReply
+
+ANSWER_FIELDS_MAP = dict([
+    ('id', 'id'),
+    ('reply__id', 'reply'),
+    ('question__q_type', 'qtype'),
+    ('answer', 'answer'),
+    ('question__variable_name', 'variable_name'),
+])
+
+ROW_FIELDS_MAP = OrderedDict([
+    ('reply__id', 'reply'),
+    ('reply__collector', 'collector'),
+    ('reply__observation__id', 'observation'),
+    ('reply__entry_method', 'entry_method'),
+    ('reply__observation__n_in_sequence', 'observation_index'),
+    ('reply__observation__due', 'due'),
+
+    ('reply__is_canonical_reply', 'canonical'),
+    ('reply__started', 'started'),
+    ('reply__last_submit', 'finished'),
+
+    ('reply__observation__dyad__user__username', 'participant'),
+    ('reply__observation__dyad__relates_to__user__username', 'relates_to_participant'),
+
+    ('reply__observation__dyad__study__slug', 'study'),
+    ('reply__observation__dyad__condition__tag', 'condition'),
+    ('reply__observation__dyad__date_randomised', 'randomised_on'),
+])
+
+DATETIME_COLUMNS = ['due', 'started', 'finished', 'randomised_on']
+
+
+def _empty_frames():
+    index = pd.Index([], name='reply')
+    return (pd.DataFrame(index=index),
+        pd.DataFrame(index=index, columns=list(ROW_FIELDS_MAP.values())[1:]))
+
+
+def materialised_frames(rows):
+    """As wide_frames(), but from a queryset of WideReply rows."""
+
+    records = list(rows.values_list('reply_id', 'answers', 'meta').iterator())
+    if not records:
+        return _empty_frames()
+
+    index = pd.Index([r[0] for r in records], name='reply')
+    answerdata = pd.DataFrame.from_records([json.loads(r[1]) for r in records], index=index)
+    answerdata = answerdata[sorted(answerdata.columns)]
+    answerdata.columns.name = 'variable_name'
+
+    meta = pd.DataFrame.from_records([json.loads(r[2]) for r in records], index=index,
+        columns=list(ROW_FIELDS_MAP.values())[1:])
+    for column in DATETIME_COLUMNS:
+        meta[column] = pd.to_datetime(meta[column])
+    return answerdata.sort_index(), meta.sort_index()
+
+
+def wide_frames(answers):
+    """Reshape a queryset of Answers to one row per Reply -> (answers DataFrame, meta DataFrame).
+
+    When reading materialised rows, every answer of the Replies included is
+    returned, whatever other filters the Answers had.
+    """
+
+    if settings.MATERIALISE_WIDE_REPLIES:
+        return materialised_frames(WideReply.objects.filter(reply__in=answers.values('reply')))
+
+    ad = list(answers.values(*list(ANSWER_FIELDS_MAP.keys())))
+    rd = list(answers.values(*list(ROW_FIELDS_MAP.keys())))
+
+    if not ad:
+        return _empty_frames()
+
+    # make dataframes
+    answerdata = pd.DataFrame({i['id']: i for i in ad}).T
+    rowmetadata = pd.DataFrame((i for i in rd))
+
+    # rename columns
+    answerdata.columns = [ANSWER_FIELDS_MAP[i] for i in answerdata.columns]
+    rowmetadata.columns = [ROW_FIELDS_MAP[i] for i in rowmetadata.columns]
+
+    # process
+    answerdata = answerdata.set_index(['reply', 'variable_name']).unstack()['answer']
+    rowmetadata = rowmetadata.drop_duplicates('reply').set_index('reply')
+    return answerdata, rowmetadata
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from datetime import timedelta
 from ask.models import Asker
 from django import forms
 from django.conf import settings
@@ -16,6 +17,7 @@ from django.views.generic.edit import ProcessFormView
 from localflavor.gb.forms import GBCountySelect, GBPostcodeField
 from registration.forms import RegistrationForm
 import selectable.forms as selectable
+from signalbox.columnar import columnar_available
 from signalbox.lookups import UserLookup
 from signalbox.models import Membership, Reply, Study, UserProfile, UserMessage, ContactRecord, Answer
 from signalbox.models.validators import date_in_past
@@ -54,6 +56,31 @@ class DateShiftForm(forms.Form):
         return cleaned_data.get('new_randomised_date').date() - current
 
 
+class TimeShiftForm(forms.Form):
+    """Form to choose how far to shift observations for a whole Study or StudyCondition."""
+
+    days = forms.IntegerField(required=True,
+        help_text="""Number of days to move observations by; negative numbers
+        move them earlier.""")
+    hours = forms.IntegerField(required=False, initial=0)
+
+    def delta(self):
+        """Return the time difference selected as a timedelta."""
+
+        return timedelta(days=self.cleaned_data['days'], hours=self.cleaned_data.get('hours') or 0)
+
+
+class BulkEnrolmentForm(forms.Form):
+    """Upload a CSV of participants to enrol in a Study."""
+
+    study = forms.ModelChoiceField(queryset=Study.objects.all())
+    participants = forms.FileField(
+        help_text="""A CSV file with a header row. username and email are required;
+        first_name, last_name, password and participant profile fields are optional.""")
+    dry_run = forms.BooleanField(required=False, initial=True,
+        help_text="""Check the file and report what would be created, without saving anything.""")
+
+
 class NewParticipantWizard(CookieWizardView):
     """Wizard to allow a user to be added along with a userprofile.
 
@@ -99,6 +126,13 @@ class SelectExportDataForm(forms.Form):
 
     studies = forms.ModelMultipleChoiceField(queryset=Study.objects.all(), required=False)
     questionnaires = forms.ModelMultipleChoiceField(queryset=Asker.objects.all(), required=False)
+    file_format = forms.ChoiceField(initial='xlsx', choices=[('xlsx', 'Excel, with Stata syntax (zip)')] +
+        (columnar_available() and [('parquet', 'Parquet (typed columns)'),
+            ('arrow', 'Arrow IPC (typed columns)')] or []))
+    include_scores = forms.BooleanField(required=False, initial=False,
+        help_text="Add a column per scoresheet with each reply's score (Excel exports only).")
+    canonical_only = forms.BooleanField(required=False, initial=False,
+        help_text="Export only the canonical reply to each observation, dropping duplicates.")
 
 
 class ContactRecordForm(forms.ModelForm):
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.retention import apply_retention, retention_policies
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Removes old empty replies and operational logs according to retention policies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*',
+            help='Names of policies to apply; defaults to all of: {}'.format(
+                ", ".join(retention_policies().keys())))
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='Count the rows which would be removed without removing them.')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=None)
+        parser.add_argument('--max-rate', dest='max_rows_per_second', type=int, default=None,
+            help='Most rows to remove per second (0 for no limit).')
+
+    def handle(self, *args, **options):
+        try:
+            reports = apply_retention(options['policies'], dry_run=options['dry_run'],
+                chunk_size=options['chunk_size'],
+                max_rows_per_second=options['max_rows_per_second'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for r in reports:
+            if options['dry_run']:
+                self.stdout.write("{policy}: {rows} rows would be removed".format(**r))
+            else:
+                self.stdout.write("{policy}: {rows} rows removed in {seconds:.1f}s ({rate:.0f}/s)".format(**r))
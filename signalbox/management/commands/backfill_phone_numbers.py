@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from signalbox.models import UserProfile
+from twiliobox.models import TwilioNumber
+
+
+CHUNK_SIZE = 1000
+
+
+def backfill(model, fields):
+    """Recompute normalised number columns for rows where they are out of date -> int N changed."""
+
+    changed = 0
+    last = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(model.objects.filter(pk__gt=last).order_by('pk')[:CHUNK_SIZE])
+            if not chunk:
+                return changed
+            for obj in chunk:
+                before = [getattr(obj, f) for f in fields]
+                obj.set_normalised_numbers()
+                values = dict((f, getattr(obj, f)) for f in fields)
+                if [values[f] for f in fields] != before:
+                    model.objects.filter(pk=obj.pk).update(**values)
+                    changed += 1
+        last = chunk[-1].pk
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Fills in the normalised (E.164 and reversed) telephone number columns used for lookups.'
+
+    def handle(self, *args, **options):
+        n = backfill(UserProfile, ['mobile_e164', 'mobile_reversed'])
+        self.stdout.write("{} user profiles updated".format(n))
+        n = backfill(TwilioNumber, ['phone_number_e164', 'phone_number_reversed'])
+        self.stdout.write("{} twilio numbers updated".format(n))
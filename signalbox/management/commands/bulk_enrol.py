@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.enrolment import EnrolmentError, bulk_enrol, read_participants_csv, validate_participants
+from signalbox.models import Study
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Enrols and randomises participants listed in a CSV file into a study.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('study', help='Slug of the study.')
+        parser.add_argument('csvfile', help='Path to a CSV file with a header row.')
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='Check the file and report counts without saving anything.')
+
+    def handle(self, *args, **options):
+        try:
+            study = Study.objects.get(slug=options['study'])
+        except Study.DoesNotExist as e:
+            raise CommandError(str(e))
+
+        with open(options['csvfile']) as f:
+            rows = read_participants_csv(f)
+
+        try:
+            participants = validate_participants(study, rows)
+            counts = bulk_enrol(study, participants, dry_run=options['dry_run'],
+                progress=lambda stage, n: self.stdout.write("{} {}".format(n, stage)))
+        except EnrolmentError as e:
+            raise CommandError("\n".join(["{}: {}".format(*i) for i in e.errors]))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write("Dry run: nothing was saved.")
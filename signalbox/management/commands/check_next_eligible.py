@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.models import Observation
+from signalbox.models.observation_timing_functions import (stale_next_eligible_at,
+    refresh_next_eligible_at)
+
+class Command(BaseCommand):
+    args = ''
+    help = '''Checks Observation.next_eligible_at against the value computed from
+        the Observation, Membership and Study. Use --fix to repair (or backfill) it.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', dest='fix', default=False,
+            help='Update stale values rather than just reporting them.')
+
+    def handle(self, *args, **options):
+        observations = Observation.objects.all()
+
+        if options['fix']:
+            n = refresh_next_eligible_at(observations)
+            self.stdout.write("Updated next_eligible_at for {} observations".format(n))
+            return
+
+        stale = stale_next_eligible_at(observations)
+        ids = sorted(i for ids in stale.values() for i in ids)
+        if ids:
+            raise CommandError("{} observations have a stale next_eligible_at: {}".format(
+                len(ids), ids))
+        self.stdout.write("next_eligible_at is consistent")
@@ -1,22 +1,11 @@
-from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Count
-from signalbox.models.reply import Reply
-from django.utils import timezone
-from datetime import timedelta
+from django.core.management.base import BaseCommand
+from signalbox.retention import apply_retention
 
-DAYSDELAY = 7
 
 class Command(BaseCommand):
     args = ''
-    help = 'Cleanup empty replies after a delay.'
+    help = 'Cleanup empty replies after a delay (see the apply_retention command).'
 
     def handle(self, *args, **options):
-        oldemptyreplies = Reply.objects.annotate(
-        	num_answers=Count('answer')).exclude(
-        	num_answers__gt=0).filter(
-        	started__lt=timezone.now()-timedelta(days=DAYSDELAY)
-        )
-        if oldemptyreplies:
-        	print("{}  Deleting Reply IDs {}".format(timezone.now(), [i.id for i in oldemptyreplies]), file=self.stdout)
-        	oldemptyreplies.delete()
-
+        report, = apply_retention(['empty_replies'])
+        self.stdout.write("{policy}: {rows} rows removed in {seconds:.1f}s".format(**report))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.utils import expire_lapsed_observations
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Marks observations whose completion window has passed as missing.'
+
+    def handle(self, *args, **options):
+        expiredlistresult = expire_lapsed_observations()
+        self.stdout.write("{}".format([(i.slug, n) for i, n in expiredlistresult]))
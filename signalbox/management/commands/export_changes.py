@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.changes import export_changes
+from signalbox.models import ExportProfile, Study
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Exports the replies which changed since an export profile last ran, as a delta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', help='Name of the export profile.')
+        parser.add_argument('--study', action='append', dest='studies', default=[],
+            help='Slug of a study to include; creates the profile if needed. Can be repeated.')
+        parser.add_argument('--output', dest='output', default='.',
+            help='Directory to write the delta into.')
+        parser.add_argument('--full', action='store_true', dest='full', default=False,
+            help='Export every reply, ignoring the watermark.')
+
+    def handle(self, *args, **options):
+        profile, created = ExportProfile.objects.get_or_create(name=options['profile'])
+        if options['studies']:
+            studies = Study.objects.filter(slug__in=options['studies'])
+            if len(studies) != len(set(options['studies'])):
+                raise CommandError("Unknown studies in: {}".format(", ".join(options['studies'])))
+            profile.studies.add(*studies)
+        if not profile.studies.exists():
+            raise CommandError("Export profile {} has no studies; use --study".format(profile.name))
+
+        report = export_changes(profile, options['output'], full=options['full'])
+        self.stdout.write("{upserts} replies changed and {deletions} removed since {since}; "
+            "written to {path}".format(**report))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.allocation import generate_randomisation_list
+from signalbox.models import Study, StudySite
+
+class Command(BaseCommand):
+    args = ''
+    help = '''Generates (or extends) the permuted-block randomisation list for a
+        study, for one site or for participants without a site.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('study', help='Slug of the study.')
+        parser.add_argument('--site', dest='site', default=None, help='Name of the StudySite.')
+        parser.add_argument('--blocks', dest='blocks', type=int, default=10,
+            help='Number of blocks to add.')
+        parser.add_argument('--seed', dest='seed', default=None,
+            help='Seed for a new list; ignored when extending an existing one.')
+
+    def handle(self, *args, **options):
+        try:
+            study = Study.objects.get(slug=options['study'])
+            site = options['site'] and StudySite.objects.get(name=options['site']) or None
+            rlist = generate_randomisation_list(study, site=site,
+                n_blocks=options['blocks'], seed=options['seed'])
+        except (Study.DoesNotExist, StudySite.DoesNotExist, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write("{}: {} slots remaining (seed {})".format(
+            rlist, rlist.remaining(), rlist.seed))
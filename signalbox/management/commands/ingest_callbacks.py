@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from signalbox.callbacks import run_consumer
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Saves queued Twilio status callbacks as TextMessageCallbacks, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', dest='interval', type=int, default=5,
+            help='Seconds to wait between checking the queue.')
+        parser.add_argument('--once', action='store_true', dest='once', default=False,
+            help='Empty the queue once, then exit.')
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        for taken, saved in run_consumer(interval=options['interval'], once=options['once'],
+                batch_size=options['batch_size']):
+            if taken:
+                self.stdout.write("{} callbacks taken, {} saved".format(taken, saved))
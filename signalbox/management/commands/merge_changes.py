@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.changes import merge_deltas
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Applies deltas written by export_changes to a local SQLite or Parquet mirror.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('mirror',
+            help='A .sqlite/.sqlite3/.db file, or a directory for Parquet files.')
+        parser.add_argument('deltas', nargs='+', help='Delta directories, in any order.')
+
+    def handle(self, *args, **options):
+        try:
+            applied = merge_deltas(options['mirror'], options['deltas'])
+        except ImportError as e:
+            raise CommandError("Parquet mirrors need pyarrow or fastparquet ({})".format(e))
+
+        for path in applied:
+            self.stdout.write("applied {}".format(path))
+        self.stdout.write("{} of {} deltas applied".format(len(applied), len(options['deltas'])))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.models import Answer, Study
+from signalbox.wide import refresh_wide_replies
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Rebuilds the materialised wide rows (WideReply) from Answers and Replies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--study', action='append', dest='studies', default=[],
+            help='Slug of a study to rebuild; can be repeated. Defaults to all replies.')
+        parser.add_argument('--asker', action='append', dest='askers', type=int, default=[],
+            help='Id of a questionnaire to rebuild; can be repeated.')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        answers = Answer.objects.filter(reply__isnull=False, question__variable_name__isnull=False)
+        if options['studies']:
+            studies = Study.objects.filter(slug__in=options['studies'])
+            if len(studies) != len(set(options['studies'])):
+                raise CommandError("Unknown studies in: {}".format(", ".join(options['studies'])))
+            answers = answers.filter(reply__observation__dyad__study__in=studies) | \
+                answers.filter(reply__membership__study__in=studies)
+        if options['askers']:
+            answers = answers.filter(reply__asker__in=options['askers'])
+
+        reply_ids = sorted(set(answers.values_list('reply_id', flat=True)))
+        total = 0
+        for start in range(0, len(reply_ids), options['chunk_size']):
+            total += refresh_wide_replies(reply_ids[start:start + options['chunk_size']])
+            self.stdout.write("{} of {} replies rebuilt".format(total, len(reply_ids)))
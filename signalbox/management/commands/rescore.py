@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.models import Answer, ScoreSheet, Study
+from signalbox.scoring import bulk_scores, scoresheets_for
+
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Recomputes ScoreSheet scores for existing Replies and writes them as CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scoresheet', action='append', dest='scoresheets', default=[],
+            help='Name of a scoresheet to compute; can be repeated. Defaults to all those used.')
+        parser.add_argument('--study', action='append', dest='studies', default=[],
+            help='Slug of a study to rescore; can be repeated. Defaults to all replies.')
+        parser.add_argument('--asker', action='append', dest='askers', type=int, default=[],
+            help='Id of a questionnaire to rescore; can be repeated.')
+        parser.add_argument('--output', dest='output', default=None,
+            help='File to write the scores to. Defaults to standard output.')
+
+    def handle(self, *args, **options):
+        answers = Answer.objects.filter(reply__isnull=False)
+        if options['studies']:
+            studies = Study.objects.filter(slug__in=options['studies'])
+            if len(studies) != len(set(options['studies'])):
+                raise CommandError("Unknown studies in: {}".format(", ".join(options['studies'])))
+            answers = answers.filter(reply__observation__dyad__study__in=studies) | \
+                answers.filter(reply__membership__study__in=studies)
+        if options['askers']:
+            answers = answers.filter(reply__asker__in=options['askers'])
+
+        if options['scoresheets']:
+            scoresheets = ScoreSheet.objects.filter(name__in=options['scoresheets'])
+            if len(scoresheets) != len(set(options['scoresheets'])):
+                raise CommandError("Unknown scoresheets in: {}".format(", ".join(options['scoresheets'])))
+        else:
+            scoresheets = scoresheets_for(answers)
+
+        scores = bulk_scores(scoresheets, answers)
+        names = dict((s.id, s.name) for s in scoresheets)
+        scores['scoresheet'] = scores['scoresheet'].map(names)
+        if options['output']:
+            scores.to_csv(options['output'], index=False)
+            self.stdout.write("{} scores written to {}".format(len(scores), options['output']))
+        else:
+            self.stdout.write(scores.to_csv(index=False), ending="")
@@ -1,10 +1,12 @@
 from django.core.management.base import BaseCommand, CommandError
-from signalbox.utils import execute_the_todo_list, send_reminders_due_now
+from signalbox.utils import execute_the_todo_list, send_reminders_due_now, expire_lapsed_observations
 
 class Command(BaseCommand):
     args = ''
     help = 'Sends all observations due.'
 
     def handle(self, *args, **options):
+        # retire expired observations first so they drop out of the scan
+        expire_lapsed_observations()
         todolistresult = execute_the_todo_list()
         self.stdout.write("{}".format([i.id for i, j in todolistresult]))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.send_workers import run_worker
+
+class Command(BaseCommand):
+    args = ''
+    help = '''Sends observations due in the partitions this worker leases. Several
+        workers (on one or more hosts) can run against the same database.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', dest='name', default=None,
+            help='Worker name; defaults to host:pid:random.')
+        parser.add_argument('--interval', dest='interval', type=int, default=30,
+            help='Seconds to wait between sending rounds.')
+        parser.add_argument('--once', action='store_true', dest='once', default=False,
+            help='Run a single round, then release leases and exit.')
+
+    def handle(self, *args, **options):
+        if options['interval'] >= settings.SEND_LEASE_SECONDS:
+            raise CommandError("--interval must be shorter than SEND_LEASE_SECONDS ({})".format(
+                settings.SEND_LEASE_SECONDS))
+
+        for partitions, results in run_worker(name=options['name'],
+                interval=options['interval'], once=options['once']):
+            self.stdout.write("{} {}".format(partitions, [i.id for i, j in results]))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from signalbox.models import Study, StudyCondition
+from signalbox.timeshift import timeshift_study
+
+class Command(BaseCommand):
+    args = ''
+    help = 'Shifts the times of all observations without replies in a study or condition.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('study', help='Slug of the study.')
+        parser.add_argument('--condition', dest='condition', default=None,
+            help='Tag of a condition within the study; defaults to the whole study.')
+        parser.add_argument('--days', dest='days', type=int, default=0)
+        parser.add_argument('--hours', dest='hours', type=int, default=0)
+
+    def handle(self, *args, **options):
+        delta = timedelta(days=options['days'], hours=options['hours'])
+        if not delta:
+            raise CommandError("Specify --days and/or --hours to shift by.")
+
+        try:
+            study = Study.objects.get(slug=options['study'])
+            condition = options['condition'] and StudyCondition.objects.get(
+                study=study, tag=options['condition'])
+        except (Study.DoesNotExist, StudyCondition.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        n = timeshift_study(study, delta, condition=condition or None)
+        self.stdout.write("{} observations shifted by {}".format(n, delta))
@@ -9,6 +9,12 @@ from signalbox.models.scoresheet import ScoreSheet
 from signalbox.models.alert import Alert, AlertInstance
 from signalbox.models.observationcreator import ObservationCreator
 from signalbox.models.usermessage import UserMessage, ContactRecord, ContactReason
+from signalbox.models.lease import SendWorker, SendPartitionLease
+from signalbox.models.randomisation import RandomisationList, RandomisationSlot
+from signalbox.models.archive import ArchiveChunk, ArchiveEntry
+from signalbox.models.callbacks import PendingTextMessageCallback
+from signalbox.models.export import ExportProfile, ReplyChange
+from signalbox.models.wide import WideReply
 from signalbox.models import listeners
 from signalbox.models import observation_methods
 from django.conf import settings
@@ -19,6 +25,7 @@ __all__ = [
     "ObservationCreator",
     "Study",
     "StudyCondition",
+    "AllocationCounter",
     "Script",
     "ScriptType",
     "Membership",
@@ -39,6 +46,16 @@ __all__ = [
     "TextMessageCallback",
     "Alert",
     "AlertInstance",
+    "SendWorker",
+    "SendPartitionLease",
+    "RandomisationList",
+    "RandomisationSlot",
+    "ArchiveChunk",
+    "ArchiveEntry",
+    "PendingTextMessageCallback",
+    "ExportProfile",
+    "ReplyChange",
+    "WideReply",
 ]
 
 
@@ -69,7 +69,7 @@ class Answer(models.Model):
     def mapped_score(self):
         """Return mapped score; leave answer unchanged if no map found."""
         possiblechoices = supergetattr(self, 'question.choiceset.get_choices', ())
-        score_maptos = {i.score: i.mapped_score for i in possiblechoices}
+        score_maptos = {str(i.score): i.mapped_score for i in possiblechoices}
         return score_maptos.get(self.answer, self.answer)
 
     def participant(self):
@@ -0,0 +1,38 @@
+from django.db import models
+
+
+class ArchiveChunk(models.Model):
+    """A block of archived rows: one gzip member appended to a segment file.
+
+    Segment files hold rows of one model for one Study and month; see
+    signalbox.archive. `offset` and `length` locate the member in the file.
+    """
+
+    model = models.CharField(max_length=100, db_index=True)
+    study = models.ForeignKey('signalbox.Study', blank=True, null=True, on_delete=models.SET_NULL)
+    month = models.CharField(max_length=7)
+    path = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'signalbox'
+        ordering = ['model', 'month', 'created']
+
+    def __unicode__(self):
+        return "%s %s (%s rows)" % (self.model, self.month, self.rows)
+
+
+class ArchiveEntry(models.Model):
+    """Index of the objects (e.g. 'signalbox.observation.12') with history in an ArchiveChunk."""
+
+    chunk = models.ForeignKey('signalbox.ArchiveChunk')
+    parent = models.CharField(max_length=100, db_index=True)
+
+    class Meta:
+        app_label = 'signalbox'
+
+    def __unicode__(self):
+        return self.parent
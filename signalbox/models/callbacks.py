@@ -0,0 +1,25 @@
+from django.db import models
+
+# lets Twilio SIDs in ObservationData be matched to callbacks with an index
+EXTERNAL_ID_INDEX_SQL = """CREATE INDEX IF NOT EXISTS signalbox_observationdata_external_id
+    ON signalbox_observationdata (value) WHERE key = 'external_id'"""
+EXTERNAL_ID_INDEX_VENDORS = ['postgresql', 'sqlite']
+
+
+class PendingTextMessageCallback(models.Model):
+    """A Twilio status callback queued by the sms_callback view.
+
+    Saved with a single INSERT so Twilio gets a quick response; turned into
+    TextMessageCallbacks in bulk by signalbox.callbacks.ingest_text_message_callbacks.
+    """
+
+    sid = models.CharField(max_length=255)
+    status = models.CharField(max_length=255, blank=True, null=True)
+    post = models.TextField()
+    received = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'signalbox'
+
+    def __unicode__(self):
+        return "%s\n%s" % (self.sid, self.status)
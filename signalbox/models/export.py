@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import models
+
+
+class ExportProfile(models.Model):
+    """A named, repeatable export of some Studies, remembering how far it has got.
+
+    `watermark` is when the last incremental export was taken; the next one
+    only includes Replies which changed after it. See signalbox.changes.
+    """
+
+    name = models.SlugField(unique=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True,
+        on_delete=models.SET_NULL, help_text="""The analyst this export is for.""")
+    studies = models.ManyToManyField('signalbox.Study')
+    watermark = models.DateTimeField(blank=True, null=True)
+    last_exported = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        app_label = 'signalbox'
+        ordering = ['name']
+
+    def __unicode__(self):
+        return self.name
+
+
+class ReplyChange(models.Model):
+    """A change to a Reply's exported row which Answer.last_modified doesn't show.
+
+    Written by listeners when Replies or Answers are deleted, or Replies are
+    updated in bulk. `deleted` means the whole Reply has gone.
+    """
+
+    reply_id = models.IntegerField(db_index=True)
+    study = models.ForeignKey('signalbox.Study', blank=True, null=True, on_delete=models.SET_NULL)
+    deleted = models.BooleanField(default=False)
+    changed = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        app_label = 'signalbox'
+
+    def __unicode__(self):
+        return "Reply %s %s" % (self.reply_id, self.deleted and "deleted" or "changed")
@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class SendWorker(models.Model):
+    """A process running the send_worker command; see signalbox.send_workers."""
+
+    name = models.CharField(max_length=255, unique=True)
+    heartbeat = models.DateTimeField(db_index=True)
+
+    class Meta:
+        app_label = 'signalbox'
+
+    def __unicode__(self):
+        return self.name
+
+
+class SendPartitionLease(models.Model):
+    """Records which SendWorker owns a partition of Observations, and until when.
+
+    Observations belong to partition `id % settings.SEND_PARTITIONS`.
+    """
+
+    partition = models.PositiveIntegerField(unique=True)
+    owner = models.CharField(max_length=255, blank=True, db_index=True)
+    expires = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        app_label = 'signalbox'
+        ordering = ['partition']
+
+    def __unicode__(self):
+        return "Partition %s (%s)" % (self.partition, self.owner or "unowned")
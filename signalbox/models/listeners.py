@@ -20,17 +20,37 @@ from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.core.urlresolvers import reverse
 from django.db.models import Q
-from django.db.models.signals import post_save, pre_save
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, post_migrate
 from django.dispatch import receiver, Signal
+from ask.models import Asker, AskPage, Choice, ChoiceSet, Question
 from registration.signals import user_registered
+from signalbox.anonymous import invalidate_question_metadata
 from signalbox.allocation import allocate
-from signalbox.models import (Reply, Observation, Membership, 
-    UserProfile, TextMessageCallback, Alert, AlertInstance)
+from signalbox.changes import log_reply_changes
+from signalbox.dashboard import invalidate_user_dashboard
+from signalbox.duplicates import invalidate_duplicate_reply_summary
+from signalbox.models import (Reply, Answer, Observation, Membership, Study, AllocationCounter,
+    UserProfile, TextMessageCallback, Alert, AlertInstance, ReplyChange)
+from signalbox.models.callbacks import EXTERNAL_ID_INDEX_SQL, EXTERNAL_ID_INDEX_VENDORS
+from signalbox.models.observation_timing_functions import (refresh_next_eligible_at,
+    NEXT_ELIGIBLE_INDEX_SQL, NEXT_ELIGIBLE_INDEX_VENDORS)
 from signalbox.signals import sbox_anonymous_reply_complete
+from signalbox.wide import forget_answer, refresh_wide_reply_meta
 from signalbox.utils import execute_the_todo_list
 
 logger = logging.getLogger(__name__)
 
+STUDY_ELIGIBILITY_FIELDS = ['paused', 'working_day_starts', 'working_day_ends',
+    'max_redial_attempts']
+
+# Membership fields which appear in exported Reply metadata; see signalbox.export.ROW_FIELDS_MAP
+MEMBERSHIP_EXPORT_FIELDS = ['user_id', 'relates_to_id', 'study_id', 'condition_id', 'date_randomised']
+
+# Replies part-way through being deleted, whose Answers needn't be logged one by one
+_deleting_replies = set()
+
 
 def disable_for_loaddata(signal_handler):
     """Turn off signal handlers when loading fixture data.
@@ -148,6 +168,236 @@ def allocate_new_membership(sender, created, instance, **kwargs):
             execute_the_todo_list()
 
 
+def _saved_values(instance, fields):
+    """Return a dict of field values from the saved copy of instance (empty if unsaved)."""
+
+    if not instance.pk:
+        return {}
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def _fields_changed(instance, fields):
+    """Check whether any of fields differ from the saved copy of instance -> Boolean."""
+
+    saved = _saved_values(instance, fields)
+    return bool(saved) and any(saved[f] != getattr(instance, f) for f in fields)
+
+
+@receiver(pre_save, sender=Study, dispatch_uid="signalbox.listeners.study_eligibility")
+@disable_for_loaddata
+def note_study_eligibility_change(sender, instance, **kwargs):
+    instance._eligibility_changed = _fields_changed(instance, STUDY_ELIGIBILITY_FIELDS)
+
+
+@receiver(post_save, sender=Study, dispatch_uid="signalbox.listeners.study_eligibility")
+@disable_for_loaddata
+def refresh_study_next_eligible_at(sender, instance, created, **kwargs):
+    """Keep Observation.next_eligible_at in step with study curfew and pause settings."""
+
+    if getattr(instance, '_eligibility_changed', False):
+        refresh_next_eligible_at(Observation.objects.filter(dyad__study=instance))
+
+
+@receiver(pre_save, sender=Membership, dispatch_uid="signalbox.listeners.membership_eligibility")
+@disable_for_loaddata
+def note_membership_changes(sender, instance, **kwargs):
+    saved = _saved_values(instance, ['active'] + MEMBERSHIP_EXPORT_FIELDS)
+    instance._eligibility_changed = bool(saved) and saved['active'] != instance.active
+    instance._export_changed = bool(saved) and any(
+        saved[f] != getattr(instance, f) for f in MEMBERSHIP_EXPORT_FIELDS)
+    instance._saved_condition_id = saved.get('condition_id')
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="signalbox.listeners.membership_eligibility")
+@disable_for_loaddata
+def refresh_membership_next_eligible_at(sender, instance, created, **kwargs):
+    """Keep Observation.next_eligible_at in step with Membership.active."""
+
+    if getattr(instance, '_eligibility_changed', False):
+        refresh_next_eligible_at(instance.observation_set.all())
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="signalbox.listeners.reply_change_membership")
+@disable_for_loaddata
+def log_membership_reply_changes(sender, instance, created, **kwargs):
+    """Note the Replies whose exported metadata changed with their Membership; see signalbox.changes."""
+
+    if getattr(instance, '_export_changed', False):
+        replies = list(Reply.objects.filter(
+            Q(observation__dyad=instance) | Q(membership=instance)).values_list('id', flat=True))
+        log_reply_changes(replies)
+        refresh_wide_reply_meta(replies)
+
+
+def _adjust_allocation_counter(condition_id, n):
+    AllocationCounter.objects.filter(condition_id=condition_id).update(count=F('count') + n)
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="signalbox.listeners.allocation_counter")
+@disable_for_loaddata
+def count_membership_allocation(sender, instance, created, **kwargs):
+    """Keep AllocationCounters in step when a Membership's condition changes."""
+
+    old = getattr(instance, '_saved_condition_id', None)
+    if old != instance.condition_id:
+        if old:
+            _adjust_allocation_counter(old, -1)
+        if instance.condition_id:
+            _adjust_allocation_counter(instance.condition_id, 1)
+    instance._saved_condition_id = instance.condition_id
+
+
+@receiver(post_delete, sender=Membership, dispatch_uid="signalbox.listeners.allocation_counter")
+def uncount_membership_allocation(sender, instance, **kwargs):
+    if instance.condition_id:
+        _adjust_allocation_counter(instance.condition_id, -1)
+
+
+def _invalidate_duplicates_for_reply(reply_id):
+    studies = Reply.objects.filter(id=reply_id, observation__isnull=False).values_list(
+        'observation__dyad__study', flat=True)
+    [invalidate_duplicate_reply_summary(i) for i in studies]
+
+
+@receiver(pre_save, sender=Reply, dispatch_uid="signalbox.listeners.duplicates")
+@disable_for_loaddata
+def note_canonical_reply_change(sender, instance, **kwargs):
+    instance._canonical_changed = _fields_changed(instance, ['is_canonical_reply', 'observation_id'])
+
+
+@receiver(post_save, sender=Reply, dispatch_uid="signalbox.listeners.duplicates")
+@receiver(post_delete, sender=Reply, dispatch_uid="signalbox.listeners.duplicates_delete")
+def invalidate_duplicates_for_reply(sender, instance, created=False, **kwargs):
+    """Clear the cached duplicate reply summary when Replies are added, removed or chosen."""
+
+    if kwargs.get('raw'):
+        return
+    if created or getattr(instance, '_canonical_changed', True):
+        if instance.observation_id:
+            invalidate_duplicate_reply_summary(
+                Observation.objects.filter(id=instance.observation_id).values_list(
+                    'dyad__study', flat=True).first())
+
+
+@receiver(post_save, sender=Answer, dispatch_uid="signalbox.listeners.duplicates")
+@receiver(post_delete, sender=Answer, dispatch_uid="signalbox.listeners.duplicates_delete")
+def invalidate_duplicates_for_answer(sender, instance, **kwargs):
+    """Clear the cached duplicate reply summary when an Answer changes."""
+
+    if kwargs.get('raw'):
+        return
+    if instance.reply_id:
+        _invalidate_duplicates_for_reply(instance.reply_id)
+
+
+@receiver(pre_delete, sender=Reply, dispatch_uid="signalbox.listeners.reply_change_delete")
+def note_deleting_reply(sender, instance, **kwargs):
+    # Django deletes a Reply's Answers before the Reply itself
+    _deleting_replies.add(instance.id)
+
+
+@receiver(post_delete, sender=Reply, dispatch_uid="signalbox.listeners.reply_change_delete")
+def log_deleted_reply(sender, instance, **kwargs):
+    """Note deleted Replies so incremental exports can remove them; see signalbox.changes."""
+
+    _deleting_replies.discard(instance.id)
+
+    study = None
+    if instance.observation_id:
+        study = Observation.objects.filter(id=instance.observation_id).values_list(
+            'dyad__study', flat=True).first()
+    elif instance.membership_id:
+        study = Membership.objects.filter(id=instance.membership_id).values_list(
+            'study', flat=True).first()
+    ReplyChange.objects.create(reply_id=instance.id, study_id=study, deleted=True)
+
+
+@receiver(post_delete, sender=Answer, dispatch_uid="signalbox.listeners.reply_change_delete")
+def log_deleted_answer(sender, instance, **kwargs):
+    # log_deleted_reply records Answers deleted along with their Reply
+    if instance.reply_id and instance.reply_id not in _deleting_replies:
+        log_reply_changes([instance.reply_id])
+
+
+@receiver(post_save, sender=Reply, dispatch_uid="signalbox.listeners.wide_reply")
+@disable_for_loaddata
+def refresh_wide_reply(sender, instance, created, **kwargs):
+    """Keep the metadata in a Reply's WideReply current; see signalbox.wide."""
+
+    if not created:
+        refresh_wide_reply_meta([instance.id])
+
+
+@receiver(post_delete, sender=Answer, dispatch_uid="signalbox.listeners.wide_reply_delete")
+def remove_answer_from_wide_reply(sender, instance, **kwargs):
+    # a deleted Reply's WideReply is deleted with it
+    if instance.reply_id not in _deleting_replies:
+        forget_answer(instance)
+
+
+@receiver(post_save, sender=Asker, dispatch_uid="signalbox.listeners.question_metadata")
+@receiver(post_delete, sender=Asker, dispatch_uid="signalbox.listeners.question_metadata_delete")
+@receiver(post_save, sender=AskPage, dispatch_uid="signalbox.listeners.question_metadata")
+@receiver(post_delete, sender=AskPage, dispatch_uid="signalbox.listeners.question_metadata_delete")
+@receiver(post_save, sender=Question, dispatch_uid="signalbox.listeners.question_metadata")
+@receiver(post_delete, sender=Question, dispatch_uid="signalbox.listeners.question_metadata_delete")
+@receiver(post_save, sender=ChoiceSet, dispatch_uid="signalbox.listeners.question_metadata")
+@receiver(post_delete, sender=ChoiceSet, dispatch_uid="signalbox.listeners.question_metadata_delete")
+@receiver(post_save, sender=Choice, dispatch_uid="signalbox.listeners.question_metadata")
+@receiver(post_delete, sender=Choice, dispatch_uid="signalbox.listeners.question_metadata_delete")
+def invalidate_anonymous_metadata(sender, instance, **kwargs):
+    """Clear cached question metadata for anonymous downloads when a questionnaire changes."""
+
+    invalidate_question_metadata()
+
+
+@receiver(post_save, sender=Observation, dispatch_uid="signalbox.listeners.dashboard")
+@receiver(post_delete, sender=Observation, dispatch_uid="signalbox.listeners.dashboard_delete")
+def invalidate_dashboard_for_observation(sender, instance, **kwargs):
+    """Clear the cached home page of the participant an Observation belongs to."""
+
+    if kwargs.get('raw') or not instance.dyad_id:
+        return
+    users = Membership.objects.filter(id=instance.dyad_id).values_list('user_id', flat=True)
+    [invalidate_user_dashboard(i) for i in users]
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="signalbox.listeners.dashboard")
+@receiver(post_delete, sender=Membership, dispatch_uid="signalbox.listeners.dashboard_delete")
+def invalidate_dashboard_for_membership(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        invalidate_user_dashboard(instance.user_id)
+
+
+@receiver(post_migrate, dispatch_uid="signalbox.listeners.next_eligible_index")
+def create_next_eligible_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Add the partial index used by the send scan, and fill next_eligible_at where it is missing.
+
+    The send scan only finds rows with next_eligible_at set, so pending
+    Observations saved before the column existed are backfilled here
+    rather than waiting for `check_next_eligible --fix`.
+    """
+
+    if getattr(sender, 'name', None) != 'signalbox':
+        return
+    connection = connections[using]
+    if connection.vendor in NEXT_ELIGIBLE_INDEX_VENDORS:
+        connection.cursor().execute(NEXT_ELIGIBLE_INDEX_SQL)
+    refresh_next_eligible_at(Observation.objects.using(using).filter(
+        status=0, next_eligible_at__isnull=True))
+
+
+@receiver(post_migrate, dispatch_uid="signalbox.listeners.external_id_index")
+def create_external_id_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Index the Twilio SIDs in ObservationData, used to link callbacks to Observations."""
+
+    if getattr(sender, 'name', None) != 'signalbox':
+        return
+    connection = connections[using]
+    if connection.vendor in EXTERNAL_ID_INDEX_VENDORS:
+        connection.cursor().execute(EXTERNAL_ID_INDEX_SQL)
+
+
 @receiver(sbox_anonymous_reply_complete, sender=Reply)
 def send_email_after_anonymous_asker(sender, **kwargs):
     reply = kwargs.get('reply')
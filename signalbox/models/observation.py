@@ -1,13 +1,15 @@
+from functools import reduce
+import operator
 import random
-import itertools
 from twilio.exceptions import TwilioException
 
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Q, Value, When
 from datetime import datetime, timedelta
 from shortuuidfield import ShortUUIDField
 from django.db import models
 
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.conf import settings
 User = settings.AUTH_USER_MODEL
@@ -28,6 +30,7 @@ from signalbox.models.reply import Reply
 from signalbox.models.answer import Answer
 from signalbox.models.schedule import ScriptReminder
 from signalbox.utilities.djangobits import supergetattr
+from signalbox.utilities.phone import suffix_key
 
 
 def import_module_by_string(name):
@@ -88,9 +91,10 @@ class ReminderInstance(models.Model):
         try:
             result = client.sms.messages.create(to=to_number, from_=from_number, body=message,
                     status_callback=current_site_url() + reverse('sms_callback'))
-            self.observation.add_data(key="external_id", value=result.sid)
-            self.observation.add_data(key="reminder",
+            self.observation.stage_data(key="external_id", value=result.sid)
+            self.observation.stage_data(key="reminder",
                 value="%s (sent to number ending %s)" % (message, to_number[-3:]))
+            self.observation.commit_transition()
 
             return (True, str(result.sid))
 
@@ -175,6 +179,11 @@ class Observation(models.Model):
 
     attempt_count = models.IntegerField(default=0, db_index=True)
 
+    next_eligible_at = models.DateTimeField(blank=True, null=True, editable=False,
+        help_text="""Earliest time the Observation could be sent, allowing for the study
+        curfew. Null if the Observation is not pending, or cannot currently be sent
+        (e.g. the study is paused). Maintained on save; see compute_next_eligible_at().""")
+
     token = ShortUUIDField()
 
     def add_reminders(self):
@@ -202,17 +211,13 @@ class Observation(models.Model):
     def canonical_reply(self):
         """Returns the most authoritative Reply for the Observation.
 
-        Either a Reply marked as canonical by an admin, or the last-submitted Reply
+        Either a Reply marked as canonical by an admin, or the last-submitted Reply.
+        Uses the same order as Reply.objects.canonical(), in a single query.
         """
 
-        allreplies = self.reply_set.all().order_by('-last_submit')
-        #Reply.objects.filter(observation=self).order_by('-last_submit')
-        canon = allreplies.filter(is_canonical_reply=True)
-        if len(canon) > 0:
-            return canon[0]
-        if len(allreplies) > 0:
-            return allreplies[0]
-        return None
+        return self.reply_set.annotate(unsubmitted=Case(When(last_submit__isnull=True,
+            then=Value(1)), default=Value(0), output_field=IntegerField())).order_by(
+            '-is_canonical_reply', 'unsubmitted', '-last_submit', '-id').first()
 
     @property
     def asker(self):
@@ -229,10 +234,49 @@ class Observation(models.Model):
         return self.reply_set.all().count() == 0
 
     def add_data(self, key, value=""):
-        data = ObservationData(observation=self, key=key, value=value)
-        data.save()
+        self.stage_data(key, value)
+        self.commit_transition()
         return True
 
+    def _transition(self):
+        """Return (set of staged field names, list of staged (key, value) data)."""
+        if not hasattr(self, '_staged_transition'):
+            self._staged_transition = (set(), [])
+        return self._staged_transition
+
+    def stage_transition(self, status=None, touch=False, increment=False):
+        """Record a change of state in memory, to be written by commit_transition().
+
+        `touch` sets last_attempted to now and `increment` adds one to attempt_count.
+        """
+        fields, _ = self._transition()
+        if status is not None:
+            self.status = status
+            fields.add('status')
+        if touch:
+            self.last_attempted = datetime.now()
+            fields.add('last_attempted')
+        if increment:
+            self.attempt_count += 1
+            fields.add('attempt_count')
+
+    def stage_data(self, key, value=""):
+        """Queue an ObservationData entry, to be written by commit_transition()."""
+        _, data = self._transition()
+        data.append((key, value))
+
+    def commit_transition(self):
+        """Write staged changes: one UPDATE of the changed fields and one bulk INSERT of data."""
+
+        fields, data = self._transition()
+        del self._staged_transition
+
+        if fields or not self.pk:
+            self.save(update_fields=self.pk and fields or None)
+        if data:
+            ObservationData.objects.bulk_create(
+                [ObservationData(observation=self, key=k, value=v) for k, v in data])
+
     @property
     def user(self):
         return self.dyad and self.dyad.user or None
@@ -377,10 +421,34 @@ class Observation(models.Model):
         return False not in bools
     ready_to_send.boolean = True
 
+    def compute_next_eligible_at(self):
+        """Return the earliest time this Observation can be sent -> datetime or None.
+
+        This denormalises the parts of ready_to_send() which depend on the
+        Observation, its Membership and its Study, so the send scan can select
+        candidates with an index range scan. ready_to_send() is still checked
+        before anything is sent.
+        """
+
+        if self.status != 0 or not (self.created_by_script_id and self.dyad_id and self.due):
+            return None
+
+        if self.study_paused() or not self.membership_active():
+            return None
+
+        if not tf.less_than_max_attempts(self):
+            return None
+
+        scripttype = supergetattr(self, 'created_by_script.script_type.name', None)
+        if scripttype in tf.CURFEW_SCRIPT_TYPES:
+            return self.dyad.study.next_working_datetime(self.due)
+
+        return self.due
+
     def increment_attempts(self):
         """Record that the Observation was attempted."""
-        self.attempt_count += 1
-        return self.save()
+        self.stage_transition(increment=True)
+        return self.commit_transition()
 
     def get_extra_time(self):
         return self.created_by_script.redial_delay
@@ -389,6 +457,9 @@ class Observation(models.Model):
         '''Redefine save to manage Observation entries.'''
 
         self.due = self.due or self.due_original
+        self.next_eligible_at = self.compute_next_eligible_at()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'next_eligible_at'}
         super(Observation, self).save(*args, **kwargs)
 
     def create_observation_context(self):
@@ -481,20 +552,15 @@ class Observation(models.Model):
         Where an observation has multiple replies, different questions may have been answered
         in each reply, or different answers given to the same question. This function identifies
         variables which have different or missing responses across replies, and returns a queryset
-        of the Questions which differ.
+        of the Questions which differ. See signalbox.duplicates.differing_questions.
         """
-        replies = self.reply_set.all()
-        if replies.count() < 2:
-            return []
-        answer_sets = [set(reply.answer_set.all().values_list('question__id', 'answer'))
-            for reply in replies]
+        from signalbox.duplicates import differing_questions, reply_counts
 
-        diffs = [i[0].symmetric_difference(i[1]) for i in itertools.combinations(answer_sets, 2)]
-
-        if len(diffs) > 0:
-            diffs = list(itertools.chain(*diffs))
-
-        question_ids = set([i for i, _ in diffs])
+        counts = reply_counts(self.reply_set.all())
+        if not counts:
+            return []
+        question_ids = differing_questions(
+            Answer.objects.filter(reply__observation=self), counts).get(self.id, set())
         return Question.objects.filter(id__in=question_ids)
 
     def model_name(self):
@@ -544,11 +610,18 @@ class Observation(models.Model):
         """Set the last_attempt for the Observation to the current datetime."""
         return getattr(self.helper_module(), 'touch', default.touch)(self)
 
+    def has_archived_history(self):
+        """Whether any ObservationData (or versions) for this Observation have been archived."""
+
+        from signalbox.archive import has_archived_history
+        return has_archived_history(self)
+
     def sms_replies(self):
         """A (possibly incomplete) list of SMS replies recieved via Twilio callbacks."""
 
-        possible_sids = [i.value for i in self.observationdata_set.all()]
-        sms_replies = TextMessageCallback.objects.filter(sid__in=possible_sids)
+        possible_sids = self.observationdata_set.filter(key="external_id").values('value')
+        sms_replies = TextMessageCallback.objects.filter(
+            Q(observation=self) | Q(observation__isnull=True, sid__in=possible_sids))
         return sms_replies
 
     class Meta:
@@ -581,6 +654,19 @@ class ObservationData(models.Model):
         return self.key
 
 
+def likely_user_for_numbers(numbers):
+    """Return the User whose mobile ends with the same digits as one of numbers (or None).
+
+    Uses an indexed prefix match on UserProfile.mobile_reversed.
+    """
+
+    keys = [k for k in map(suffix_key, numbers) if k]
+    if not keys:
+        return None
+    match = reduce(operator.or_, [Q(userprofile__mobile_reversed__startswith=k) for k in keys])
+    return get_user_model().objects.filter(match).order_by('id').first()
+
+
 class TextMessageCallback(models.Model):
     sid = models.CharField(max_length=255)
     post = JSONField(blank=True, null=True, help_text="""A serialised
@@ -588,6 +674,7 @@ class TextMessageCallback(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=255, blank=True, null=True)
     likely_related_user = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True)
+    observation = models.ForeignKey('signalbox.Observation', blank=True, null=True)
 
     def from_(self):
         return self.post.get('From', "")
@@ -600,12 +687,7 @@ class TextMessageCallback(models.Model):
         self.status = self.post.get('SmsStatus', None)
 
         # identfify user in the system likely to have sent this message
-        users = User.objects.filter(
-            Q(userprofile__mobile__iendswith=self.from_()[-9:]) |
-            Q(userprofile__mobile__iendswith=self.to_()[-9:])
-        )
-        if users.count():
-            self.likely_related_user = users[0]
+        self.likely_related_user = likely_user_for_numbers([self.from_(), self.to_()])
 
         super(TextMessageCallback, self).save()
 
@@ -617,3 +699,4 @@ class TextMessageCallback(models.Model):
 
     class Meta:
         app_label = 'signalbox'
+        index_together = [('sid', 'status')]
@@ -4,9 +4,8 @@ from signalbox.models import observation_helpers as hlp
 
 def update(self, success):
     if success:
-        self.touch()
-        self.status = 1
-        self.save()
+        self.stage_transition(status=1, touch=True)
+    self.commit_transition()
 
 
 def do(self):
@@ -15,7 +14,7 @@ def do(self):
     to, from_address, subject, message = hlp.get_email_message_parts(self)
     success, result = hlp.send_email(to, from_address, subject, message)
 
-    self.add_data(key="attempt", value=json.dumps({'email': str(result),
+    self.stage_data(key="attempt", value=json.dumps({'email': str(result),
         'message': message}))
     self.update(success)
     return (bool(success), result)
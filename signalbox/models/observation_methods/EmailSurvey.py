@@ -5,10 +5,9 @@ from signalbox.models.observation_helpers import send_email, get_email_message_p
 
 def update(self, success):
     if success:
-        self.touch()
-        self.status = -2  # sent, response pending
-        self.attempt_count += 1
-        self.save()
+        # sent, response pending
+        self.stage_transition(status=-2, touch=True, increment=True)
+    self.commit_transition()
 
 
 def link(self):
@@ -21,7 +20,7 @@ def do(self):
     to_address, from_address, subject, message = get_email_message_parts(self)
     success, result = send_email(to_address, from_address, subject, message)
 
-    self.add_data(key="attempt", value=json.dumps({'email': str(result),
+    self.stage_data(key="attempt", value=json.dumps({'email': str(result),
         'message': message}))
     self.update(success)
     return (bool(success), result)
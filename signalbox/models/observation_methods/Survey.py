@@ -6,8 +6,8 @@ def link(self):
     return reverse('start_data_entry', kwargs={'observation_token':self.token})
 
 def update(self, success_status):
-    self.status = -3
-    self.save()
+    self.stage_transition(status=-3)
+    self.commit_transition()
 
 def do(self):
     self.update(1)
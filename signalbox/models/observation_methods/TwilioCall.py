@@ -11,8 +11,12 @@ from signalbox.phone_field import international_string
 def do(self):
     """Place the Call and update Observation."""
 
-    self.status = -1  # in progress
-    self.save()
+    # claim the Observation as in progress before dialling, so an overlapping
+    # send run which loaded it in the same state can't place the call again
+    claimed = type(self).objects.filter(id=self.id, status=self.status).update(status=-1)
+    if not claimed:
+        return (0, "Observation %s is already being called." % (self.id, ))
+    self.status = -1
 
     client = self.dyad.study.twilio_number.client()
 
@@ -20,6 +24,7 @@ def do(self):
     from_number = self.dyad.study.twilio_number.number()
 
     if not to_number:
+        self.commit_transition()
         return (-1, "No number available for this user.")
 
     try:
@@ -27,17 +32,15 @@ def do(self):
                        from_=from_number,
                        url=self.link(),
                        method="POST")
-        self.touch()
-        self.increment_attempts()
-        self.add_data(key="external_id", value=call.sid)
-        self.save()
+        self.stage_transition(touch=True, increment=True)
+        self.stage_data(key="external_id", value=call.sid)
+        self.commit_transition()
         return (1, "Call %s is %s. %s" % (call.sid, call.status, call.uri))
 
     except Exception as e:
-        self.touch()
-        self.increment_attempts()
-        self.add_data(key="failure", value=str(e))
-        self.save()
+        self.stage_transition(touch=True, increment=True)
+        self.stage_data(key="failure", value=str(e))
+        self.commit_transition()
         return (-1, str(e))
 
 
@@ -69,8 +72,7 @@ def update(self, success_status):
     """Handle updates relating to do()ing calls. See also reschedule()"""
 
     if success_status > -1:
-        self.increment_attempts()
-        self.touch()
+        self.stage_transition(touch=True, increment=True)
 
-    self.status = success_status  # call set in progress
-    self.save()
+    self.stage_transition(status=success_status)  # call set in progress
+    self.commit_transition()
@@ -10,13 +10,12 @@ from signalbox.phone_field import international_string
 
 def update(self, success_status):
     if success_status > -1:
-        self.increment_attempts()
+        self.stage_transition(increment=True)
 
     if success_status == 1:
-        self.status = -1  # set to 'in progress'
-        self.touch()
+        self.stage_transition(status=-1, touch=True)  # set to 'in progress'
 
-    self.save()
+    self.commit_transition()
 
 
 def do(self, test=False):
@@ -38,12 +37,12 @@ def do(self, test=False):
                         body=message,
                         status_callback=current_site_url() + reverse('sms_callback'),)
 
-        self.add_data(key="external_id", value=result.sid)
+        self.stage_data(key="external_id", value=result.sid)
 
     except TwilioException as e:
         success = -1
         result = str(e)
-        self.add_data(key="failure", value=result)
+        self.stage_data(key="failure", value=result)
 
     self.update(success)
     return (success, result)
@@ -1,5 +1,3 @@
-from datetime import datetime
-
 
 def link(self):
     return False
@@ -10,21 +8,19 @@ def update(self, success_status):
 
     NOTE this gets overwritten by some Observation subclasses below"""
 
-    self.touch()
-    self.increment_attempts()
-    return self.save()
+    self.stage_transition(touch=True, increment=True)
+    return self.commit_transition()
 
 
 def touch(self):
     """Set the last_attempt for the Observation to the current datetime."""
 
-    self.last_attempted = datetime.now()
-    return self.save()
+    self.stage_transition(touch=True)
+    return self.commit_transition()
 
 
 def do(self):
     """By default, nothing should happen except recording that we tried."""
 
-    self.touch()
-    self.increment_attempts()
-    return self.save()
+    self.stage_transition(touch=True, increment=True)
+    return self.commit_transition()
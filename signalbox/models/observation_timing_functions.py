@@ -1,8 +1,27 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
+from django.db.models import F, Q
 
 
-def observations_due_in_window(start=None, end=None):
-    """Get the list of Observations which are ready to send now."""
+# pending, or due and awaiting completion; see settings.STATUS_CHOICES_DICT
+EXPIRABLE_STATUSES = [0, -3]
+EXPIRED_STATUS = -999
+
+# Observations made by these types of Script are subject to the study curfew
+CURFEW_SCRIPT_TYPES = ['TwilioCall', 'TwilioSMS']
+
+# partial index used by the send scan; only pending rows are indexed
+NEXT_ELIGIBLE_INDEX_SQL = """CREATE INDEX IF NOT EXISTS signalbox_observation_next_eligible_pending
+    ON signalbox_observation (next_eligible_at) WHERE status = 0"""
+NEXT_ELIGIBLE_INDEX_VENDORS = ['postgresql', 'sqlite']
+
+
+def observations_due_in_window(start=None, end=None, partitions=None, n_partitions=None):
+    """Get the list of Observations which are ready to send now.
+
+    If `partitions` is given, only Observations whose `id % n_partitions`
+    is in that list are returned (see signalbox.send_workers).
+    """
 
     # this is yuck, but circulur imports are a pain
     from .observation import Observation
@@ -10,19 +29,80 @@ def observations_due_in_window(start=None, end=None):
     start = start or datetime.now()-timedelta(weeks=4)
     end = end or datetime.now()
 
-    # in the db
+    # in the db; next_eligible_at is only set for pending observations
     lookaboutright = Observation.objects.filter(
         status=0,
-        created_by_script__isnull=False,
-        due__range=(start, end)
+        next_eligible_at__range=(start, end)
     )
 
+    if partitions is not None:
+        lookaboutright = lookaboutright.annotate(
+            partition=F('id') % n_partitions).filter(partition__in=partitions)
+
     # in python
     actuallyready = [i for i in lookaboutright if i.ready_to_send()]
 
     return actuallyready
 
 
+def observations_past_completion_window(study, now=None):
+    """Get a queryset of a Study's unfinished Observations which have expired.
+
+    Observations expire once their Script's `completion_window` has elapsed
+    after `due`. Windows are set per Script, so the filter ORs together one
+    clause per distinct window used in the Study. A window of 0 means the
+    Observation never expires, as in `Observation.open_until`.
+    """
+
+    from .observation import Observation
+
+    now = now or datetime.now()
+
+    windows = Observation.objects.filter(
+        dyad__study=study,
+        status__in=EXPIRABLE_STATUSES,
+        created_by_script__completion_window__gt=0,
+    ).values_list('created_by_script__completion_window', flat=True).distinct()
+
+    expired = Q(pk__in=[])
+    for window in set(windows):
+        expired |= Q(created_by_script__completion_window=window,
+                     due__lt=now - timedelta(minutes=window))
+
+    return Observation.objects.filter(
+        expired, dyad__study=study, status__in=EXPIRABLE_STATUSES)
+
+
+def stale_next_eligible_at(queryset):
+    """Find Observations whose stored next_eligible_at is out of date.
+
+    Returns a dict mapping the correct value to a list of Observation ids.
+    """
+
+    candidates = queryset.filter(
+        Q(status=0) | Q(next_eligible_at__isnull=False)
+    ).select_related('dyad__study', 'created_by_script__script_type')
+
+    stale = defaultdict(list)
+    for obs in candidates.iterator():
+        correct = obs.compute_next_eligible_at()
+        if correct != obs.next_eligible_at:
+            stale[correct].append(obs.id)
+    return stale
+
+
+def refresh_next_eligible_at(queryset):
+    """Recompute next_eligible_at for a queryset of Observations -> int N updated.
+
+    Writes one UPDATE per distinct new value rather than one per row.
+    """
+
+    stale = stale_next_eligible_at(queryset)
+    for value, ids in stale.items():
+        queryset.model.objects.using(queryset.db).filter(id__in=ids).update(next_eligible_at=value)
+    return sum(len(ids) for ids in stale.values())
+
+
 def is_pending(observation):
     """Check the Observation is waiting to be 'done' -> Boolean.
 
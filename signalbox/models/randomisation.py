@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class RandomisationList(models.Model):
+    """A sealed, pre-generated sequence of allocations for one stratum of a Study.
+
+    Strata are StudySites; a list with no site is used for participants
+    without one. Slots are generated in permuted blocks from the
+    StudyCondition weights; see signalbox.allocation.generate_randomisation_list.
+    The seed is stored so the list can be regenerated for audit.
+    """
+
+    study = models.ForeignKey('signalbox.Study')
+    site = models.ForeignKey('signalbox.StudySite', blank=True, null=True)
+    seed = models.CharField(max_length=64)
+    block_sizes = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def remaining(self):
+        return self.randomisationslot_set.filter(membership__isnull=True).count()
+
+    class Meta:
+        app_label = 'signalbox'
+        ordering = ['study', 'site', 'created']
+
+    def __unicode__(self):
+        return "%s randomisation list (%s)" % (self.study, self.site or "no site")
+
+
+class RandomisationSlot(models.Model):
+    """One position in a RandomisationList; filled by a Membership when allocated."""
+
+    randomisation_list = models.ForeignKey('signalbox.RandomisationList')
+    sequence = models.PositiveIntegerField()
+    block = models.PositiveIntegerField()
+    condition = models.ForeignKey('signalbox.StudyCondition')
+    membership = models.OneToOneField('signalbox.Membership', blank=True, null=True)
+    allocated = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        app_label = 'signalbox'
+        ordering = ['randomisation_list', 'sequence']
+        unique_together = [('randomisation_list', 'sequence')]
+        index_together = [('randomisation_list', 'membership', 'sequence')]
+
+    def __unicode__(self):
+        return "%s #%s: %s" % (self.randomisation_list, self.sequence, self.condition.tag)
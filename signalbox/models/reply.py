@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime, timedelta
+import sqlite3
 from django.contrib import messages
-from django.db import models
+from django.db import connections, models
 
 from django.conf import settings
 User = settings.AUTH_USER_MODEL
@@ -33,8 +34,47 @@ ENTRY_METHOD_LOOKUP = {
 }
 
 
+# The canonical Reply for an Observation is one marked is_canonical_reply, or else the
+# last submitted (Replies never submitted come last), ties going to the highest id.
+CANONICAL_WINDOW_SQL = """signalbox_reply.observation_id IS NULL OR signalbox_reply.id IN (
+    SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY observation_id
+        ORDER BY is_canonical_reply DESC, CASE WHEN last_submit IS NULL THEN 1 ELSE 0 END,
+            last_submit DESC, id DESC) AS position
+        FROM signalbox_reply WHERE observation_id IS NOT NULL) ranked
+    WHERE position = 1)"""
+
+# the same, for databases without window functions
+CANONICAL_FALLBACK_SQL = """signalbox_reply.observation_id IS NULL OR NOT EXISTS (
+    SELECT 1 FROM signalbox_reply better
+    WHERE better.observation_id = signalbox_reply.observation_id
+    AND (better.is_canonical_reply > signalbox_reply.is_canonical_reply
+        OR (better.is_canonical_reply = signalbox_reply.is_canonical_reply AND (
+            (better.last_submit IS NOT NULL AND signalbox_reply.last_submit IS NULL)
+            OR better.last_submit > signalbox_reply.last_submit
+            OR ((better.last_submit = signalbox_reply.last_submit
+                OR (better.last_submit IS NULL AND signalbox_reply.last_submit IS NULL))
+                AND better.id > signalbox_reply.id)))))"""
+
+
+def has_window_functions(connection):
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    return connection.vendor in ['postgresql', 'oracle']
+
+
 class ReplyManager(models.Manager):
 
+    def canonical(self):
+        """Return the canonical Reply for each Observation (see Observation.canonical_reply).
+
+        Replies which don't belong to an Observation are all included. Filters
+        applied afterwards don't change which Reply is canonical.
+        """
+
+        windowed = has_window_functions(connections[self.db])
+        return self.get_queryset().extra(
+            where=[windowed and CANONICAL_WINDOW_SQL or CANONICAL_FALLBACK_SQL])
+
     def authorised(self, user):
         """Provide per-user access for Replies."""
 
@@ -108,6 +148,12 @@ class Reply(models.Model, ProcessManager):
         mapping.update({k: v.get('score', None) for k, v in list(self.asker.summary_scores(self).items())})
         return mapping
 
+    def has_archived_history(self):
+        """Whether any ReplyData (or versions) for this Reply have been archived."""
+
+        from signalbox.archive import has_archived_history
+        return has_archived_history(self)
+
     def add_data(self, key, value):
         """Add a ReplyData object for this Reply, save it, and return it.
         :type key: string
@@ -153,7 +199,7 @@ class Reply(models.Model, ProcessManager):
 
     redirect_to = models.CharField(max_length=1000, null=True, blank=True,)
 
-    last_submit = models.DateTimeField(null=True, blank=True, auto_now=True)
+    last_submit = models.DateTimeField(null=True, blank=True, auto_now=True, db_index=True)
 
     started = models.DateTimeField(null=True, blank=True, auto_now_add=True)
 
@@ -455,12 +455,17 @@ will not result in an error, but won't produce any output either. """))
             # return an rrule iterator containing the dates
             return rrule(FREQ_MAP[self.repeat], **kwargs)
 
-    def make_observations(self, membership):
+    def build_observations(self, membership, times=None):
+        """Return unsaved Observations for a membership -> [Observation].
+
+        `times` can be passed to reuse the result of datetimes() when building
+        Observations for many memberships randomised at the same time.
+        """
 
         from signalbox.models import Observation
 
-        times = self.datetimes(membership.date_randomised)
-        times_indexes = list(zip(times, list(range(1, len(list(times)) + 1))))
+        times = times if times is not None else list(self.datetimes(membership.date_randomised))
+        times_indexes = list(zip(times, list(range(1, len(times) + 1))))
 
         observations = []
         for time, index in times_indexes:
@@ -476,7 +481,11 @@ will not result in an error, but won't produce any output either. """))
                     dyad=membership,
                     created_by_script=self)
                 )
+        return observations
+
+    def make_observations(self, membership):
 
+        observations = self.build_observations(membership)
         [i.save() for i in observations]
 
         return observations
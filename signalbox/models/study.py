@@ -12,7 +12,7 @@ from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.core.validators import validate_comma_separated_integer_list
 from django.db import models
-from django.db.models import Count
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
 from django.apps import apps
 from django.template import Context, loader
 from signalbox.models import Reply, Answer
@@ -150,6 +150,23 @@ class Study(models.Model):
             return True
         return False
 
+    def next_working_datetime(self, when):
+        """Return the first datetime at or after `when` within working hours.
+
+        Returns None if the working hours are empty, in which case calls and
+        texts can never be made."""
+
+        workinghours = list(range(
+            self.working_day_starts, self.working_day_ends - 1))
+        if not workinghours:
+            return None
+        if when.hour in workinghours:
+            return when
+        start = when.replace(hour=self.working_day_starts, minute=0, second=0, microsecond=0)
+        if when.hour < self.working_day_starts:
+            return start
+        return start + timedelta(days=1)
+
     show_study_condition_to_user = models.BooleanField(default=False,
         help_text="""If True, the user will be able to see their condition on
         their homepage. Useful primarily for experiments where participants
@@ -166,6 +183,23 @@ class Study(models.Model):
         smallest group will only happen half of the time. To turn off adaptive
         randomisation set to 1.""")
 
+    RANDOMISATION_METHODS = [
+        ('adaptive', "Adaptive randomisation (see randomisation_probability)"),
+        ('blocked', "Pre-generated permuted blocks, stratified by site"),
+    ]
+
+    randomisation_method = models.CharField(max_length=20,
+        choices=RANDOMISATION_METHODS, default='adaptive',
+        help_text="""If 'blocked', participants are allocated from randomisation
+        lists generated in advance for each study site (see the
+        generate_randomisation_list command).""")
+
+    randomisation_block_sizes = models.CharField(max_length=100, default="1,2",
+        validators=[validate_comma_separated_integer_list],
+        help_text="""For blocked randomisation: possible block sizes, as
+        multiples of the total of the condition weights. For example '1,2' with
+        two equally weighted conditions gives blocks of 2 or 4.""")
+
     visible_profile_fields = models.CharField(max_length=200,
         blank=True, null=True, help_text="""Available profile fields
         for this study. Can be any of: {0}, separated by a space.""".format(
@@ -216,22 +250,27 @@ class Study(models.Model):
         """Return all :class:`Question`s used to record an :class:`Answer` for this class:`Study`."""
 
         answers = Answer.objects.filter(reply__observation__dyad__study=self)
-        questions = [i.question for i in answers if i.question]
-
-        return list(set(questions))
+        return list(Question.objects.filter(id__in=answers.values('question').distinct()))
 
     def observations_with_duplicate_replies(self):
+        """Observations with more than one Reply, annotated with num_replies and num_canonical."""
+
         Observation = apps.get_model('signalbox', 'Observation')
         obs = Observation.objects.filter(dyad__study=self)
         dupes = obs.annotate(
-            num_replies=Count('reply')).filter(num_replies__gt=1)
-        return dupes
+            num_replies=Count('reply'),
+            num_canonical=Sum(Case(When(reply__is_canonical_reply=True, then=Value(1)),
+                default=Value(0), output_field=IntegerField()))).filter(num_replies__gt=1)
+        return dupes.select_related('dyad__user', 'dyad__study')
 
     def unresolved_observations_with_duplicate_replies(self):
-        obs = self.observations_with_duplicate_replies()
-        unresolved = [i for i in obs if i.reply_set.filter(
-            is_canonical_reply=True).count() == 0]
-        return unresolved
+        return self.observations_with_duplicate_replies().filter(num_canonical=0)
+
+    def duplicate_reply_summary(self):
+        """Cached counts of duplicated and unresolved Observations; see signalbox.duplicates."""
+
+        from signalbox.duplicates import duplicate_reply_summary
+        return duplicate_reply_summary(self)
 
     def observations(self):
         Observation = apps.get_model('signalbox', 'Observation')
@@ -304,3 +343,20 @@ class StudyCondition(models.Model):
 
     def __unicode__(self):
         return "%s > %s " % (self.study.name, self.tag)
+
+
+class AllocationCounter(models.Model):
+    """Running count of Memberships allocated to a StudyCondition.
+
+    Kept in step with Membership.condition by listeners, so allocation can
+    read group sizes without counting Memberships. See signalbox.allocation.
+    """
+
+    condition = models.OneToOneField('signalbox.StudyCondition', related_name='allocation_counter')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        app_label = 'signalbox'
+
+    def __unicode__(self):
+        return "%s: %s allocated" % (self.condition, self.count)
@@ -12,6 +12,7 @@ from shortuuidfield import ShortUUIDField
 from phonenumber_field.modelfields import PhoneNumberField
 
 
+from signalbox.utilities.phone import normalise_phone, reversed_digits
 from .validators import is_number_from_study_area, is_mobile_number, is_landline
 from .study import StudySite, Study
 from .reply import Reply
@@ -42,6 +43,15 @@ class UserProfile(models.Model):
         validators=[is_number_from_study_area],
         help_text='mobile phone number, with international prefix')
 
+    # maintained by save(); see signalbox.utilities.phone
+    mobile_e164 = models.CharField(max_length=20, blank=True, null=True, db_index=True, editable=False)
+    mobile_reversed = models.CharField(max_length=20, blank=True, null=True, db_index=True,
+        editable=False)
+
+    def set_normalised_numbers(self):
+        self.mobile_e164 = normalise_phone(self.mobile)
+        self.mobile_reversed = reversed_digits(self.mobile_e164)
+
     def formatted_mobile(self):
         if self.mobile:
             return phonenumbers.format_number(self.mobile, phonenumbers.PhoneNumberFormat.INTERNATIONAL)
@@ -104,9 +114,14 @@ class UserProfile(models.Model):
         else:
             return self.mobile or self.landline
 
+    def dashboard(self):
+        """Task list and memberships for the user's home page; see signalbox.dashboard."""
+
+        from signalbox.dashboard import user_dashboard
+        return user_dashboard(self.user)
+
     def current_memberships(self):
-        memberships = [m for m in self.user.membership_set.all() if m.is_current()]
-        return memberships
+        return self.dashboard()['current_memberships']
 
     def previous_reply_set(self):
         """Returns a list of replies to be shown on the user's dashboard.
@@ -124,11 +139,10 @@ class UserProfile(models.Model):
         return Study.objects.all()
 
     def has_observation_expiring_today(self):
-        return sum([i.has_observation_expiring_today() for i in self.current_memberships()])
+        return self.dashboard()['expiring_today']
 
     def other_memberships(self):
-        memberships = [m for m in self.user.membership_set.all() if not m.is_current()]
-        return memberships
+        return self.dashboard()['other_memberships']
 
     def address_components(self):
         """Returns a list of address components."""
@@ -144,28 +158,18 @@ class UserProfile(models.Model):
     def tasklist_observations(self):
         """Returns Observations due for this User."""
 
-        obs = Observation.objects.filter(
-            dyad__in=self.user.membership_set.all(),
-            ).order_by('dyad__study')
-        # filter out those ready to go
-        obs = [i for i in obs
-            if i.ready_to_send()
-            and i.show_in_tasklist()
-            and i.can_add_answers()
-            ]
-        return obs
+        return self.dashboard()['tasks']
 
     def obs_by_study(self):
         """Returns list of tuples with Studies and Observations due for this User."""
 
-        obs = self.tasklist_observations()
-        # group by study
-        obs_by_study = [(i, list(j)) for i, j in itertools.groupby(obs, lambda x: x.dyad.study)]
-        obs_by_study = [(i, j) for i, j in obs_by_study if len(j)]
-        obs_by_study = [(i, sorted(j, key=lambda x: x.due))
-            for i, j in obs_by_study]
+        return self.dashboard()['by_study']
 
-        return obs_by_study
+    def save(self, *args, **kwargs):
+        self.set_normalised_numbers()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'mobile_e164', 'mobile_reversed'}
+        super(UserProfile, self).save(*args, **kwargs)
 
     def participant_admin_overview(self):
         return reverse('edit_participant', args=(self.user.id, ))
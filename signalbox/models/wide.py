@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class WideReply(models.Model):
+    """A Reply's Answers and export metadata, stored as one row for fast reads.
+
+    `answers` is a JSON object of variable_name: answer and `meta` a JSON
+    object of the columns in signalbox.export.ROW_FIELDS_MAP. Only kept when
+    settings.MATERIALISE_WIDE_REPLIES is on; see signalbox.wide.
+    """
+
+    reply = models.OneToOneField('signalbox.Reply', primary_key=True, related_name='wide')
+    asker = models.ForeignKey('ask.Asker', blank=True, null=True, on_delete=models.SET_NULL)
+    study = models.ForeignKey('signalbox.Study', blank=True, null=True, on_delete=models.SET_NULL)
+    answers = models.TextField(default="{}")
+    meta = models.TextField(default="{}")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'signalbox'
+        index_together = [('asker', 'study')]
+
+    def __unicode__(self):
+        return "Wide reply %s" % (self.reply_id, )
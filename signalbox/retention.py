@@ -0,0 +1,135 @@
+"""Remove old operational rows in small chunks, according to per-model policies.
+
+Each RetentionPolicy picks the rows of one model which are old enough to go,
+optionally restricted by other fields (e.g. Observation status or Reply
+entry_method). Rows are removed in keyset-paginated chunks, each in its own
+short transaction, so locks are only held briefly; an optional rate cap
+spreads the work out so it can run while the system is in use.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+FINAL_OBSERVATION_STATUSES = [1, -99, -999]
+
+
+class RetentionPolicy(object):
+    """Rows of `model` whose `date_field` is more than `days` old, filtered further by `filters`."""
+
+    def __init__(self, name, model, date_field, days, filters=None, excludes=None):
+        self.name = name
+        self.model = model
+        self.date_field = date_field
+        self.days = days
+        self.filters = filters or {}
+        self.excludes = excludes or {}
+
+    def get_model(self):
+        return apps.get_model(*self.model.split("."))
+
+    def candidates(self, now=None):
+        """Return a queryset of rows this policy would remove."""
+
+        cutoff = (now or datetime.now()) - timedelta(days=self.days)
+        rows = self.get_model().objects.filter(**{self.date_field + "__lt": cutoff})
+        rows = rows.filter(**self.filters)
+        if self.excludes:
+            rows = rows.exclude(**self.excludes)
+        return rows
+
+    def remove(self, rows):
+        """Remove a chunk of rows (a queryset)."""
+
+        rows.delete()
+
+
+def retention_policies():
+    """Return the configured RetentionPolicies, by name, skipping any without a number of days."""
+
+    policies = [
+        RetentionPolicy('empty_replies', 'signalbox.Reply', 'started',
+            settings.RETENTION_EMPTY_REPLY_DAYS, filters={'answer__isnull': True}),
+        RetentionPolicy('preview_replies', 'signalbox.Reply', 'started',
+            settings.RETENTION_PREVIEW_REPLY_DAYS, filters={'entry_method': 'preview'}),
+        # external_id rows link observations to Twilio callbacks, so are kept
+        RetentionPolicy('observation_data', 'signalbox.ObservationData', 'added',
+            settings.RETENTION_OBSERVATION_DATA_DAYS,
+            filters={'observation__status__in': FINAL_OBSERVATION_STATUSES},
+            excludes={'key': 'external_id'}),
+        RetentionPolicy('reply_data', 'signalbox.ReplyData', 'created',
+            settings.RETENTION_REPLY_DATA_DAYS, filters={'reply__complete': True}),
+        RetentionPolicy('text_message_callbacks', 'signalbox.TextMessageCallback', 'timestamp',
+            settings.RETENTION_TEXT_MESSAGE_CALLBACK_DAYS),
+        # only needed until every incremental export has run past them
+        RetentionPolicy('reply_changes', 'signalbox.ReplyChange', 'changed',
+            settings.RETENTION_REPLY_CHANGE_DAYS),
+    ]
+    return OrderedDict((p.name, p) for p in policies if p.days is not None)
+
+
+def apply_policy(policy, dry_run=False, chunk_size=None, max_rows_per_second=None,
+        now=None, progress=None):
+    """Remove the rows selected by a RetentionPolicy -> dict report.
+
+    Rows are taken in primary key order, `chunk_size` at a time, each chunk
+    in its own transaction. If `max_rows_per_second` is set, sleeps between
+    chunks to stay under it. Either left as None comes from settings, and 0
+    means no limit. `progress` is called with the running total after each
+    chunk. With dry_run, only counts the rows.
+    """
+
+    if chunk_size is None:
+        chunk_size = settings.RETENTION_CHUNK_SIZE
+    if max_rows_per_second is None:
+        max_rows_per_second = settings.RETENTION_MAX_ROWS_PER_SECOND
+    candidates = policy.candidates(now=now)
+    report = OrderedDict([('policy', policy.name), ('rows', 0), ('seconds', 0.0), ('rate', 0.0)])
+
+    if dry_run:
+        report['rows'] = candidates.count()
+        return report
+
+    started = time.time()
+    last = None
+    while True:
+        chunk = candidates.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        with transaction.atomic():
+            ids = chunk.values_list('pk', flat=True)
+            ids = list(ids[:chunk_size] if chunk_size else ids)
+            if not ids:
+                break
+            policy.remove(policy.get_model().objects.filter(pk__in=ids))
+        report['rows'] += len(set(ids))
+        last = ids[-1]
+        if progress:
+            progress(report['rows'])
+
+        if max_rows_per_second:
+            ahead = report['rows'] / float(max_rows_per_second) - (time.time() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    report['seconds'] = time.time() - started
+    report['rate'] = report['seconds'] and report['rows'] / report['seconds'] or 0.0
+    return report
+
+
+def apply_retention(names=None, policies=None, **kwargs):
+    """Apply the named (or all) retention policies -> list of reports; see apply_policy().
+
+    `policies` defaults to retention_policies(); see also signalbox.archive.archive_policies().
+    """
+
+    policies = policies or retention_policies()
+    names = names or list(policies.keys())
+    unknown = set(names) - set(policies.keys())
+    if unknown:
+        raise ValueError("Unknown retention policies: {}".format(", ".join(sorted(unknown))))
+    return [apply_policy(policies[name], **kwargs) for name in names]
@@ -0,0 +1,118 @@
+"""Score many Replies at once with ScoreSheets, e.g. after a ScoreSheet is changed.
+
+ScoreSheet.compute() scores one Reply, fetching its variables and mapping
+each Answer through its ChoiceSet in Python. bulk_scores() gives the same
+results for every Reply in a queryset of Answers: the (reply, question,
+answer) rows come from one query, scores are mapped through a lookup table
+built once per ChoiceSet, and pandas groupby computes each ScoreSheet's
+function per Reply, dropping scores from Replies with fewer than the
+minimum number of responses in the same pass.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from ask.models import Question
+from signalbox.models import ScoreSheet
+
+COLUMNS = ['reply', 'scoresheet', 'n', 'score']
+
+
+def scoresheets_for(answers):
+    """Return the ScoreSheets which use any of the Questions in a queryset of Answers."""
+
+    return ScoreSheet.objects.filter(variables__in=answers.values('question')).distinct()
+
+
+def _variables(scoresheets):
+    through = ScoreSheet.variables.through
+    return pd.DataFrame.from_records(list(through.objects.filter(
+        scoresheet__in=scoresheets).values_list('scoresheet_id', 'question_id')),
+        columns=['scoresheet', 'question'])
+
+
+def score_lookup(question_ids):
+    """Mapped scores for the choices of some Questions -> DataFrame of question, answer, mapped."""
+
+    rows = []
+    for q in Question.objects.filter(id__in=question_ids, choiceset__isnull=False).select_related(
+            'choiceset'):
+        rows += [(q.id, str(c.score), c.mapped_score) for c in q.choiceset.get_choices()]
+    return pd.DataFrame.from_records(rows, columns=['question', 'answer', 'mapped'])
+
+
+def _median_low(scores):
+    # statistics.median_low: the lower of the two middle values when there are an even number
+    ordered = scores.sort_values(['scoresheet', 'reply', 'value'])
+    position = ordered.groupby(['scoresheet', 'reply']).cumcount()
+    n = ordered.groupby(['scoresheet', 'reply'])['value'].transform('count')
+    middle = ordered[position == (n - 1) // 2]
+    return middle.set_index(['scoresheet', 'reply'])['value']
+
+
+def bulk_scores(scoresheets, answers):
+    """Score the Replies in a queryset of Answers with some ScoreSheets -> DataFrame.
+
+    Gives a row per ScoreSheet and Reply with any Answers to its variables,
+    with the number of scores used (n) and the score (NaN where
+    ScoreSheet.compute() would return None).
+    """
+
+    scoresheets = list(scoresheets)
+    variables = _variables(scoresheets)
+    if not len(variables):
+        return pd.DataFrame(columns=COLUMNS)
+
+    rows = answers.filter(question__in=set(variables['question'])).exclude(answer="").exclude(
+        answer__isnull=True).values_list('reply_id', 'question_id', 'answer')
+    long = pd.DataFrame.from_records(list(rows.iterator()), columns=['reply', 'question', 'answer'])
+    if not len(long):
+        return pd.DataFrame(columns=COLUMNS)
+
+    lookup = score_lookup(set(long['question']))
+    long = long.merge(lookup, how='left', on=['question', 'answer'])
+    long['value'] = pd.to_numeric(long['mapped'].fillna(long['answer']), errors='coerce')
+    long = long.merge(variables, on='question')
+    scores = long.dropna(subset=['value'])[['scoresheet', 'reply', 'value']]
+
+    groups = scores.groupby(['scoresheet', 'reply'])['value']
+    stats = pd.DataFrame({
+        'n': groups.count(),
+        'sum': groups.sum(),
+        'mean': groups.mean(),
+        'min': groups.min().round(0),
+        'max': groups.max().round(0),
+        'stdev': groups.std(ddof=1),
+        'median': _median_low(scores).round(0),
+    })
+
+    # replies whose answers to the variables are all non-numeric score nothing
+    everyone = long[['scoresheet', 'reply']].drop_duplicates().set_index(['scoresheet', 'reply'])
+    stats = stats.reindex(everyone.index)
+    stats['n'] = stats['n'].fillna(0).astype(int)
+
+    sheets = dict((s.id, s) for s in scoresheets)
+    sheet_ids = stats.index.get_level_values('scoresheet')
+    functions = np.array([sheets[i].function for i in sheet_ids])
+    minimum = np.array([sheets[i].minimum_number_of_responses_required or
+        int((variables['scoresheet'] == i).sum()) for i in sheet_ids])
+
+    score = pd.Series(np.nan, index=stats.index)
+    for function in set(functions):
+        score[functions == function] = stats.loc[functions == function, function]
+    score[stats['n'].values < minimum] = np.nan
+
+    result = pd.DataFrame({'n': stats['n'], 'score': score}).reset_index()
+    return result[COLUMNS].sort_values(['scoresheet', 'reply']).reset_index(drop=True)
+
+
+def score_columns(scoresheets, answers):
+    """Scores as columns, one per ScoreSheet, indexed by Reply -> DataFrame."""
+
+    scoresheets = list(scoresheets)
+    scores = bulk_scores(scoresheets, answers)
+    names = OrderedDict((s.id, "score_" + s.name.replace("-", "_")) for s in scoresheets)
+    scores['scoresheet'] = scores['scoresheet'].map(names)
+    wide = scores.pivot(index='reply', columns='scoresheet', values='score')
+    return wide.reindex(columns=[i for i in names.values() if i in wide.columns])
@@ -0,0 +1,149 @@
+"""Share sending of Observations between several processes or hosts.
+
+Observations are split into settings.SEND_PARTITIONS partitions by id. Each
+send_worker process registers a heartbeat in SendWorker and leases a fair
+share of partitions in SendPartitionLease. Leases are taken with a
+conditional UPDATE, so only one worker can own a partition at a time. A
+worker which stops renewing loses its partitions once its lease expires, and
+the remaining workers pick them up.
+
+Workers stop sending before their lease runs out, so the lease length must
+comfortably exceed clock skew between hosts.
+"""
+
+from datetime import datetime, timedelta
+import math
+import os
+import socket
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from signalbox.models import SendWorker, SendPartitionLease
+
+
+def default_worker_name():
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:6])
+
+
+def _ensure_partitions_exist(n_partitions):
+    existing = set(SendPartitionLease.objects.values_list('partition', flat=True))
+    missing = [SendPartitionLease(partition=i) for i in range(n_partitions) if i not in existing]
+    if missing:
+        try:
+            with transaction.atomic():
+                SendPartitionLease.objects.bulk_create(missing)
+        except IntegrityError:
+            # another worker created them first
+            pass
+
+
+def heartbeat(name, now=None):
+    """Record that worker `name` is alive."""
+
+    now = now or datetime.now()
+    updated = SendWorker.objects.filter(name=name).update(heartbeat=now)
+    if not updated:
+        SendWorker.objects.create(name=name, heartbeat=now)
+
+
+def live_workers(now=None, lease_seconds=None):
+    """Return names of workers whose heartbeat is more recent than one lease period."""
+
+    now = now or datetime.now()
+    lease_seconds = lease_seconds or settings.SEND_LEASE_SECONDS
+    cutoff = now - timedelta(seconds=lease_seconds)
+    return list(SendWorker.objects.filter(heartbeat__gte=cutoff).values_list('name', flat=True))
+
+
+def claim_partitions(name, n_partitions=None, lease_seconds=None, now=None):
+    """Renew, rebalance and claim partition leases for worker `name`.
+
+    Returns a tuple: (list of partitions owned, datetime the leases expire).
+    """
+
+    n_partitions = n_partitions or settings.SEND_PARTITIONS
+    lease_seconds = lease_seconds or settings.SEND_LEASE_SECONDS
+    now = now or datetime.now()
+    expires = now + timedelta(seconds=lease_seconds)
+
+    _ensure_partitions_exist(n_partitions)
+    heartbeat(name, now=now)
+
+    workers = set(live_workers(now=now, lease_seconds=lease_seconds)) | {name}
+    fair_share = int(math.ceil(n_partitions / float(len(workers))))
+
+    leases = SendPartitionLease.objects.filter(partition__lt=n_partitions)
+
+    # renew leases we still hold; expired ones may already belong to someone else
+    leases.filter(owner=name, expires__gte=now).update(expires=expires)
+    owned = list(leases.filter(owner=name, expires__gte=now).values_list('partition', flat=True))
+
+    # hand back any surplus when new workers have joined
+    surplus = owned[fair_share:]
+    if surplus:
+        leases.filter(owner=name, partition__in=surplus).update(owner="", expires=None)
+        owned = owned[:fair_share]
+
+    # take over free or expired partitions, one conditional UPDATE each
+    free = Q(owner="") | Q(expires__isnull=True) | Q(expires__lt=now)
+    candidates = leases.filter(free).exclude(owner=name).values_list('partition', flat=True)
+    for partition in candidates:
+        if len(owned) >= fair_share:
+            break
+        if leases.filter(free, partition=partition).update(owner=name, expires=expires):
+            owned.append(partition)
+
+    return (sorted(owned), expires)
+
+
+def release_partitions(name):
+    """Give up all leases held by worker `name` and deregister it."""
+
+    SendPartitionLease.objects.filter(owner=name).update(owner="", expires=None)
+    SendWorker.objects.filter(name=name).delete()
+
+
+def execute_partitioned_todo_list(partitions, lease_expires, n_partitions=None):
+    """do() the Observations due in `partitions`, stopping before the lease expires.
+
+    Returns a list of tuples (Observation, result) like execute_the_todo_list().
+    """
+    from signalbox.models.observation_timing_functions import observations_due_in_window
+
+    if not partitions:
+        return []
+
+    n_partitions = n_partitions or settings.SEND_PARTITIONS
+    todo = observations_due_in_window(partitions=partitions, n_partitions=n_partitions)
+
+    results = []
+    for observation in todo:
+        if datetime.now() >= lease_expires:
+            break
+        results.append((observation, observation.do()))
+    return results
+
+
+def run_worker(name=None, interval=30, once=False, n_partitions=None, lease_seconds=None):
+    """Claim partitions and send Observations in them until interrupted."""
+
+    name = name or default_worker_name()
+    lease_seconds = lease_seconds or settings.SEND_LEASE_SECONDS
+    # stop sending with some of the lease left, so renewal can't race a takeover
+    margin = timedelta(seconds=lease_seconds / 4.0)
+
+    try:
+        while True:
+            partitions, expires = claim_partitions(
+                name, n_partitions=n_partitions, lease_seconds=lease_seconds)
+            results = execute_partitioned_todo_list(
+                partitions, expires - margin, n_partitions=n_partitions)
+            yield (partitions, results)
+            if once:
+                break
+            time.sleep(interval)
+    finally:
+        release_partitions(name)
@@ -47,6 +47,7 @@ OB_DATA_TYPES = [
     ('failure', "Failure"),
     ('created', "Created"),
     ('timeshift', "Timeshift"),
+    ('expired', "Expired"),
 ]
 
 
@@ -0,0 +1,74 @@
+from django.contrib import admin
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from ask.models import Question
+from signalbox.models import Study, Membership, Observation, Reply, Answer
+from signalbox.tests.helpers import make_user
+from signalbox.utilities.paginator import EstimatedCountPaginator
+
+
+class TestChangelistQueries(TestCase):
+    """Changelist pages should take the same number of queries however many rows they show."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        admin_user = make_user({'username': "ADMIN", 'email': "ADMIN@TEST.COM", 'password': "TEST",
+            'is_staff': True, 'is_superuser': True})
+        self.client.login(username="ADMIN", password="TEST")
+
+        questions = Question.objects.all()[:3]
+        for i in range(3):
+            user = make_user({'username': "TEST{}".format(i), 'email': "TEST@TEST.COM",
+                'password': "TEST"})
+            for slug in ['test-schedule-study', 'test-allocation-study']:
+                Membership(study=Study.objects.get(slug=slug), user=user).save()
+            for obs in Observation.objects.filter(dyad__user=user)[:3]:
+                reply = Reply(observation=obs, asker=obs.asker, user=admin_user)
+                reply.save()
+                for q in questions:
+                    Answer(reply=reply, question=q, answer="1").save()
+
+    def queries_for_page(self, model, per_page):
+        modeladmin = admin.site._registry[model]
+        default = modeladmin.list_per_page
+        modeladmin.list_per_page = per_page
+        try:
+            url = reverse('admin:signalbox_{}_changelist'.format(model._meta.model_name))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            assert response.status_code == 200
+        finally:
+            modeladmin.list_per_page = default
+        return len(queries)
+
+    def assert_constant_queries(self, model):
+        assert model.objects.count() > 2
+        self.assertEqual(self.queries_for_page(model, 1), self.queries_for_page(model, 100))
+
+    def test_membership_changelist(self):
+        self.assert_constant_queries(Membership)
+
+    def test_observation_changelist(self):
+        self.assert_constant_queries(Observation)
+
+    def test_reply_changelist(self):
+        self.assert_constant_queries(Reply)
+
+    def test_answer_changelist(self):
+        self.assert_constant_queries(Answer)
+
+    def test_questions_answered_counts(self):
+        modeladmin = admin.site._registry[Membership]
+        assert 'n_answers' not in modeladmin.get_queryset(None).query.annotations
+        response = self.client.get(reverse('admin:signalbox_membership_changelist'))
+        memberships = list(response.context['cl'].result_list)
+        assert any(modeladmin.questions_answered(i) for i in memberships)
+        for membership in memberships:
+            assert modeladmin.questions_answered(membership) == membership.questions_answered()
+
+    def test_paginator_counts_small_tables(self):
+        paginator = EstimatedCountPaginator(Answer.objects.all(), 10)
+        self.assertEqual(paginator.count, Answer.objects.count())
@@ -6,13 +6,16 @@ from operator import gt, mul
 import itertools
 import random
 import statistics as stats
+import threading
 from collections import Counter
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 
-from signalbox.models import Study, Membership
-from signalbox.allocation import allocate
+from signalbox.models import Study, StudyCondition, Membership
+from signalbox.allocation import (allocate, weighted_choice, permuted_blocks,
+    generate_randomisation_list)
 from signalbox.tests.helpers import make_user
 
 
@@ -67,3 +70,85 @@ class Test_Allocation(TestCase):
 
         meanp = stats.lmean([.00001] + [_get_p_for_allocation(study, users, i) for i in ratios])
         assert meanp > .05
+
+
+class Test_ConcurrentAllocation(TransactionTestCase):
+    """Allocate many Memberships in parallel and check groups stay balanced."""
+
+    fixtures = ['test.json', ]
+
+    def test_parallel_minimisation(self):
+        study = Study.objects.get(slug='test-allocation-study')
+        study.auto_randomise = False
+        study.randomisation_probability = 0  # always allocate to the smallest group
+        study.save()
+        groups = list(study.studycondition_set.all())
+        [setattr(i, 'weight', 1) for i in groups]
+        [i.save() for i in groups]
+        study.membership_set.all().delete()
+
+        users = [make_user({'username': 'stress{}'.format(i), 'email': 'stress{}@TEST.COM'.format(i),
+            'password': 'x'}) for i in range(len(groups) * 10)]
+
+        def allocate_user(user):
+            try:
+                allocate(Membership(study=study, user=user))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate_user, args=(u,)) for u in users]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+
+        counts = [i.membership_set.count() for i in groups]
+        assert sum(counts) == len(users)
+        assert max(counts) - min(counts) <= 1
+
+        counters = [i.allocation_counter.count for i in StudyCondition.objects.filter(study=study)]
+        assert sorted(counters) == sorted(counts)
+
+    def test_weighted_choice_respects_weights(self):
+        draws = Counter(weighted_choice([("a", 1), ("b", 0), ("c", 3)]) for i in range(4000))
+        assert draws["b"] == 0
+        assert 2.5 < draws["c"] / float(draws["a"]) < 3.5
+
+
+class Test_BlockedRandomisation(TestCase):
+    """Allocation from pre-generated permuted-block lists."""
+
+    fixtures = ['test.json', ]
+
+    def test_blocks_are_balanced_and_reproducible(self):
+        study = Study.objects.get(slug='test-allocation-study')
+        conditions = list(study.studycondition_set.all().order_by('id'))
+        total = sum(i.weight for i in conditions)
+
+        blocks = list(permuted_blocks(conditions, [1, 2], "seed", 20))
+        assert blocks == list(permuted_blocks(conditions, [1, 2], "seed", 20))
+        for _, slots in blocks:
+            assert len(slots) in (total, total * 2)
+            counts = Counter(slots)
+            [self.assertEqual(counts[c] * total, c.weight * len(slots)) for c in conditions]
+
+    def test_allocation_pops_slots_in_order(self):
+        study = Study.objects.get(slug='test-allocation-study')
+        study.auto_randomise = False
+        study.randomisation_method = 'blocked'
+        study.save()
+        study.membership_set.all().delete()
+
+        rlist = generate_randomisation_list(study, n_blocks=2, seed="abc")
+        expected = [i.condition for i in rlist.randomisationslot_set.all()]
+
+        users = [make_user({'username': 'block{}'.format(i), 'email': 'block{}@TEST.COM'.format(i),
+            'password': 'x'}) for i in range(len(expected))]
+        mems = [Membership(study=study, user=u) for u in users]
+        [allocate(m) for m in mems]
+
+        assert [m.condition for m in mems] == expected
+        assert rlist.remaining() == 0
+
+        extra = Membership(study=study, user=make_user(
+            {'username': 'blockextra', 'email': 'blockextra@TEST.COM', 'password': 'x'}))
+        success, _ = allocate(extra)
+        assert success is False
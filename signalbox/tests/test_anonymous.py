@@ -0,0 +1,71 @@
+import json
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from ask.models import Question
+from signalbox.anonymous import question_metadata
+from signalbox.models import Reply, Answer
+from signalbox.views.data import _anonymous_part
+
+
+class TestAnonymousDownload(TestCase):
+    """Check anonymous downloads stream in pages and answer conditional requests."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        cache.clear()
+        question = Question.objects.exclude(variable_name="").filter(page__isnull=False)[0]
+        self.asker = question.page.asker
+        self.asker.allow_unauthenticated_download_of_anonymous_data = True
+        self.asker.save()
+        self.questions = list(Question.objects.filter(page__asker=self.asker).exclude(variable_name=""))
+        for i in range(3):
+            reply = Reply(asker=self.asker)
+            reply.save()
+            for q in self.questions:
+                Answer(reply=reply, question=q, answer=str(i)).save()
+        self.n = Answer.objects.filter(reply__asker=self.asker).count()
+        self.url = reverse('stream_anonymous_asker_data', args=[self.asker.anonymous_download_token])
+
+    def test_stream_pages(self):
+        seen, url = [], self.url + "?limit=2"
+        while url:
+            response = self.client.get(url)
+            assert response['Content-Type'] == 'application/x-ndjson'
+            lines = [json.loads(i) for i in b"".join(response.streaming_content).decode('utf-8').splitlines()]
+            assert len(lines) <= 2
+            seen.extend(lines)
+            url = response.has_header('Link') and response['Link'].split(">")[0].lstrip("<") or None
+
+        assert len(seen) == self.n
+        assert [i['id'] for i in seen] == sorted(i['id'] for i in seen)
+        assert self.client.get(self.url + "?after=x").status_code == 400
+        for query in ["?limit=0", "?limit=-3", "?after=-1"]:
+            assert self.client.get(self.url + query).status_code == 400
+
+    def test_unchanged_data_is_not_modified(self):
+        response = self.client.get(self.url)
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert again.status_code == 304
+
+        Answer(reply=Reply.objects.filter(asker=self.asker)[0], question=self.questions[0],
+            answer="new").save()
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+
+    def test_metadata_queries_do_not_grow_with_answers(self):
+        with self.assertNumQueries(1):
+            metadata = question_metadata(self.asker)
+        assert set(i for i, d in metadata) >= set(q.id for q in self.questions)
+        with self.assertNumQueries(0):
+            question_metadata(self.asker)
+
+        self.questions[0].save()
+        with self.assertNumQueries(1):
+            question_metadata(self.asker)
+
+    def test_legacy_data_part(self):
+        data = json.loads(_anonymous_part(self.asker, 'data'))
+        assert len(data) == self.n
+        assert set(['variable_name', 'reply', 'answer']) <= set(data[0].keys())
+        assert len(json.loads(_anonymous_part(self.asker, 'metadata'))) >= len(self.questions)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+import shutil
+import tempfile
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from signalbox.archive import archive_policies, archived_objects, has_archived_history
+from signalbox.models import Study, Membership, ObservationData, ArchiveChunk
+from signalbox.retention import apply_retention
+from signalbox.tests.helpers import make_user
+
+
+class TestArchive(TestCase):
+    """Check old ObservationData is moved to archive files and can be read back."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_archive_and_read_through(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        obs, other = membership.observation_set.all()[:2]
+
+        for o in [obs, other]:
+            for i in range(3):
+                ObservationData.objects.create(observation=o, key="attempt", value="try {}".format(i))
+        external = ObservationData.objects.create(observation=obs, key="external_id", value="SM123")
+        ObservationData.objects.update(added=datetime.now() - timedelta(days=400))
+        recent = ObservationData.objects.create(observation=obs, key="reminder")
+        n_old = ObservationData.objects.exclude(id__in=[recent.id, external.id]).count()
+
+        with override_settings(ARCHIVE_ROOT=self.root):
+            report, = apply_retention(['observation_data'], policies=archive_policies(),
+                chunk_size=4, max_rows_per_second=0)
+
+        assert report['rows'] == n_old
+        assert set(ObservationData.objects.all()) == set([recent, external])
+        assert ArchiveChunk.objects.filter(study=study).count() == (n_old + 3) // 4
+        assert has_archived_history(obs)
+
+        archived = archived_objects(obs, model='signalbox.ObservationData')
+        assert set(i.value for i in archived if i.key == "attempt") == set(["try 0", "try 1", "try 2"])
+        assert all(i.observation_id == obs.id for i in archived)
+
+        make_user({'username': "ADMIN", 'email': "ADMIN@TEST.COM", 'password': "TEST",
+            'is_staff': True, 'is_superuser': True})
+        self.client.login(username="ADMIN", password="TEST")
+        with override_settings(ARCHIVE_ROOT=self.root):
+            response = self.client.get(reverse('admin:signalbox_observation_change', args=[obs.id]))
+        assert "try 2" in response.content.decode('utf-8')
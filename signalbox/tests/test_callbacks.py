@@ -0,0 +1,47 @@
+import json
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from signalbox.callbacks import ingest_all_text_message_callbacks
+from signalbox.models import (Study, Membership, ObservationData, PendingTextMessageCallback,
+    TextMessageCallback)
+from signalbox.tests.helpers import make_user
+
+
+class TestCallbackIngestion(TestCase):
+    """Check queued Twilio callbacks are deduplicated and linked in bulk."""
+
+    fixtures = ['test.json', ]
+
+    def test_queue_and_ingest(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        profile = user.userprofile
+        profile.mobile = "+447700900123"
+        profile.save()
+        membership = Membership(study=study, user=user)
+        membership.save()
+        obs = membership.observation_set.all()[0]
+        ObservationData.objects.create(observation=obs, key="external_id", value="SM1")
+
+        for sid, status in [("SM1", "sent"), ("SM1", "sent"), ("SM1", "delivered"), ("SM2", "sent")]:
+            response = self.client.post(reverse('sms_callback'), {'SmsSid': sid, 'SmsStatus': status,
+                'From': "+441234567890", 'To': "+447700900123"})
+            assert response.status_code == 200
+        assert PendingTextMessageCallback.objects.count() == 4
+        assert TextMessageCallback.objects.count() == 0
+
+        taken, saved = ingest_all_text_message_callbacks(batch_size=3)
+        assert (taken, saved) == (4, 3)
+        assert not PendingTextMessageCallback.objects.exists()
+
+        callbacks = TextMessageCallback.objects.all()
+        assert set(callbacks.values_list('sid', 'status')) == set(
+            [("SM1", "sent"), ("SM1", "delivered"), ("SM2", "sent")])
+        assert all(i.likely_related_user == user for i in callbacks)
+        assert set(obs.sms_replies()) == set(callbacks.filter(sid="SM1"))
+        assert callbacks.get(sid="SM2").observation is None
+
+        # a repeat delivered later is dropped too
+        PendingTextMessageCallback.objects.create(sid="SM2", status="sent",
+            post=json.dumps({'SmsSid': "SM2", 'SmsStatus': "sent"}))
+        assert ingest_all_text_message_callbacks() == (1, 0)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from signalbox.models import Study, Membership, Reply
+from signalbox.models.reply import CANONICAL_FALLBACK_SQL, CANONICAL_WINDOW_SQL, has_window_functions
+from signalbox.tests.helpers import make_user
+
+
+class TestCanonicalReplies(TestCase):
+    """Check the set-based canonical replies match Observation.canonical_reply()."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        self.observations = list(membership.observation_set.all()[:4])
+        now = datetime.now()
+
+        # latest submitted wins
+        for days in [3, 1, 2]:
+            r = Reply(observation=self.observations[0], asker=self.observations[0].asker)
+            r.save()
+            Reply.objects.filter(id=r.id).update(last_submit=now - timedelta(days=days))
+        # a reply marked canonical wins over a later one
+        for days, canonical in [(5, True), (1, False)]:
+            r = Reply(observation=self.observations[1], asker=self.observations[1].asker,
+                is_canonical_reply=canonical)
+            r.save()
+            Reply.objects.filter(id=r.id).update(last_submit=now - timedelta(days=days))
+        # never-submitted replies come last
+        for last_submit in [None, now - timedelta(days=7)]:
+            r = Reply(observation=self.observations[2], asker=self.observations[2].asker)
+            r.save()
+            Reply.objects.filter(id=r.id).update(last_submit=last_submit)
+        self.anonymous = Reply(asker=self.observations[0].asker)
+        self.anonymous.save()
+
+    def expected(self):
+        return set(o.canonical_reply() for o in self.observations if o.canonical_reply()) | \
+            set([self.anonymous])
+
+    def test_canonical_matches_per_observation(self):
+        with self.assertNumQueries(1):
+            canonical = set(Reply.objects.canonical().filter(
+                Q(observation__in=self.observations) | Q(id=self.anonymous.id)))
+        assert canonical == self.expected()
+        assert self.observations[1].canonical_reply().is_canonical_reply
+        assert self.observations[2].canonical_reply().last_submit is not None
+
+    def test_fallback_matches_window_functions(self):
+        fallback = set(Reply.objects.extra(where=[CANONICAL_FALLBACK_SQL]))
+        assert fallback >= self.expected()
+        if has_window_functions(connection):
+            assert set(Reply.objects.extra(where=[CANONICAL_WINDOW_SQL])) == fallback
@@ -0,0 +1,110 @@
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from django.test import TestCase
+from django.test.utils import override_settings
+from ask.models import Question
+from signalbox.changes import changed_replies, export_changes, merge_deltas, read_delta
+from signalbox.models import Study, Membership, Reply, Answer, ExportProfile, ReplyChange
+from signalbox.tests.helpers import make_user
+
+
+@override_settings(EXPORT_OVERLAP_SECONDS=0)
+class TestIncrementalExport(TestCase):
+    """Check deltas contain only changed replies and merge into a mirror matching a full export."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        self.membership = membership
+        self.questions = Question.objects.filter(variable_name__isnull=False)[:2]
+        self.replies = []
+        for obs in membership.observation_set.all()[:3]:
+            reply = Reply(observation=obs, asker=obs.asker)
+            reply.save()
+            for q in self.questions:
+                Answer(reply=reply, question=q, answer="1").save()
+            self.replies.append(reply)
+
+        self.profile = ExportProfile(name="nightly")
+        self.profile.save()
+        self.profile.studies.add(study)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def backdate(self, when):
+        Answer.objects.all().update(last_modified=when)
+        Reply.objects.all().update(last_submit=when)
+
+    def mirror_rows(self, mirror, table):
+        connection = sqlite3.connect(mirror)
+        rows = connection.execute("SELECT * FROM {} ORDER BY reply".format(table)).fetchall()
+        connection.close()
+        return rows
+
+    def test_deltas_merge_to_full_export(self):
+        start = datetime.now()
+        self.backdate(start - timedelta(days=2))
+        first = export_changes(self.profile, self.directory, now=start - timedelta(days=1))
+        assert first['since'] is None and first['upserts'] == 3
+
+        # one answer changed and one reply removed
+        changed = Answer.objects.filter(reply=self.replies[0])[0]
+        changed.answer = "2"
+        changed.save()
+        removed = self.replies[1].id
+        self.replies[1].delete()
+
+        second = export_changes(self.profile, self.directory, now=start + timedelta(seconds=1))
+        assert (second['upserts'], second['deletions']) == (1, 1)
+        delta = read_delta(second['path'])
+        assert list(delta['answers'].index) == [self.replies[0].id]
+        assert delta['deleted'] == [removed]
+
+        mirror = self.directory + "/mirror.sqlite"
+        assert len(merge_deltas(mirror, [second['path'], first['path']])) == 2
+        # already applied deltas are skipped
+        assert merge_deltas(mirror, [second['path']]) == []
+
+        self.profile.watermark = None
+        self.profile.save()
+        full = export_changes(self.profile, self.directory + "/full", full=True)
+        fresh = self.directory + "/fresh.sqlite"
+        merge_deltas(fresh, [full['path']])
+        for table in ['answers', 'meta']:
+            assert self.mirror_rows(mirror, table) == self.mirror_rows(fresh, table)
+
+    def test_nothing_changed(self):
+        now = datetime.now()
+        self.backdate(now - timedelta(days=2))
+        self.profile.watermark = now - timedelta(days=1)
+        self.profile.save()
+        report = export_changes(self.profile, self.directory, now=now)
+        assert (report['upserts'], report['deletions']) == (0, 0)
+        assert ExportProfile.objects.get(pk=self.profile.pk).watermark == now
+
+    def test_membership_changes_are_logged(self):
+        since = datetime.now() - timedelta(seconds=1)
+        self.backdate(since - timedelta(days=1))
+        self.membership.save()
+        assert changed_replies(self.profile.studies.all(), since) == (set(), set())
+
+        self.membership.date_randomised = date(2000, 1, 1)
+        self.membership.save()
+        changed, deleted = changed_replies(self.profile.studies.all(), since)
+        assert changed == set(i.id for i in self.replies)
+
+    def test_deleted_reply_logged_once(self):
+        ReplyChange.objects.all().delete()
+        removed = self.replies[0].id
+        self.replies[0].delete()
+        assert list(ReplyChange.objects.values_list('reply_id', 'deleted')) == [(removed, True)]
+        Answer.objects.filter(reply=self.replies[1])[0].delete()
+        assert ReplyChange.objects.filter(reply_id=self.replies[1].id, deleted=False).count() == 1
@@ -0,0 +1,60 @@
+import json
+from django.core.cache import cache
+from django.test import TestCase
+from ask.models import Question
+from signalbox.codebook import FILENAMES, codebook_questions, codebooks, render_codebook, spss_codebook
+from signalbox.models import Study, Membership, Reply, Answer
+from signalbox.tests.helpers import make_user
+
+
+class TestCodebook(TestCase):
+    """Check codebooks find questions in one query and are cached until questionnaires change."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        cache.clear()
+        self.study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=self.study, user=user)
+        membership.save()
+        self.questions = list(Question.objects.exclude(variable_name="")[:5])
+        for obs in membership.observation_set.all()[:3]:
+            reply = Reply(observation=obs, asker=obs.asker)
+            reply.save()
+            for q in self.questions:
+                Answer(reply=reply, question=q, answer="1").save()
+        self.answers = Answer.objects.filter(reply__observation__dyad__study=self.study)
+
+    def test_questions_found_in_one_query(self):
+        with self.assertNumQueries(1):
+            questions = codebook_questions(self.answers)
+            [q.choiceset for q in questions]
+        assert set(questions) == set(self.questions)
+        assert set(self.study.questions_used()) == set(self.questions)
+
+    def test_formats(self):
+        files = codebooks(self.answers)
+        assert list(files.keys()) == list(FILENAMES.values())
+        variables = json.loads(files['codebook.json'])['variables']
+        assert sorted(i['variable_name'] for i in variables) == sorted(
+            q.variable_name for q in self.questions)
+        for q in self.questions:
+            assert q.variable_name in files['make_labels.do']
+            assert q.variable_name in files['labels.sps']
+            assert q.variable_name in files['labels.R']
+
+    def test_cached_until_questionnaires_change(self):
+        questions = codebook_questions(self.answers)
+        first = render_codebook(questions, 'spss')
+        with self.assertNumQueries(0):
+            assert render_codebook(questions, 'spss') == first
+
+        self.questions[0].text = "A \"new\" label"
+        self.questions[0].save()
+        assert '"A ""new"" label"' in render_codebook(codebook_questions(self.answers), 'spss')
+
+    def test_long_spss_labels_are_truncated_before_quoting(self):
+        self.questions[0].text = "x" * 249 + "\"" + "y" * 20
+        line = spss_codebook(self.questions[:1]).splitlines()[1]
+        assert line == '  {} "{}"""'.format(self.questions[0].variable_name, "x" * 249)
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, time as dtime
+from unittest import skipUnless
+from django.test import TestCase
+from django.test.client import RequestFactory
+from ask.models import ChoiceSet, Question
+from signalbox.columnar import columnar_available, write_columnar
+from signalbox.models import Study, Membership, Reply, Answer
+from signalbox.tests.helpers import make_user
+from signalbox.views.data import export_answers
+
+if columnar_available():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+def make_questions():
+    choices = ChoiceSet.objects.create(name="columnar-choices",
+        yaml={1: {'score': 1, 'label': 'Never'}, 2: {'score': 2, 'label': 'Often'}})
+    specs = [('col_int', 'integer', None), ('col_date', 'date', None), ('col_time', 'time', None),
+        ('col_boxes', 'checkboxes', choices), ('col_likert', 'likert', choices),
+        ('col_text', 'short-text', None)]
+    return [Question.objects.create(variable_name=v, q_type=t, choiceset=c, text=v)
+        for v, t, c in specs]
+
+
+@skipUnless(columnar_available(), "pyarrow is not installed")
+class TestColumnarExport(TestCase):
+    """Check answers are exported as typed columns, with row groups per study."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        self.questions = make_questions()
+        self.directory = tempfile.mkdtemp()
+        values = {'col_int': "42", 'col_date': "2016-03-01", 'col_time': "09:30",
+            'col_boxes': "['1', '2']", 'col_likert': "2", 'col_text': "hello"}
+
+        for n, slug in enumerate(['test-schedule-study', 'test-allocation-study']):
+            user = make_user({'username': "TEST{}".format(n), 'email': "TEST@TEST.COM",
+                'password': "TEST"})
+            membership = Membership(study=Study.objects.get(slug=slug), user=user)
+            membership.save()
+            obs = membership.observation_set.all()[0]
+            reply = Reply(observation=obs, asker=obs.asker)
+            reply.save()
+            for q in self.questions:
+                Answer(reply=reply, question=q, answer=values[q.variable_name]).save()
+        # an answer which isn't a number is exported as missing
+        Answer.objects.filter(question__variable_name='col_int').exclude(
+            reply__observation__dyad__study__slug='test-schedule-study').update(answer="n/a")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_typed_parquet(self):
+        path = os.path.join(self.directory, "export.parquet")
+        answers = Answer.objects.filter(question__in=self.questions)
+        assert write_columnar(answers, path, self.questions) == 2
+
+        parquet = pq.ParquetFile(path)
+        assert parquet.num_row_groups == 2
+        table = parquet.read()
+        schema = table.schema
+        assert schema.field('col_int').type == pa.int64()
+        assert schema.field('col_date').type == pa.date32()
+        assert schema.field('col_time').type == pa.time64('us')
+        assert schema.field('col_boxes').type == pa.list_(pa.int64())
+        assert pa.types.is_dictionary(schema.field('col_likert').type)
+
+        rows = dict((r['study'], r) for r in table.to_pandas().to_dict('records'))
+        first = rows['test-schedule-study']
+        assert first['col_int'] == 42 and first['col_date'] == date(2016, 3, 1)
+        assert first['col_time'] == dtime(9, 30)
+        assert list(first['col_boxes']) == [1, 2]
+        assert first['col_likert'] == "Often" and first['col_text'] == "hello"
+        assert rows['test-allocation-study']['col_int'] != rows['test-allocation-study']['col_int']
+
+    def test_arrow(self):
+        path = os.path.join(self.directory, "export.arrow")
+        write_columnar(Answer.objects.filter(question__in=self.questions), path, self.questions,
+            file_format='arrow')
+        reader = pa.RecordBatchFileReader(pa.OSFile(path))
+        assert reader.num_record_batches == 2
+        assert reader.read_all().num_rows == 2
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_against_xlsx(self):
+        n_answers = int(os.environ.get('SIGNALBOX_BENCHMARK_ANSWERS', 1000000))
+        template = Reply.objects.filter(answer__isnull=False)[0]
+        per_reply = len(self.questions)
+        replies = [Reply(observation=template.observation, asker=template.asker,
+            token="bench{}".format(i)) for i in range(n_answers // per_reply)]
+        Reply.objects.bulk_create(replies, batch_size=5000)
+        ids = Reply.objects.filter(token__startswith="bench").values_list('id', flat=True)
+        Answer.objects.bulk_create([Answer(reply_id=r, question=q, answer="1")
+            for r in ids for q in self.questions], batch_size=5000)
+        answers = Answer.objects.filter(question__in=self.questions)
+
+        start = time.time()
+        export_answers(RequestFactory().get("/"), answers)
+        xlsx = time.time() - start
+
+        start = time.time()
+        write_columnar(answers, os.path.join(self.directory, "bench.parquet"), self.questions)
+        parquet = time.time() - start
+        print("{} answers: xlsx {:.1f}s, parquet {:.1f}s".format(answers.count(), xlsx, parquet))
@@ -0,0 +1,65 @@
+import os
+import time
+from datetime import datetime, timedelta
+from unittest import skipUnless
+from django.test import TestCase
+from signalbox.dashboard import build_dashboard, user_dashboard
+from signalbox.models import Study, Membership, Observation
+from signalbox.tests.helpers import make_user
+
+
+def slow_tasklist(user):
+    """The per-Observation checks the dashboard replaces."""
+    obs = Observation.objects.filter(dyad__user=user)
+    return [i for i in obs if i.ready_to_send() and i.show_in_tasklist() and i.can_add_answers()]
+
+
+class TestDashboard(TestCase):
+    """Check the participant dashboard matches the per-observation checks."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        self.user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        for slug in ['test-schedule-study', 'test-allocation-study', 'demo-study']:
+            Membership(study=Study.objects.get(slug=slug), user=self.user).save()
+        Observation.objects.filter(dyad__user=self.user).update(
+            due=datetime.now() - timedelta(minutes=5))
+
+    def test_tasklist_matches_per_observation_checks(self):
+        dashboard = build_dashboard(self.user)
+        assert set(dashboard['tasks']) == set(slow_tasklist(self.user))
+        assert sum(len(obs) for _, obs in dashboard['by_study']) == len(dashboard['tasks'])
+        assert set(dashboard['current_memberships']) == set(
+            m for m in self.user.membership_set.all() if m.is_current())
+
+    def test_cache_is_cleared_by_changes(self):
+        before = user_dashboard(self.user)
+        with self.assertNumQueries(0):
+            user_dashboard(self.user)
+
+        for obs in before['tasks']:
+            obs.status = 1
+            obs.save()
+        assert user_dashboard(self.user)['tasks'] == []
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_dashboard(self):
+        memberships = list(self.user.membership_set.all())
+        template = Observation.objects.filter(dyad__user=self.user, created_by_script__isnull=False)[0]
+        extra = 2000 - Observation.objects.filter(dyad__user=self.user).count()
+        Observation.objects.bulk_create([Observation(dyad=memberships[i % 3],
+            created_by_script=template.created_by_script,
+            due=datetime.now() - timedelta(hours=i), due_original=datetime.now() - timedelta(hours=i))
+            for i in range(extra)])
+
+        start = time.time()
+        slow = slow_tasklist(self.user)
+        slow_seconds = time.time() - start
+
+        start = time.time()
+        fast = build_dashboard(self.user)['tasks']
+        fast_seconds = time.time() - start
+        assert set(fast) == set(slow)
+        print("dashboard for 2000 observations: {:.2f}s before, {:.2f}s after".format(
+            slow_seconds, fast_seconds))
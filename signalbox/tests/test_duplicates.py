@@ -0,0 +1,46 @@
+from django.test import TestCase
+from ask.models import Question
+from signalbox.duplicates import duplicate_reply_summary
+from signalbox.models import Study, Membership, Reply, Answer
+from signalbox.tests.helpers import make_user
+
+
+class TestDuplicateReplies(TestCase):
+    """Check grouped duplicate reply summaries match the per-observation methods."""
+
+    fixtures = ['test.json', ]
+
+    def test_duplicate_summary_and_diffs(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        obs = membership.observation_set.all()[0]
+        q1, q2, q3 = Question.objects.all()[:3]
+
+        first = Reply(observation=obs, asker=obs.asker)
+        first.save()
+        second = Reply(observation=obs, asker=obs.asker)
+        second.save()
+        Answer(reply=first, question=q1, answer="1").save()
+        Answer(reply=second, question=q1, answer="1").save()
+        Answer(reply=first, question=q2, answer="1").save()
+        Answer(reply=second, question=q2, answer="2").save()
+        Answer(reply=first, question=q3, answer="1").save()
+
+        assert set(obs.variables_which_differ_between_multiple_replies()) == set([q2, q3])
+
+        summary = duplicate_reply_summary(study)
+        assert summary['duplicated'] == summary['unresolved'] == 1
+        assert summary['observations'][obs.id]['differing_questions'] == set([q2.id, q3.id])
+        assert len(study.unresolved_observations_with_duplicate_replies()) == 1
+
+        # choosing a canonical reply clears the cached summary
+        second.is_canonical_reply = True
+        second.save()
+        assert duplicate_reply_summary(study)['unresolved'] == 0
+        assert len(study.unresolved_observations_with_duplicate_replies()) == 0
+
+        Answer(reply=second, question=q3, answer="1").save()
+        summary = duplicate_reply_summary(study)
+        assert summary['observations'][obs.id]['differing_questions'] == set([q2.id])
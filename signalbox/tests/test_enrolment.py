@@ -0,0 +1,81 @@
+import io
+import os
+import time
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.test import TestCase
+from signalbox.enrolment import EnrolmentError, bulk_enrol, read_participants_csv, validate_participants
+from signalbox.models import Study, Membership, Observation
+from signalbox.tests.helpers import make_user
+
+
+CSV = """username,email,first_name
+bulk1,bulk1@example.com,One
+bulk2,bulk2@example.com,Two
+bulk3,bulk3@example.com,Three
+"""
+
+
+class TestBulkEnrolment(TestCase):
+    """Check bulk enrolment creates the same records as adding participants one at a time."""
+
+    fixtures = ['test.json', ]
+
+    def test_bulk_enrol_matches_single_enrolment(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        single = Membership(study=study, user=user)
+        single.save()
+
+        participants = validate_participants(study, read_participants_csv(io.StringIO(CSV)))
+        counts = bulk_enrol(study, participants)
+        assert counts['memberships'] == 3
+
+        for m in Membership.objects.filter(study=study, user__username__startswith="bulk"):
+            assert m.condition and m.date_randomised
+            assert not m.user.has_usable_password()
+            assert m.user.userprofile
+            assert m.observation_set.count() == single.observation_set.count()
+            for o in m.observation_set.all():
+                assert o.next_eligible_at == o.compute_next_eligible_at()
+                assert o.reminderinstance_set.count() == \
+                    o.created_by_script.scriptreminder_set.count()
+
+    def test_dry_run_saves_nothing(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        n_observations = Observation.objects.count()
+
+        participants = validate_participants(study, read_participants_csv(io.StringIO(CSV)))
+        counts = bulk_enrol(study, participants, dry_run=True)
+        assert counts['users'] == 3
+        assert not User.objects.filter(username__startswith="bulk").exists()
+        assert Observation.objects.count() == n_observations
+
+    def test_invalid_rows_are_all_reported(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        make_user({'username': "bulk1", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        rows = read_participants_csv(io.StringIO(CSV + "bulk2,notanemail,Again\n"))
+
+        try:
+            validate_participants(study, rows)
+            assert False, "EnrolmentError not raised"
+        except EnrolmentError as e:
+            lines = [line for line, _ in e.errors]
+            assert lines == [2, 5, 5]
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_bulk_enrol(self):
+        # the target is 10,000 participants in under a minute
+        n = int(os.environ.get('SIGNALBOX_BENCHMARK_PARTICIPANTS', 10000))
+        study = Study.objects.get(slug='test-schedule-study')
+        csv = "username,email,first_name\n" + "".join(
+            "bench{0},bench{0}@example.com,Bench\n".format(i) for i in range(n))
+
+        start = time.time()
+        participants = validate_participants(study, read_participants_csv(io.StringIO(csv)))
+        validated = time.time() - start
+        start = time.time()
+        counts = bulk_enrol(study, participants)
+        enrolled = time.time() - start
+        assert counts['memberships'] == n
+        print("{} participants: validated in {:.1f}s, enrolled in {:.1f}s".format(n, validated, enrolled))
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from django.test import TestCase
+from signalbox.models import Study, Membership, ObservationData
+from signalbox.models.observation_timing_functions import (
+    observations_due_in_window, observations_past_completion_window, EXPIRED_STATUS)
+from signalbox.utils import expire_lapsed_observations
+from signalbox.tests.helpers import make_user
+
+
+class TestExpiry(TestCase):
+    """Check Observations are retired once their completion window closes."""
+
+    fixtures = ['test.json', ]
+
+    def _membership_with_expired_observation(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+
+        first = membership.observation_set.all()[0]
+        script = first.created_by_script
+        script.completion_window = 60
+        script.save()
+        first.due = datetime.now() - timedelta(minutes=61)
+        first.save()
+        return study, first
+
+    def test_selects_only_expired(self):
+        study, first = self._membership_with_expired_observation()
+        expired = observations_past_completion_window(study)
+        assert list(expired.values_list('id', flat=True)) == [first.id]
+
+    def test_zero_window_never_expires(self):
+        study, first = self._membership_with_expired_observation()
+        script = first.created_by_script
+        script.completion_window = 0
+        script.save()
+        assert not observations_past_completion_window(study).exists()
+        assert expire_lapsed_observations(study=study) == []
+
+    def test_sweeper_updates_status_and_logs(self):
+        study, first = self._membership_with_expired_observation()
+        result = expire_lapsed_observations(study=study)
+        assert result == [(study, 1)]
+
+        first.refresh_from_db()
+        assert first.status == EXPIRED_STATUS
+        assert ObservationData.objects.filter(observation=first, key="expired").count() == 1
+        assert first not in observations_due_in_window()
+
+        # running again is a no-op
+        assert expire_lapsed_observations(study=study) == []
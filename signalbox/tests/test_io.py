@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, skipUnless
+import numpy as N
+from stats import io
+
+HEAD = """
+type = integer-attribute
+name = DATASET_DIMENSIONS
+count = 5
+ 5 4 3 0 0
+
+type = integer-attribute
+name = BRICK_TYPES
+count = 2
+ 1 1
+
+type = float-attribute
+name = BRICK_FLOAT_FACS
+count = 2
+ 0 0
+
+type = string-attribute
+name = BYTEORDER_STRING
+count = 10
+'{}~
+"""
+
+
+class TestMappedReaders(TestCase):
+    """Check the memory-mapped readers match the readers which load whole files."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.data = N.arange(120, dtype=N.int16).reshape(2, 3, 4, 5) * 7 - 300
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name, data=None, text=None):
+        path = os.path.join(self.dir, name)
+        if data is not None:
+            data.tofile(path)
+        if text is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return path
+
+    def test_brawmap(self):
+        path = self.path('a.raw', self.data)
+        mapped = io.brawmap(path, N.int16, [-1, 3, 4, 5])
+        assert isinstance(mapped, N.memmap)
+        N.testing.assert_array_equal(mapped, io.braw(path, N.int16, [2, 3, 4, 5]))
+        N.testing.assert_array_equal(mapped[1, ..., 2], self.data[1, ..., 2])
+        N.testing.assert_array_equal(io.brawmap(path, N.int16, offset=20), self.data.ravel()[10:])
+        path = self.path('b.raw', self.data.astype('>f4'))
+        N.testing.assert_array_equal(io.brawmap(path, N.float32, [2, 60], '>'), self.data.reshape(2, 60))
+
+    def test_bingetmap(self):
+        path = os.path.join(self.dir, 'c.fbin')
+        io.binput(self.data.astype(N.float32), path)
+        mapped = io.bingetmap(path)
+        self.assertEqual(mapped.shape, (2, 3, 4, 5))
+        N.testing.assert_array_equal(mapped, io.binget(path))
+
+    def test_mghbgetmap(self):
+        path = self.path('d.bshort', self.data[0].astype('>i2'))
+        self.path('d.hdr', text="4 5 3 0\n")
+        N.testing.assert_array_equal(io.mghbgetmap(path), self.data[0])
+        path = self.path('e.bshort', self.data[0])
+        self.path('e.hdr', text="4 5 3 0\n")
+        N.testing.assert_array_equal(io.mghbgetmap(path, byteorder='='), io.mghbget(path))
+
+    def test_mgetmap(self):
+        path = self.path('f.bfloat', self.data[0].astype(N.float32))
+        self.path('f.hdr', text="4 5 3 0\n")
+        mapped = io.mgetmap(path, N.float32)
+        self.assertEqual(mapped.shape, (4, 5, 3))
+        N.testing.assert_array_equal(mapped, io.mget(path, N.float32))
+
+    def test_brikgetmap(self):
+        path = self.path('g+orig.BRIK', self.data.astype('>i2'))
+        self.path('g+orig.HEAD', text=HEAD.format('MSB_FIRST'))
+        N.testing.assert_array_equal(io.brikgetmap(path), self.data)
+        path = self.path('h+orig.BRIK', self.data)
+        self.path('h+orig.HEAD', text=HEAD.format('LSB_FIRST' if N.little_endian else 'MSB_FIRST'))
+        N.testing.assert_array_equal(io.brikgetmap(path)[1], io.brikget(path)[1])
+
+    def test_afastget(self):
+        text = "# a comment\n1 2.5 3\n\n% another\n4 5 6e2\n-7 8 9"
+        self.path('i.txt', text=text)
+        self.path('j.txt', text="10 11 12\n")
+        expected = io.aget(os.path.join(self.dir, 'i.txt'), 0)
+        for blocksize in [3, 7, 1024]:
+            got = io.afastget(os.path.join(self.dir, 'i.txt'), 0, blocksize=blocksize)
+            N.testing.assert_array_equal(got, expected)
+        self.assertEqual(io.afastget(os.path.join(self.dir, '[ij].txt'), 0).shape, (4, 3))
+        self.path('k.txt', text="1 2\n3 x\n")
+        self.assertRaises(ValueError, io.afastget, os.path.join(self.dir, 'k.txt'), 0)
+        # ragged rows whose numbers add up to a whole number of rows
+        self.path('l.txt', text="1 2 3\n4\n5 6 7 8 9\n")
+        self.assertRaises(ValueError, io.afastget, os.path.join(self.dir, 'l.txt'), 0)
+        self.assertRaises(ValueError, io.afastget, os.path.join(self.dir, 'l.txt'), 0, blocksize=4)
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_readers(self):
+        # 2GB of 64x64x32 int16 volumes, by default
+        size = int(os.environ.get('SIGNALBOX_BENCHMARK_IO_BYTES', 2 * 1024 ** 3))
+        volume = N.arange(64 * 64 * 32, dtype=N.int16).reshape(32, 64, 64)
+        count = size // volume.nbytes
+        path = os.path.join(self.dir, 'big.raw')
+        with open(path, 'wb') as f:
+            for i in range(count):
+                (volume + i).tofile(f)
+
+        start = time.time()
+        mapped = io.brawmap(path, N.int16, [-1, 32, 64, 64])
+        one = N.array(mapped[count // 2])
+        print("brawmap one volume of {} bytes: {:.3f}s".format(size, time.time() - start))
+        assert (one == volume + count // 2).all()
+        start = time.time()
+        column = N.array(mapped[:, 16, 32, 32])
+        print("brawmap one voxel's time series: {:.3f}s".format(time.time() - start))
+        self.assertEqual(len(column), count)
+        del mapped, one, column
+        start = time.time()
+        io.braw(path, N.int16, [-1, 32, 64, 64])
+        print("braw all {} bytes: {:.3f}s".format(size, time.time() - start))
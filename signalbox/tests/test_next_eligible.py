@@ -0,0 +1,59 @@
+from datetime import datetime
+from django.apps import apps
+from django.test import TestCase
+from signalbox.models import Study, Membership, Observation
+from signalbox.models.listeners import create_next_eligible_index
+from signalbox.models.observation_timing_functions import stale_next_eligible_at
+from signalbox.tests.helpers import make_user
+
+
+class TestNextEligibleAt(TestCase):
+    """Check the denormalised next_eligible_at column tracks its inputs."""
+
+    fixtures = ['test.json', ]
+
+    def _membership(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        return membership
+
+    def test_set_on_save(self):
+        membership = self._membership()
+        for obs in membership.observation_set.all():
+            assert obs.next_eligible_at == obs.compute_next_eligible_at()
+            assert obs.next_eligible_at is not None
+
+    def test_pausing_study_and_membership(self):
+        membership = self._membership()
+        study = membership.study
+
+        study.paused = True
+        study.save()
+        assert not membership.observation_set.filter(next_eligible_at__isnull=False).exists()
+
+        study.paused = False
+        study.save()
+        membership.active = False
+        membership.save()
+        assert not membership.observation_set.filter(next_eligible_at__isnull=False).exists()
+        assert not stale_next_eligible_at(Observation.objects.all())
+
+    def test_backfilled_after_migrate(self):
+        membership = self._membership()
+        membership.observation_set.update(next_eligible_at=None)
+
+        create_next_eligible_index(apps.get_app_config('signalbox'))
+        for obs in membership.observation_set.all():
+            assert obs.next_eligible_at is not None
+            assert obs.next_eligible_at == obs.compute_next_eligible_at()
+
+    def test_working_hours(self):
+        study = Study(working_day_starts=8, working_day_ends=22)
+        early = datetime(2014, 1, 1, 3, 15)
+        late = datetime(2014, 1, 1, 23, 15)
+        ok = datetime(2014, 1, 1, 12, 15)
+        assert study.next_working_datetime(early) == datetime(2014, 1, 1, 8, 0)
+        assert study.next_working_datetime(late) == datetime(2014, 1, 2, 8, 0)
+        assert study.next_working_datetime(ok) == ok
@@ -0,0 +1,64 @@
+import os
+import time
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.test import TestCase
+from signalbox.models import UserProfile, TextMessageCallback
+from signalbox.models.observation import likely_user_for_numbers
+from signalbox.tests.helpers import make_user
+from signalbox.utilities.phone import normalise_phone, reversed_digits, suffix_key
+from twiliobox.models import TwilioNumber
+
+
+class TestPhoneLookup(TestCase):
+    """Check indexed phone number lookups match the suffix matching they replace."""
+
+    def test_normalised_columns(self):
+        assert normalise_phone("07700 900123") == "+447700900123"
+        assert normalise_phone("not a number") is None
+        assert reversed_digits("+447700900123") == "321009007744"
+        assert suffix_key("+447700900123") == "321009007"
+
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        profile = user.userprofile
+        profile.mobile = "+447700900123"
+        profile.save()
+        profile = UserProfile.objects.get(id=profile.id)
+        assert profile.mobile_e164 == "+447700900123"
+        assert profile.mobile_reversed == "321009007744"
+
+    def test_callback_finds_user(self):
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        profile = user.userprofile
+        profile.mobile = "+447700900123"
+        profile.save()
+        make_user({'username': "TEST3", 'email': "TEST3@TEST.COM", 'password': "TEST"})
+
+        assert likely_user_for_numbers(["+447700900123"]) == user
+        # only the last digits need to match, as before
+        assert likely_user_for_numbers(["+17700900123", "+15550000000"]) == user
+        assert likely_user_for_numbers(["+15550000000", ""]) is None
+
+        callback = TextMessageCallback(sid="SM1", post={'From': "+447700900123", 'To': "+441234567890"})
+        callback.save()
+        assert callback.likely_related_user == user
+
+    def test_twilio_number_lookup(self):
+        number = TwilioNumber(phone_number="+441234567890", twilio_id="x", twilio_token="y")
+        number.save()
+        assert TwilioNumber.for_number("441234567890") == number
+        assert TwilioNumber.for_number("+441234567890") == number
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_callback_lookup(self):
+        n = 100000
+        User.objects.bulk_create([User(username="bench{}".format(i)) for i in range(n)])
+        ids = User.objects.filter(username__startswith="bench").values_list('id', flat=True)
+        profiles = [UserProfile(user_id=j, mobile="+4477009{:05d}".format(i)) for i, j in enumerate(ids)]
+        [i.set_normalised_numbers() for i in profiles]
+        UserProfile.objects.bulk_create(profiles, batch_size=1000)
+
+        start = time.time()
+        for i in range(1000):
+            likely_user_for_numbers(["+4477009{:05d}".format(i * 97 % n), "+441234567890"])
+        print("1000 callback lookups over {} profiles: {:.2f}s".format(n, time.time() - start))
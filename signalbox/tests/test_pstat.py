@@ -0,0 +1,97 @@
+import os
+import random
+import time
+from unittest import TestCase, skipUnless
+from stats import fasttable, pstat, stats
+
+
+def list_result(name, *args):
+    """Call a pstat table function with the list versions only."""
+    pstat.use_fast_tables(None)
+    try:
+        return getattr(pstat, name)(*args)
+    finally:
+        pstat.use_fast_tables()
+
+
+def make_table(n, rng):
+    # subject, condition, trial, score, group, a column of mixed types
+    return [[i % 37, rng.choice(['a', 'b', 'c']), rng.randint(1, 5), rng.gauss(10, 3),
+        rng.randint(1, 3) * 0.5, rng.choice([None, 'x', 1])] for i in range(n)]
+
+
+class TestFastTables(TestCase):
+    """Check the NumPy versions of the pstat table functions match the list versions."""
+
+    def setUp(self):
+        self.table = make_table(300, random.Random(1))
+
+    def assertSame(self, name, *args):
+        expected = list_result(name, *args)
+        got = getattr(fasttable, name)(*args)
+        self.assertEqual(expected, got, name)
+        self.assertEqual([type(i) for i in expected], [type(i) for i in got], name)
+
+    def test_columns_and_rows(self):
+        for cnums in [0, 3, [1], [2, 0], (1, 3, 5), '[2:4]']:
+            self.assertSame('colex', self.table, cnums)
+        column = pstat.colex(self.table, 0)
+        self.assertSame('abut', column, column, self.table)
+        self.assertSame('abut', column, [1, 2], ['x', 'y', 'z'])
+        self.assertSame('abut', [1, 2, 3], column[:7])
+        for cols in [0, 1, [1, 2], [4, 0], (3,)]:
+            self.assertSame('sortby', [row[:5] for row in self.table], cols)
+        self.assertSame('sortby', [row[:4] for row in self.table], 1)
+        numbers = [[row[0], row[2], row[4]] for row in self.table]
+        self.assertSame('sortby', numbers, [2, 1])
+
+    def test_unique_and_recode(self):
+        for column in [0, 1, 2, 4, 5]:
+            self.assertSame('unique', pstat.colex(self.table, column))
+        self.assertSame('unique', pstat.colex(self.table, [1, 2]))
+        self.assertSame('unique', [[1], [1.0], (1,), 1, [[2]], [[2]]])
+        codes = [['a', 1], ['b', 2], ['a', 3], [None, 'missing']]
+        for cols in [1, 5, [1, 5]]:
+            self.assertSame('recode', self.table, codes, cols)
+        self.assertSame('recode', [row[:3] for row in self.table], [[1, 'one'], [True, 'true']])
+
+    def test_collapse(self):
+        for keep, cols in [(1, 3), ([1, 2], [3, 4]), (4, 2), ([0], 2)]:
+            self.assertSame('collapse', self.table, keep, cols)
+        self.assertSame('collapse', self.table, [1, 4], 3, stats.lsterr, len)
+        self.assertSame('collapse', self.table, 2, [3, 0], None, None, max)
+        # fcn2 fails, giving 'N/A'
+        self.assertSame('collapse', self.table, [2, 1], 5, len, lambda x: x + 1, lambda x: x.count(None))
+        # python 3 can't sort None with numbers, in either version
+        self.assertRaises(TypeError, list_result, 'collapse', self.table, 5, 3)
+        self.assertRaises(TypeError, fasttable.collapse, self.table, 5, 3)
+
+    def test_large_tables_use_fast_functions(self):
+        table = make_table(pstat.FAST_TABLE_ROWS, random.Random(2))
+        expected = list_result('collapse', table, [1, 2], 3)
+        self.assertEqual(len(expected), 15)
+        assert pstat._fast_table(table)
+        assert not pstat._fast_table(table[:-1])
+        self.assertEqual(pstat.collapse(table, [1, 2], 3), expected)
+        self.assertEqual(pstat.unique(pstat.colex(table, 1)), list_result('unique', pstat.colex(table, 1)))
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_backends(self):
+        # the list functions are slow; don't time them beyond this many rows
+        list_limit = int(os.environ.get('SIGNALBOX_BENCHMARK_LIST_MAX', 10000))
+        rng = random.Random(3)
+        for n in [10 ** i for i in range(3, 7)]:
+            table = make_table(n, rng)
+            for name, args in [('colex', (table, [0, 3])), ('unique', (pstat.colex(table, [0, 1]),)),
+                    ('sortby', ([row[:5] for row in table], [1, 0])),
+                    ('recode', (table, [['a', 1], ['b', 2]], 1)),
+                    ('collapse', (table, [0, 1], 3)), ('collapse', (table, 0, 3, None, len))]:
+                start = time.time()
+                getattr(fasttable, name)(*args)
+                fast_seconds = time.time() - start
+                slow = "skipped"
+                if n <= list_limit:
+                    start = time.time()
+                    list_result(name, *args)
+                    slow = "{:.3f}s".format(time.time() - start)
+                print("{} of {} rows: {} list, {:.3f}s numpy".format(name, n, slow, fast_seconds))
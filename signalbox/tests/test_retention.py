@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from django.test import TestCase
+from django.test.utils import override_settings
+from signalbox.models import Study, Membership, Reply, Answer, ObservationData
+from signalbox.retention import apply_retention, retention_policies
+from signalbox.tests.helpers import make_user
+
+
+class TestRetention(TestCase):
+    """Check retention policies remove only old rows which match, in chunks."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        self.obs = membership.observation_set.all()[0]
+
+        self.empty = [Reply.objects.create(observation=self.obs, asker=self.obs.asker) for i in range(3)]
+        self.answered = Reply.objects.create(observation=self.obs, asker=self.obs.asker)
+        Answer(reply=self.answered, answer="1").save()
+        self.recent = Reply.objects.create(observation=self.obs, asker=self.obs.asker)
+
+        old = datetime.now() - timedelta(days=400)
+        Reply.objects.exclude(id=self.recent.id).update(started=old)
+
+        ObservationData.objects.filter(observation=self.obs).delete()
+        for key in ['attempt', 'attempt', 'external_id']:
+            ObservationData.objects.create(observation=self.obs, key=key)
+        ObservationData.objects.filter(observation=self.obs).update(added=old)
+
+    def test_dry_run_counts_without_removing(self):
+        report, = apply_retention(['empty_replies'], dry_run=True)
+        assert report['rows'] == 3
+        assert Reply.objects.filter(id__in=[i.id for i in self.empty]).count() == 3
+
+    def test_chunked_removal(self):
+        report, = apply_retention(['empty_replies'], chunk_size=2, max_rows_per_second=0)
+        assert report['rows'] == 3
+        assert not Reply.objects.filter(id__in=[i.id for i in self.empty]).exists()
+        assert Reply.objects.filter(id__in=[self.answered.id, self.recent.id]).count() == 2
+
+    @override_settings(RETENTION_CHUNK_SIZE=1, RETENTION_MAX_ROWS_PER_SECOND=1)
+    def test_zero_means_no_limit(self):
+        totals = []
+        report, = apply_retention(['empty_replies'], chunk_size=0, max_rows_per_second=0,
+            progress=totals.append)
+        assert totals == [3]
+        assert report['seconds'] < 1
+
+    def test_observation_data_needs_final_status(self):
+        assert apply_retention(['observation_data'], dry_run=True)[0]['rows'] == 0
+
+        self.obs.status = 1
+        self.obs.save()
+        report, = apply_retention(['observation_data'])
+        assert report['rows'] == 2
+        assert list(self.obs.observationdata_set.values_list('key', flat=True)) == ['external_id']
+
+    def test_unknown_policy(self):
+        assert 'empty_replies' in retention_policies()
+        try:
+            apply_retention(['no_such_policy'])
+            assert False, "ValueError not raised"
+        except ValueError:
+            pass
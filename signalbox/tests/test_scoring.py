@@ -0,0 +1,60 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from ask.models import Question
+from signalbox.models import Study, Membership, Reply, Answer, ScoreSheet
+from signalbox.scoring import bulk_scores, score_columns
+from signalbox.settings import SCORESHEET_FUNCTION_NAMES
+from signalbox.tests.helpers import make_user
+
+
+class TestBulkScoring(TestCase):
+    """Check bulk scores match ScoreSheet.compute() reply by reply."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        self.questions = list(Question.objects.exclude(variable_name="")[:4])
+        self.scoresheets = []
+        for function in SCORESHEET_FUNCTION_NAMES:
+            sheet = ScoreSheet(name="test-" + function, function=function,
+                minimum_number_of_responses_required=2)
+            sheet.save()
+            sheet.variables.add(*self.questions)
+            self.scoresheets.append(sheet)
+
+        self.replies = []
+        values = [["1", "2", "4", "7"], ["3", "not a number", "", "5"], ["2", "", "", ""]]
+        for obs, answers in zip(membership.observation_set.all(), values):
+            reply = Reply(observation=obs, asker=obs.asker)
+            reply.save()
+            for q, value in zip(self.questions, answers):
+                Answer(reply=reply, question=q, answer=value).save()
+            self.replies.append(reply)
+        self.answers = Answer.objects.filter(reply__in=self.replies)
+
+    def test_matches_compute(self):
+        scores = bulk_scores(self.scoresheets, self.answers)
+        for sheet in self.scoresheets:
+            for reply in self.replies:
+                expected = sheet.compute(reply.answer_set.all())['score']
+                row = scores[(scores.scoresheet == sheet.id) & (scores.reply == reply.id)]
+                if expected is None:
+                    assert row.empty or row.score.isnull().all(), (sheet.function, reply.id)
+                else:
+                    self.assertAlmostEqual(row.score.iloc[0], expected)
+
+    def test_one_query_for_answers(self):
+        with self.assertNumQueries(3):
+            bulk_scores(self.scoresheets, self.answers)
+
+    def test_export_columns_and_command(self):
+        columns = score_columns(self.scoresheets, self.answers)
+        assert "score_test_sum" in columns.columns
+        out = StringIO()
+        call_command('rescore', scoresheets=['test-sum'], stdout=out)
+        assert "test-sum" in out.getvalue()
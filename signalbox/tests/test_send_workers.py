@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import threading
+
+from django.db import connection
+from django.test import TransactionTestCase
+from signalbox.models import SendPartitionLease, SendWorker
+from signalbox.send_workers import claim_partitions, release_partitions
+
+N_PARTITIONS = 12
+LEASE = 60
+
+
+class TestSendWorkers(TransactionTestCase):
+    """Check partition leases are never shared and are rebalanced."""
+
+    def _claim_concurrently(self, names):
+        owned = {}
+
+        def claim(name):
+            try:
+                owned[name], _ = claim_partitions(name, n_partitions=N_PARTITIONS, lease_seconds=LEASE)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=(n,)) for n in names]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        return owned
+
+    def _assert_disjoint(self, owned):
+        allparts = [p for parts in owned.values() for p in parts]
+        self.assertEqual(len(allparts), len(set(allparts)))
+
+    def test_workers_share_partitions(self):
+        names = ["worker{}".format(i) for i in range(3)]
+        self._assert_disjoint(self._claim_concurrently(names))
+
+        # once every worker is registered, two more rounds settle on a fair split
+        for _ in range(2):
+            owned = dict((n, claim_partitions(n, n_partitions=N_PARTITIONS, lease_seconds=LEASE)[0])
+                for n in names)
+        self._assert_disjoint(owned)
+        self.assertEqual(sorted(p for parts in owned.values() for p in parts),
+            list(range(N_PARTITIONS)))
+        [self.assertEqual(len(parts), N_PARTITIONS // 3) for parts in owned.values()]
+
+    def test_rebalance_after_worker_dies(self):
+        claim_partitions("a", n_partitions=N_PARTITIONS, lease_seconds=LEASE)
+        claim_partitions("b", n_partitions=N_PARTITIONS, lease_seconds=LEASE)
+
+        # "a" stops heartbeating; its leases lapse
+        past = datetime.now() - timedelta(seconds=LEASE * 2)
+        SendWorker.objects.filter(name="a").update(heartbeat=past)
+        SendPartitionLease.objects.filter(owner="a").update(expires=past)
+
+        owned, _ = claim_partitions("b", n_partitions=N_PARTITIONS, lease_seconds=LEASE)
+        self.assertEqual(owned, list(range(N_PARTITIONS)))
+
+    def test_release(self):
+        claim_partitions("a", n_partitions=N_PARTITIONS, lease_seconds=LEASE)
+        release_partitions("a")
+        self.assertFalse(SendPartitionLease.objects.exclude(owner="").exists())
+        self.assertFalse(SendWorker.objects.filter(name="a").exists())
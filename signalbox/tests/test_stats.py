@@ -0,0 +1,98 @@
+import os
+import random
+import time
+from unittest import TestCase, skipUnless
+from stats import fast, stats
+
+LIST_FUNCTIONS = ['mean', 'median', 'samplevar', 'var', 'stdev', 'sum', 'ss', 'square_of_sums']
+PAIRED_FUNCTIONS = ['pearsonr', 'spearmanr', 'ttest_ind', 'mannwhitneyu', 'ranksums', 'wilcoxont',
+    'summult', 'sumdiffsquared']
+
+
+def list_result(name, *args):
+    """Call a list function with its helpers dispatched to list functions too."""
+    stats.use_fast_functions(0)
+    try:
+        return getattr(stats, 'l' + name)(*args)
+    finally:
+        stats.use_fast_functions()
+
+
+class TestFastStats(TestCase):
+    """Check the NumPy versions of the stats functions match the list versions."""
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.floats = [rng.gauss(10, 3) for i in range(500)]
+        self.other = [rng.gauss(11, 2) for i in range(500)]
+        # few distinct values, so lots of ties
+        self.ints = [rng.randint(1, 7) for i in range(500)]
+        self.other_ints = [rng.randint(2, 8) for i in range(500)]
+
+    def assertSame(self, expected, got, name):
+        if isinstance(expected, (list, tuple)):
+            self.assertEqual(type(expected), type(got), name)
+            self.assertEqual(len(expected), len(got), name)
+            [self.assertSame(e, g, name) for e, g in zip(expected, got)]
+        else:
+            self.assertEqual(type(expected), type(got), name)
+            self.assertAlmostEqual(expected, got, delta=1e-9 * max(1.0, abs(expected)), msg=name)
+
+    def test_single_samples(self):
+        for values in [self.floats, self.ints]:
+            for name in LIST_FUNCTIONS:
+                self.assertSame(list_result(name, values), getattr(fast, name)(values), name)
+        self.assertSame(list_result('chisquare', self.ints), fast.chisquare(self.ints), 'chisquare')
+        self.assertSame(list_result('chisquare', self.ints[:5], self.other_ints[:5]),
+            fast.chisquare(self.ints[:5], self.other_ints[:5]), 'chisquare')
+
+    def test_paired_samples(self):
+        for x, y in [(self.floats, self.other), (self.ints, self.other_ints)]:
+            for name in PAIRED_FUNCTIONS:
+                self.assertSame(list_result(name, x, y), getattr(fast, name)(x, y), name)
+
+    def test_groups(self):
+        groups = [self.floats[:100], self.other[:150], self.floats[300:]]
+        self.assertSame(list_result('F_oneway', *groups)[1], fast.F_oneway(*groups)[1], 'F_oneway')
+        self.assertAlmostEqual(float(list_result('F_oneway', *groups)[0]), fast.F_oneway(*groups)[0])
+        groups = [self.ints[:100], self.other_ints[:150], self.ints[300:]]
+        self.assertSame(list_result('kruskalwallish', *groups), fast.kruskalwallish(*groups), 'kruskalwallish')
+
+    def test_ranks_and_ties(self):
+        for values in [self.floats, self.ints, [3, 1, 3, 2, 3], [5]]:
+            self.assertEqual(list_result('rankdata', values), fast.rankdata(values))
+            self.assertEqual(list_result('shellsort', values)[0], fast.shellsort(values)[0])
+            svec, ivec = fast.shellsort(values)
+            self.assertEqual([values[i] for i in ivec], svec)
+        self.assertEqual(fast.rankdata([3, 1, 3, 2, 3]), [4.0, 1.0, 4.0, 2.0, 4.0])
+        ranks = list_result('rankdata', self.ints)
+        self.assertSame(list_result('tiecorrect', ranks), fast.tiecorrect(ranks), 'tiecorrect')
+
+    def test_dispatch_uses_fast_functions_for_lists(self):
+        assert stats.mean._dispatch[list] is fast.mean
+        assert stats.rankdata._dispatch[tuple] is fast.rankdata
+        self.assertEqual(stats.rankdata(tuple(self.ints)), list_result('rankdata', self.ints))
+        stats.use_fast_functions(0)
+        assert stats.mean._dispatch[list] is stats.lmean
+        stats.use_fast_functions()
+
+    @skipUnless(os.environ.get('SIGNALBOX_BENCHMARK'), "set SIGNALBOX_BENCHMARK to run benchmarks")
+    def test_benchmark_backends(self):
+        # the list functions are slow; don't time them beyond this many values
+        list_limit = int(os.environ.get('SIGNALBOX_BENCHMARK_LIST_MAX', 10000))
+        rng = random.Random(2)
+        for n in [10 ** i for i in range(3, 8)]:
+            x = [rng.gauss(0, 1) for i in range(n)]
+            y = [rng.gauss(0.1, 1) for i in range(n)]
+            for name, args in [('mean', (x,)), ('stdev', (x,)), ('median', (x,)),
+                    ('pearsonr', (x, y)), ('ttest_ind', (x, y)), ('rankdata', (x,)),
+                    ('spearmanr', (x, y)), ('mannwhitneyu', (x, y))]:
+                start = time.time()
+                getattr(fast, name)(*args)
+                fast_seconds = time.time() - start
+                slow = "skipped"
+                if n <= list_limit:
+                    start = time.time()
+                    list_result(name, *args)
+                    slow = "{:.3f}s".format(time.time() - start)
+                print("{} of {} values: {} list, {:.3f}s numpy".format(name, n, slow, fast_seconds))
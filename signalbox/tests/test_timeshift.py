@@ -0,0 +1,40 @@
+from datetime import timedelta
+from django.test import TestCase
+from signalbox.models import Study, Membership, Observation, ObservationData, Reply
+from signalbox.timeshift import timeshift_study
+from signalbox.tests.helpers import make_user
+
+
+class TestTimeshift(TestCase):
+    """Check bulk timeshifting moves only observations without replies."""
+
+    fixtures = ['test.json', ]
+
+    def test_study_timeshift(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+
+        obs = list(membership.observation_set.all())
+        replied = obs[0]
+        Reply(observation=replied, asker=replied.asker).save()
+        before = dict((i.id, (i.due, i.due_original)) for i in obs)
+
+        delta = timedelta(days=3)
+        n = timeshift_study(study, delta)
+        assert n == len(obs) - 1
+
+        for i in Observation.objects.filter(id__in=before.keys()):
+            due, due_original = before[i.id]
+            if i.id == replied.id:
+                assert i.due == due
+            else:
+                assert i.due == due + delta
+                assert i.due_original == due_original + delta
+                assert i.next_eligible_at == i.compute_next_eligible_at()
+                for r in i.reminderinstance_set.filter(sent=False):
+                    assert r.due == r.reminder.scriptreminder_set.get(
+                        script=i.created_by_script).calculate_date(i)
+
+        assert ObservationData.objects.filter(key="timeshift").count() == n
@@ -0,0 +1,57 @@
+from django.test import TestCase
+from signalbox.models import Study, Membership, Observation
+from signalbox.models.observation_methods import TwilioCall
+from signalbox.tests.helpers import make_user
+
+
+class TestObservationTransitions(TestCase):
+    """Check staged Observation changes are written together."""
+
+    fixtures = ['test.json', ]
+
+    def _observation(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        return membership.observation_set.all()[0]
+
+    def test_nothing_written_until_commit(self):
+        obs = self._observation()
+        obs.stage_transition(status=-1, touch=True, increment=True)
+        obs.stage_data(key="attempt", value="one")
+        obs.stage_data(key="external_id", value="two")
+
+        fresh = Observation.objects.get(id=obs.id)
+        assert fresh.status == 0 and fresh.attempt_count == 0
+        assert obs.observationdata_set.count() == 0
+
+        obs.commit_transition()
+        fresh = Observation.objects.get(id=obs.id)
+        assert fresh.status == -1
+        assert fresh.attempt_count == 1
+        assert fresh.last_attempted is not None
+        assert sorted(obs.observationdata_set.values_list('key', flat=True)) == [
+            "attempt", "external_id"]
+
+    def test_commit_only_writes_staged_fields(self):
+        obs = self._observation()
+        other = Observation.objects.get(id=obs.id)
+        other.label = "changed elsewhere"
+        other.save()
+
+        obs.stage_transition(status=-3)
+        obs.commit_transition()
+        fresh = Observation.objects.get(id=obs.id)
+        assert fresh.label == "changed elsewhere"
+        assert fresh.status == -3
+
+    def test_call_is_claimed_before_dialling(self):
+        obs = self._observation()
+        Observation.objects.filter(id=obs.id).update(status=-1)
+
+        # a second sender which loaded the Observation while it was pending
+        result, message = TwilioCall.do(obs)
+        assert result == 0
+        assert obs.status == 0
+        assert Observation.objects.get(id=obs.id).attempt_count == 0
@@ -0,0 +1,68 @@
+import json
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from ask.forms import save_question_response
+from ask.models import Question
+from signalbox.export import wide_frames
+from signalbox.models import Study, Membership, Reply, Answer, WideReply
+from signalbox.tests.helpers import make_user
+
+
+@override_settings(MATERIALISE_WIDE_REPLIES=True)
+class TestWideReplies(TestCase):
+    """Check materialised wide rows track saved answers and match the pivoted export."""
+
+    fixtures = ['test.json', ]
+
+    def setUp(self):
+        study = Study.objects.get(slug='test-schedule-study')
+        user = make_user({'username': "TEST2", 'email': "TEST@TEST.COM", 'password': "TEST"})
+        membership = Membership(study=study, user=user)
+        membership.save()
+        self.questions = list(Question.objects.exclude(variable_name="")[:3])
+        self.replies = []
+        for obs in membership.observation_set.all()[:2]:
+            reply = Reply(observation=obs, asker=obs.asker)
+            reply.save()
+            for n, q in enumerate(self.questions):
+                save_question_response(str(n), reply, variable_name=q.variable_name)
+            self.replies.append(reply)
+
+    def test_saved_answers_are_materialised(self):
+        wide = WideReply.objects.get(reply=self.replies[0])
+        assert json.loads(wide.answers) == dict(
+            (q.variable_name, str(n)) for n, q in enumerate(self.questions))
+        assert wide.study_id == self.replies[0].observation.dyad.study_id
+
+        save_question_response("changed", self.replies[0], variable_name=self.questions[0].variable_name)
+        assert json.loads(WideReply.objects.get(reply=self.replies[0]).answers)[
+            self.questions[0].variable_name] == "changed"
+
+        Answer.objects.filter(reply=self.replies[0], question=self.questions[1]).delete()
+        assert self.questions[1].variable_name not in json.loads(
+            WideReply.objects.get(reply=self.replies[0]).answers)
+
+        self.replies[0].is_canonical_reply = True
+        self.replies[0].save()
+        assert json.loads(WideReply.objects.get(reply=self.replies[0]).meta)['canonical'] is True
+
+        for answer in Answer.objects.filter(reply=self.replies[0]):
+            answer.delete()
+        assert not WideReply.objects.filter(reply=self.replies[0]).exists()
+
+    def test_materialised_frames_match_pivot(self):
+        answers = Answer.objects.filter(reply__in=self.replies, question__variable_name__isnull=False)
+        materialised, meta = wide_frames(answers)
+        with self.settings(MATERIALISE_WIDE_REPLIES=False):
+            pivoted, pivoted_meta = wide_frames(answers)
+
+        assert materialised.to_dict() == pivoted.to_dict()
+        for column in ['participant', 'study', 'condition', 'canonical', 'entry_method']:
+            assert list(meta[column]) == list(pivoted_meta[column])
+
+    def test_rebuild_command(self):
+        before = dict(WideReply.objects.values_list('reply_id', 'answers'))
+        WideReply.objects.all().delete()
+        call_command('rebuild_wide_replies', studies=['test-schedule-study'])
+        assert dict(WideReply.objects.values_list('reply_id', 'answers')) == before
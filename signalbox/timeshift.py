@@ -0,0 +1,67 @@
+"""Functions to shift the timing of Observations in bulk.
+
+Observations which already have a Reply are never moved, because doing so
+would misrepresent when data were collected.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from signalbox.changes import log_reply_changes
+from signalbox.models import Observation, ObservationData, ReminderInstance, Reply
+from signalbox.models.observation_timing_functions import refresh_next_eligible_at
+from signalbox.wide import refresh_wide_reply_meta
+
+
+def shiftable_observations(observations):
+    """Exclude Observations which have Replies from a queryset -> queryset."""
+
+    replied = Reply.objects.filter(observation__isnull=False).values('observation')
+    return observations.exclude(id__in=replied)
+
+
+def timeshift_observations(observations, delta):
+    """Move due times of a queryset of Observations by delta -> int N shifted.
+
+    Shifts `due`, `due_original` and unsent ReminderInstances with F-expression
+    UPDATEs and logs a timeshift ObservationData row for each Observation,
+    all within one transaction. The UPDATEs bypass Reply.save(), so any
+    Replies to the shifted Observations are logged as changed for
+    incremental exports and their WideReply metadata is refreshed.
+    """
+
+    with transaction.atomic():
+        ids = list(shiftable_observations(observations).values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        shifted = Observation.objects.filter(id__in=ids)
+        shifted.update(due=F('due') + delta, due_original=F('due_original') + delta)
+
+        ReminderInstance.objects.filter(observation__in=ids, sent=False).update(
+            due=F('due') + delta)
+
+        # whole days leave the curfew position of next_eligible_at unchanged
+        if delta.seconds or delta.microseconds:
+            refresh_next_eligible_at(shifted)
+        else:
+            shifted.filter(next_eligible_at__isnull=False).update(
+                next_eligible_at=F('next_eligible_at') + delta)
+
+        ObservationData.objects.bulk_create(
+            [ObservationData(observation_id=i, key="timeshift", value=delta) for i in ids])
+
+        # `due` is exported with each Reply
+        replies = list(Reply.objects.filter(observation__in=ids).values_list('id', flat=True))
+        log_reply_changes(replies)
+        refresh_wide_reply_meta(replies)
+
+    return len(ids)
+
+
+def timeshift_study(study, delta, condition=None):
+    """Shift all Observations in a Study (or just one StudyCondition) -> int N shifted."""
+
+    observations = Observation.objects.filter(dyad__study=study)
+    if condition:
+        observations = observations.filter(dyad__condition=condition)
+    return timeshift_observations(observations, delta)
@@ -77,9 +77,12 @@ adminpatterns = [
     url(r'^participant/(?P<user_id>\d+)/reset/password/$', send_password_reset, {}, "send_password_reset"),
     url(r'^participant/(?P<pk>\d+)/edit/$', edit_participant, {}, 'edit_participant'),
     url(r'^participant/find/$', find_participant, {}, 'find_participant'),
+    url(r'^participant/bulk/enrol/$', bulk_enrol_participants, {}, 'bulk_enrol_participants'),
     url(r'^participant/(?P<pk>\d+)/$', participant_overview, {}, 'participant_overview'),
 
 
+    url(r'^archive/(?P<model>observation|reply)/(?P<pk>\d+)/$', archived_history, {}, 'archived_history'),
+
     # membership functions
     url(r'^membership/dateshift/(?P<pk>\d+)/$', dateshift_membership, {}, 'dateshift_membership'),
     url(r'^membership/(?P<membership_id>\d+)/use/script/(?P<script_id>\d+)/$',
@@ -108,6 +111,8 @@ adminpatterns = [
         export_anonymous_asker_data, {'part':'data'}, "export_anonymous_asker_data"),
     url(r'^export/anonymous/asker/metadata/(?P<token>\w+)$',
         export_anonymous_asker_data, {'part':'metadata'}, "export_anonymous_asker_data"),
+    url(r'^export/anonymous/asker/stream/(?P<token>\w+)$',
+        stream_anonymous_asker_data, {}, "stream_anonymous_asker_data"),
 
     url(r'^addobs/(?P<membership_id>\d+)/$',
         add_observations_for_membership, name="add_observations_for_membership"),
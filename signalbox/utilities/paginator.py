@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """Return the planner's estimate of the rows in an unfiltered queryset's table -> int or None.
+
+    Only available on postgresql, and only when the queryset has no WHERE
+    clause (otherwise the table's size says little about the result).
+    """
+
+    if not hasattr(queryset, 'query'):
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    return row and int(row[0]) or None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator which avoids counting every row of large, unfiltered tables.
+
+    Admin changelists count the whole table to paginate it, which on big
+    tables takes longer than fetching the page. If the estimate is above
+    settings.ADMIN_ESTIMATED_COUNT_THRESHOLD it is used instead; filtered
+    and smaller querysets are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super(EstimatedCountPaginator, self).count
@@ -0,0 +1,38 @@
+"""Normalised forms of telephone numbers which can be looked up with an index.
+
+Twilio sends numbers in E.164 form, but numbers stored by signalbox may have
+been entered in national form. We store an E.164 copy for equality lookups,
+and the digits reversed so that matching the end of a number (the old
+iendswith lookups) becomes an indexed prefix query.
+"""
+
+from django.conf import settings
+import phonenumbers
+
+# number of trailing digits which must match when we can't match exactly
+SUFFIX_DIGITS = 9
+
+
+def normalise_phone(value, region=None):
+    """Return a number (string or PhoneNumber) in E.164 form, or None if it can't be parsed."""
+
+    if not value:
+        return None
+    if not isinstance(value, phonenumbers.PhoneNumber):
+        try:
+            value = phonenumbers.parse(str(value), region or settings.DEFAULT_TELEPHONE_COUNTRY_CODE)
+        except phonenumbers.NumberParseException:
+            return None
+    return phonenumbers.format_number(value, phonenumbers.PhoneNumberFormat.E164)
+
+
+def reversed_digits(value):
+    """Return just the digits of a number, last digit first."""
+
+    return "".join(c for c in str(value or "") if c.isdigit())[::-1] or None
+
+
+def suffix_key(value, digits=SUFFIX_DIGITS):
+    """The prefix of reversed_digits() to match numbers ending in the same digits."""
+
+    return (reversed_digits(value) or "")[:digits] or None
@@ -53,6 +53,39 @@ def execute_the_todo_list(study=None, user=None):
     return [(i, i.do()) for i in todo]
 
 
+def expire_lapsed_observations(study=None):
+    """Mark Observations whose completion window has passed as missing.
+
+    Runs one UPDATE per Study and records the expiry for each batch with a
+    single bulk INSERT of ObservationData. Returns a list of tuples:
+    (Study, n_expired).
+    """
+    from django.db import transaction
+    from signalbox.models import Study, ObservationData
+    from signalbox.models.observation_timing_functions import (
+        observations_past_completion_window, EXPIRED_STATUS)
+
+    studies = study and [study] or Study.objects.all()
+    now = datetime.now()
+
+    results = []
+    for s in studies:
+        with transaction.atomic():
+            expired = observations_past_completion_window(s, now=now)
+            ids = list(expired.values_list('id', flat=True))
+            if not ids:
+                continue
+            expired.model.objects.filter(id__in=ids).update(
+                status=EXPIRED_STATUS, next_eligible_at=None)
+            ObservationData.objects.bulk_create(
+                [ObservationData(observation_id=i, key="expired",
+                    value="Completion window closed before {}".format(now))
+                 for i in ids])
+        results.append((s, len(ids)))
+
+    return results
+
+
 def send_reminders_due_now(study=None):
     """Create list of ReminderInstances due and do them"""
     from signalbox.models.observation import ReminderInstance
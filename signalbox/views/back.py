@@ -29,7 +29,14 @@ from signalbox.models.observation_timing_functions import \
     observations_due_in_window
 from signalbox.decorators import group_required
 from signalbox.utils import pretty_datetime
+from signalbox.utilities.djangobits import supergetattr
 from signalbox.allocation import allocate
+from signalbox.archive import archived_records
+from signalbox.changes import log_reply_changes
+from signalbox.duplicates import duplicate_reply_summaries, invalidate_duplicate_reply_summary
+from signalbox.enrolment import EnrolmentError, bulk_enrol, read_participants_csv, validate_participants
+from signalbox.forms import BulkEnrolmentForm
+from signalbox.wide import refresh_wide_reply_meta
 from signalbox.models.observation_helpers import *
 
 from signalbox.lookups import UserLookup, MembershipLookup, ObservationLookup
@@ -177,6 +184,41 @@ def add_participant(request, study_id=None, user_id=None):
                               {'form': form})
 
 
+@group_required(['Researchers'])
+def bulk_enrol_participants(request):
+    """Upload a CSV of participants, then create and randomise them in bulk."""
+
+    form = BulkEnrolmentForm(request.POST or None, request.FILES or None)
+    counts, errors = None, []
+
+    if request.POST and form.is_valid():
+        study = form.cleaned_data['study']
+        try:
+            participants = validate_participants(
+                study, read_participants_csv(form.cleaned_data['participants']))
+            counts = bulk_enrol(study, participants, dry_run=form.cleaned_data['dry_run'])
+        except (EnrolmentError, ValueError) as e:
+            errors = getattr(e, 'errors', [(None, str(e))])
+            messages.error(request, str(e))
+        else:
+            if not form.cleaned_data['dry_run']:
+                messages.success(request, "Enrolled {} participants in {}".format(
+                    counts['memberships'], study))
+
+    return render(request, 'admin/signalbox/bulk_enrol.html',
+        {'form': form, 'counts': counts, 'errors': errors})
+
+
+@group_required(['Researchers', 'Clinicians', 'Research Assistants', 'Assessors'])
+def archived_history(request, model, pk):
+    """Show the archived ObservationData, ReplyData and versions for an Observation or Reply."""
+
+    klass = {'observation': Observation, 'reply': Reply}[model]
+    obj = get_object_or_404(klass, id=pk)
+    return render(request, 'admin/signalbox/archived_history.html',
+        {'object': obj, 'records': archived_records(obj)})
+
+
 @group_required(['Researchers'])
 def randomise_membership(request, membership_id):
     """View to assign Membership to Condition"""
@@ -318,9 +360,10 @@ def resolve_double_entry_conflicts(request, study_id=None, observation_id=None):
     """
 
     if not study_id and not observation_id:
-        studies = [(i,
-                    len(i.unresolved_observations_with_duplicate_replies()),
-                    len(i.observations_with_duplicate_replies())) for i in Study.objects.all()]
+        allstudies = list(Study.objects.all())
+        summaries = duplicate_reply_summaries(allstudies)
+        studies = [(i, summaries[i.id]['unresolved'], summaries[i.id]['duplicated'])
+            for i in allstudies]
 
         studies = sorted(
             [i for i in studies if i[2]], key=lambda a: a[1], reverse=True)
@@ -355,11 +398,17 @@ def mark_reply_as_canonical(request, reply_id, set_to=True, hide_canonical=True)
     """
 
     reply = get_object_or_404(Reply, id=reply_id)
-    for r in reply.observation.reply_set.all():
-        r.is_canonical_reply = False
-        r.save()
+    others = reply.observation.reply_set.exclude(id=reply.id)
+    others_ids = list(others.values_list('id', flat=True))
+    log_reply_changes(others_ids)
+    others.update(is_canonical_reply=False)
+    refresh_wide_reply_meta(others_ids)
     reply.is_canonical_reply = set_to
     reply.save()
+    # reply.save() only clears the summary if this Reply's own flag changed
+    study_id = supergetattr(reply, 'observation.dyad.study_id', None)
+    if study_id:
+        invalidate_duplicate_reply_summary(study_id)
 
     return resolve_double_entry_conflicts(request, observation_id=reply.observation.id)
 
@@ -7,73 +7,100 @@ from django.core.exceptions import ValidationError
 import pandas as pd
 from django.contrib import messages
 from django.template import RequestContext
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, \
+    StreamingHttpResponse
 from django.core.urlresolvers import reverse
 from django.template.loader import get_template
 from django.template import Context, Template
+from django.views.decorators.http import condition
+from signalbox.anonymous import (answer_state, asker_answers, etag, next_cursor,
+    question_metadata, stream_answers)
+from signalbox.codebook import codebooks
+from signalbox.columnar import FORMATS as COLUMNAR_FORMATS, write_columnar
 from signalbox.decorators import group_required
+from signalbox.export import ANSWER_FIELDS_MAP, ROW_FIELDS_MAP, wide_frames
 from signalbox.models import Answer, Study, Reply, Question, Membership
 from django.shortcuts import render, get_object_or_404
 from signalbox.forms import SelectExportDataForm, get_answers, DateShiftForm
+from signalbox.scoring import score_columns, scoresheets_for
+from signalbox.timeshift import timeshift_observations
 from signalbox.utilities.djangobits import conditional_decorator
 from django.conf import settings
 import reversion
 
 from ask.models.asker import Asker
 
-ANSWER_FIELDS_MAP = dict([
-    ('id', 'id'),
-    ('reply__id', 'reply'),
-    ('question__q_type', 'qtype'),
-    ('answer', 'answer'),
-    ('question__variable_name', 'variable_name'),
-])
 
-ROW_FIELDS_MAP = dict([
-    ('reply__id', 'reply'),
-    ('reply__collector', 'collector'),
-    ('reply__observation__id', 'observation'),
-    ('reply__entry_method', 'entry_method'),
-    ('reply__observation__n_in_sequence', 'observation_index'),
-    ('reply__observation__due', 'due'),
+def _anonymous_state(request, token, **kwargs):
+    """Look up the Asker for a download token, and the state of its Answers, once per request."""
 
-    ('reply__is_canonical_reply', 'canonical'),
-    ('reply__started', 'started'),
-    ('reply__last_submit', 'finished'),
-    ('reply__id', 'reply'),
+    if not hasattr(request, '_anonymous_state'):
+        asker = get_object_or_404(Asker, anonymous_download_token=token,
+            allow_unauthenticated_download_of_anonymous_data=True)
+        request._anonymous_state = (asker, answer_state(asker))
+    return request._anonymous_state
 
-    ('reply__observation__dyad__user__username', 'participant'),
-    ('reply__observation__dyad__relates_to__user__username', 'relates_to_participant'),
 
-    ('reply__observation__dyad__study__slug', 'study'),
-    ('reply__observation__dyad__condition__tag', 'condition'),
-    ('reply__observation__dyad__date_randomised', 'randomised_on'),
-])
+def _anonymous_etag(request, token, **kwargs):
+    asker, state = _anonymous_state(request, token)
+    return etag(asker, state, kwargs.get('part'), request.GET.get('after'), request.GET.get('limit'))
 
 
+def _anonymous_last_modified(request, token, **kwargs):
+    return _anonymous_state(request, token)[1][0]
 
-def get_parts_(token):
-    a = get_object_or_404(Asker, anonymous_download_token=token)
-    assert(a.allow_unauthenticated_download_of_anonymous_data==True)
-    answers =  Answer.objects.filter(reply__asker__in=[a])
-    df = pd.DataFrame.from_records(answers.values('question__variable_name', 'answer', 'reply__id', 'reply__started'))
 
-    questions = [i.question for i in answers]
-    meta_json = json.dumps([i.dict_for_dataframe() for i in questions if i],
-        indent=True)
+def _anonymous_part(asker, part):
+    metadata = question_metadata(asker)
+    if part == 'metadata':
+        return json.dumps([d for i, d in metadata])
 
-    df = [i.dict_for_dataframe() for i in answers]
+    by_question = dict(metadata)
+    answers = asker_answers(asker).values_list('question_id', 'reply_id', 'answer')
+    missing = set(i for i, _, _ in answers if i and i not in by_question)
+    by_question.update((q.id, q.dict_for_dataframe()) for q in
+        Question.objects.filter(id__in=missing).select_related('choiceset'))
 
-    return {'data': json.dumps(df, indent=2), 'metadata': meta_json }
+    rows = []
+    for question, reply, answer in answers:
+        row = dict(by_question.get(question, {}))
+        row.update({'reply': reply, 'answer': answer})
+        rows.append(row)
+    return json.dumps(rows)
 
 
+@condition(etag_func=_anonymous_etag, last_modified_func=_anonymous_last_modified)
 def export_anonymous_asker_data(request, part, token):
+    asker, state = _anonymous_state(request, token)
     return HttpResponse(
-        get_parts_(token)[part],
+        _anonymous_part(asker, part),
         content_type='text/javascript'
     )
 
 
+@condition(etag_func=_anonymous_etag, last_modified_func=_anonymous_last_modified)
+def stream_anonymous_asker_data(request, token):
+    """Stream a page of an Asker's Answers as JSON Lines; see signalbox.anonymous."""
+
+    asker, state = _anonymous_state(request, token)
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', settings.ANONYMOUS_EXPORT_PAGE_SIZE)),
+            settings.ANONYMOUS_EXPORT_PAGE_SIZE)
+    except ValueError:
+        return HttpResponseBadRequest("after and limit must be whole numbers")
+    if after < 0 or limit < 1:
+        return HttpResponseBadRequest("after must be at least 0 and limit at least 1")
+
+    response = StreamingHttpResponse(stream_answers(asker, after, limit),
+        content_type='application/x-ndjson')
+    cursor = next_cursor(asker, after, limit)
+    if cursor:
+        response['Link'] = '<{}?after={}&limit={}>; rel="next"'.format(
+            request.build_absolute_uri(request.path), cursor, limit)
+    return response
+
+
 @group_required(['Researchers', ])
 def export_data(request):
     form = SelectExportDataForm(request.POST or None)
@@ -93,27 +120,31 @@ def export_data(request):
         raise ValidationError("No data matching filters.")
 
     answers = answers.filter(question__variable_name__isnull=False)
-    return export_answers(request, answers)
+    if form.cleaned_data['canonical_only']:
+        answers = answers.filter(reply__in=Reply.objects.canonical())
+    if form.cleaned_data['file_format'] in COLUMNAR_FORMATS:
+        return export_columnar(answers, form.cleaned_data['file_format'])
+    return export_answers(request, answers, include_scores=form.cleaned_data['include_scores'])
 
 
-def export_answers(request, answers):
-    "Take a queryset of Answers and export to a zip file."
+def export_columnar(answers, file_format):
+    "Take a queryset of Answers and export to a typed Parquet or Arrow file."
 
-    # extract dicts
-    ad = answers.values(*list(ANSWER_FIELDS_MAP.keys()))
-    rd = answers.values(*list(ROW_FIELDS_MAP.keys()))
+    questions = Question.objects.filter(id__in=answers.values('question')).select_related(
+        'choiceset').order_by('variable_name')
+    with NamedTemporaryFile(suffix="." + file_format) as f:
+        write_columnar(answers, f.name, list(questions), file_format=file_format)
+        response = HttpResponse(open(f.name, 'rb').read(), content_type='application/octet-stream')
+    response['Content-disposition'] = "attachment; filename=exported_data.{}".format(file_format)
+    return response
 
-    # make dataframes
-    answerdata = pd.DataFrame({i['id']: i for i in ad}).T
-    rowmetadata = pd.DataFrame((i for i in rd))
 
-    # rename columns
-    answerdata.columns = [ANSWER_FIELDS_MAP[i] for i in answerdata.columns]
-    rowmetadata.columns = [ROW_FIELDS_MAP[i] for i in rowmetadata.columns]
+def export_answers(request, answers, include_scores=False):
+    "Take a queryset of Answers and export to a zip file."
 
-    # process
-    answerdata = answerdata.set_index(['reply', 'variable_name']).unstack()['answer']
-    rowmetadata = rowmetadata.drop_duplicates('reply').set_index('reply')
+    answerdata, rowmetadata = wide_frames(answers)
+    if include_scores:
+        answerdata = answerdata.join(score_columns(scoresheets_for(answers), answers))
 
     # make excel files and others
     namesofthingstoexport = "answers meta".split()
@@ -124,17 +155,14 @@ def export_answers(request, answers):
     makedotmp = get_template('signalbox/stata/make.dotemplate')
     makedostring = makedotmp.render(Context({'date': datetime.now(), 'request': request}))
 
-    # make a syntax file to label everything
-    questions = set((i.question for i in answers))
-    choicesets = set([x for x in (i.choiceset for i in questions if i.choiceset) if x.get_choices()])
-    syntaxtdotmp = get_template('signalbox/stata/process-variables.dotemplate')
-    syntax_dostring = syntaxtdotmp.render(Context({'questions': questions, 'choicesets': choicesets, 'request':request}))
+    # make syntax files and a codebook to label everything
+    labels = codebooks(answers)
 
     # make zip and return bytes
     with ZipFile(NamedTemporaryFile(suffix=".zip").name, 'w') as zipper:
         [zipper.write(i.name, j + os.path.splitext(i.name)[1]) for i, j in zip(tmpfiles, namesofthingstoexport)]
         zipper.writestr('make.do', makedostring.encode('utf-8', 'replace'))
-        zipper.writestr('make_labels.do', syntax_dostring.encode('utf-8', 'replace'))
+        [zipper.writestr(i, j.encode('utf-8', 'replace')) for i, j in labels.items()]
 
         zipper.close()
         zipbytes = open(zipper.filename, 'rb').read()
@@ -155,11 +183,6 @@ def generate_syntax(template, questions, reference_study=None):
     return syntax
 
 
-def _shifted(obj, datetimefield, delta):
-    setattr(obj, datetimefield, getattr(obj, datetimefield) + delta)
-    return obj
-
-
 @group_required(['Researchers', ])
 @conditional_decorator(reversion.create_revision, settings.USE_VERSIONING)
 def dateshift_membership(request, pk=None):
@@ -174,13 +197,7 @@ def dateshift_membership(request, pk=None):
         membership.date_randomised = membership.date_randomised + delta
         membership.save()
 
-        shiftable = [i for i in membership.observations(
-        ) if i.timeshift_allowed()]
-        shifted = [_shifted(i, 'due', delta) for i in shiftable]
-        shifted = [_shifted(i, 'due_original', delta) for i in shiftable]
-
-        _ = [i.add_data("timeshift", value=delta) for i in shifted]
-        _ = [i.save() for i in shifted]
+        nshifted = timeshift_observations(membership.observation_set.all(), delta)
 
         if settings.USE_VERSIONING:
             revision.comment = "Timeshifted observations by %s days." % (delta.days,)
@@ -188,7 +205,7 @@ def dateshift_membership(request, pk=None):
         form = DateShiftForm(
         )  # wipe the form to make it harder to double-submit by accident
         messages.add_message(request, messages.WARNING,
-            """{} observations shifted by {} days.""".format(len(shifted), delta.days))
+            """{} observations shifted by {} days.""".format(nshifted, delta.days))
 
         return HttpResponseRedirect(reverse('admin:signalbox_membership_change', args=(membership.pk,)))
 
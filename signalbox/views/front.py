@@ -116,7 +116,8 @@ def user_homepage(request):
         execute_the_todo_list(user=request.user)
 
     return render(request, 'signalbox/user_home.html',
-                              {'hideprofilebutton': False })
+                              {'hideprofilebutton': False,
+                               'dashboard': request.user.userprofile.dashboard()})
 
 
 class MembershipDetail(DetailView):
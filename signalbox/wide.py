@@ -0,0 +1,115 @@
+"""Keep WideReply rows: each Reply's Answers and export metadata in a single row.
+
+Exports otherwise pivot the long Answer table (a row per Reply and variable)
+and join five tables for each Reply's metadata. With
+settings.MATERIALISE_WIDE_REPLIES on, save_question_response and the Twilio
+save_answer call record_answer() in the same transaction as the Answer,
+listeners refresh the metadata when a Reply is saved, and exports read
+WideReply rows directly (see signalbox.export.wide_frames).
+
+Timeshifts and changes to a Membership's exported fields refresh the
+metadata too. Other changes which bypass Reply.save(), e.g. queryset updates
+of Observations, leave it stale until the rebuild_wide_replies command runs;
+it also fills the table for existing data.
+"""
+
+from collections import OrderedDict, defaultdict
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from signalbox.export import ROW_FIELDS_MAP
+from signalbox.models import Answer, Reply, WideReply
+
+REPLY_FIELDS = OrderedDict((k.replace('reply__', '', 1), v) for k, v in ROW_FIELDS_MAP.items())
+EXTRA_FIELDS = ['asker_id', 'observation__dyad__study', 'membership__study']
+
+
+def _reply_rows(reply_ids):
+    return Reply.objects.filter(id__in=reply_ids).values_list(
+        *(list(REPLY_FIELDS.keys()) + EXTRA_FIELDS))
+
+
+def _row_values(row):
+    n = len(REPLY_FIELDS)
+    asker, study, membership_study = row[n:]
+    meta = json.dumps(dict(zip(list(REPLY_FIELDS.values()), row[:n])), cls=DjangoJSONEncoder)
+    return {'asker_id': asker, 'study_id': study or membership_study, 'meta': meta}
+
+
+def build_wide_replies(reply_ids):
+    """Make unsaved WideReplies for some Replies from their Answers -> [WideReply]."""
+
+    answers = defaultdict(dict)
+    for reply, name, value in Answer.objects.filter(reply_id__in=reply_ids,
+            question__variable_name__isnull=False).order_by('id').values_list(
+            'reply_id', 'question__variable_name', 'answer'):
+        answers[reply][name] = value
+
+    return [WideReply(reply_id=row[0], answers=json.dumps(answers[row[0]]), **_row_values(row))
+        for row in _reply_rows(reply_ids) if row[0] in answers]
+
+
+def refresh_wide_replies(reply_ids):
+    """Rebuild the WideReplies for some Replies -> number of rows written."""
+
+    with transaction.atomic():
+        rows = build_wide_replies(reply_ids)
+        WideReply.objects.filter(reply_id__in=reply_ids).delete()
+        WideReply.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_wide_reply_meta(reply_ids):
+    """Update the metadata of existing WideReplies, e.g. after their Replies change."""
+
+    if not settings.MATERIALISE_WIDE_REPLIES:
+        return
+    for row in _reply_rows(reply_ids):
+        WideReply.objects.filter(reply_id=row[0]).update(**_row_values(row))
+
+
+def _update_answers(reply_id, update):
+    wide = WideReply.objects.select_for_update().filter(reply_id=reply_id).first()
+    if wide:
+        answers = json.loads(wide.answers)
+        update(answers)
+        if not answers:
+            # as in build_wide_replies, a Reply without Answers has no row
+            wide.delete()
+            return wide
+        wide.answers = json.dumps(answers)
+        wide.save(update_fields=['answers', 'updated'])
+    return wide
+
+
+def record_answer(answer):
+    """Add a saved Answer to its Reply's WideReply; call in the transaction saving the Answer."""
+
+    if not settings.MATERIALISE_WIDE_REPLIES or not answer.reply_id or not answer.question_id:
+        return
+    name = answer.question.variable_name
+    if not name:
+        return
+
+    update = lambda answers: answers.update({name: answer.answer})
+    with transaction.atomic():
+        if _update_answers(answer.reply_id, update):
+            return
+        try:
+            refresh_wide_replies([answer.reply_id])
+        except IntegrityError:
+            # another Answer to this Reply created the row first; its savepoint has
+            # been rolled back, so add this Answer to that row rather than failing
+            _update_answers(answer.reply_id, update)
+
+
+def forget_answer(answer):
+    """Remove a deleted Answer from its Reply's WideReply, if there is one."""
+
+    if not settings.MATERIALISE_WIDE_REPLIES or not answer.reply_id or not answer.question_id:
+        return
+    name = answer.question.variable_name
+    with transaction.atomic():
+        _update_answers(answer.reply_id, lambda answers: answers.pop(name, None))
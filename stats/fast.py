@@ -0,0 +1,333 @@
+"""
+fast.py module
+
+(Requires NumPy.)
+
+Vectorised versions of the most used list functions in stats.py.  Each
+takes lists, tuples or 1D NumPy arrays and returns exactly what the
+'l'-prefixed function of the same name returns: python floats, lists and
+tuples rather than NumPy scalars and arrays, including the same quirks
+(e.g. the histogram-interpolated median of lmedian).  Results agree with
+the list functions to floating point rounding (NumPy sums pairwise).
+
+When NumPy is available, stats.py dispatches list and tuple arguments of
+the functions in FUNCTIONS here (see stats.use_fast_functions, which can
+switch back); the list functions remain available under their 'l' names,
+and NumPy array arguments still go to the 'a' functions, which take extra
+dimension arguments.
+
+Probabilities are computed with the scalar list functions (betai,
+chisqprob, fprob, zprob) from the vectorised statistics.
+
+FUNCTIONS:  mean, samplevar, var, stdev, median
+            pearsonr, spearmanr, ttest_ind, chisquare, F_oneway
+            mannwhitneyu, ranksums, wilcoxont, kruskalwallish, tiecorrect
+            sum, ss, summult, sumdiffsquared, square_of_sums
+            shellsort, rankdata
+"""
+
+import math
+
+import numpy as N
+
+TINY = 1.0e-30
+
+FUNCTIONS = ['mean', 'median', 'samplevar', 'var', 'stdev', 'pearsonr', 'spearmanr',
+             'ttest_ind', 'chisquare', 'F_oneway', 'mannwhitneyu', 'ranksums', 'wilcoxont',
+             'kruskalwallish', 'tiecorrect', 'sum', 'ss', 'summult', 'sumdiffsquared',
+             'square_of_sums', 'shellsort', 'rankdata']
+
+
+def _values(inlist):
+    return N.asarray(inlist, dtype=N.float64)
+
+
+def _groups(sorted_values):
+    """Start positions and sizes of the runs of equal values in a sorted array."""
+    n = len(sorted_values)
+    starts = N.flatnonzero(N.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    return starts, N.diff(N.r_[starts, n])
+
+
+####################################
+#######  CENTRAL TENDENCY  #########
+####################################
+
+def mean(inlist):
+    """As lmean: the arithmetic mean of the values in inlist."""
+    return float(N.mean(_values(inlist)))
+
+
+def median(inlist, numbins=1000):
+    """As lmedian: the median interpolated within a histogram of numbins bins."""
+    a = _values(inlist)
+    n = len(a)
+    smallest = a.min()
+    binsize = (a.max() - smallest) / float(numbins)
+    if binsize == 0:
+        raise ValueError("median needs at least two different values")
+    # values in the top bin's upper limit (the largest value) fall outside, as in lhistogram
+    bins = ((a - smallest) / binsize).astype(N.int64)
+    hist = N.bincount(bins[bins < numbins], minlength=numbins)
+    cumhist = N.cumsum(hist)
+    cfbin = int(N.argmax(cumhist >= n / 2.0))
+    if cumhist[cfbin] < n / 2.0:
+        raise ValueError("median could not find the 50th percentile bin")
+    LRL = smallest + binsize * cfbin
+    cfbelow = cumhist[cfbin - 1]
+    freq = float(hist[cfbin])
+    return float(LRL + ((n / 2.0 - cfbelow) / freq) * binsize)
+
+
+####################################
+#####  VARIABILITY FUNCTIONS  ######
+####################################
+
+def samplevar(inlist):
+    """As lsamplevar: variance with N in the denominator."""
+    return float(N.var(_values(inlist)))
+
+
+def var(inlist):
+    """As lvar: variance with N-1 in the denominator."""
+    a = _values(inlist)
+    return float(N.sum((a - a.mean()) ** 2) / float(len(a) - 1))
+
+
+def stdev(inlist):
+    """As lstdev: standard deviation with N-1 in the denominator."""
+    return math.sqrt(var(inlist))
+
+
+####################################
+#####  CORRELATION FUNCTIONS  ######
+####################################
+
+def pearsonr(x, y):
+    """As lpearsonr: Pearson's r and its two-tailed p-value."""
+    if len(x) != len(y):
+        raise ValueError('Input values not paired in pearsonr.  Aborting.')
+    x = _values(x)
+    y = _values(y)
+    n = len(x)
+    r_num = n * N.dot(x, y) - x.sum() * y.sum()
+    r_den = math.sqrt((n * N.dot(x, x) - x.sum() ** 2) * (n * N.dot(y, y) - y.sum() ** 2))
+    r = float(r_num / r_den)
+    df = n - 2
+    t = r * math.sqrt(df / ((1.0 - r + TINY) * (1.0 + r + TINY)))
+    prob = stats.lbetai(0.5 * df, 0.5, df / float(df + t * t))
+    return r, prob
+
+
+def spearmanr(x, y):
+    """As lspearmanr: Spearman's rho and its two-tailed p-value."""
+    if len(x) != len(y):
+        raise ValueError('Input values not paired in spearmanr.  Aborting.')
+    n = len(x)
+    dsq = float(N.sum((_ranks(x) - _ranks(y)) ** 2))
+    rs = 1 - 6 * dsq / (float(n) * (float(n) ** 2 - 1))
+    t = rs * math.sqrt((n - 2) / ((rs + 1.0) * (1.0 - rs)))
+    df = n - 2
+    probrs = stats.lbetai(0.5 * df, 0.5, df / (df + t * t))
+    return rs, probrs
+
+
+####################################
+#####  INFERENTIAL STATISTICS  #####
+####################################
+
+def ttest_ind(a, b, printit=0, name1='Samp1', name2='Samp2', writemode='a'):
+    """As lttest_ind: t and its two-tailed p-value for two independent samples."""
+    a = _values(a)
+    b = _values(b)
+    x1 = float(a.mean())
+    x2 = float(b.mean())
+    v1 = var(a)
+    v2 = var(b)
+    n1 = len(a)
+    n2 = len(b)
+    df = n1 + n2 - 2
+    svar = ((n1 - 1) * v1 + (n2 - 1) * v2) / float(df)
+    t = (x1 - x2) / math.sqrt(svar * (1.0 / n1 + 1.0 / n2))
+    prob = stats.lbetai(0.5 * df, 0.5, df / (df + t * t))
+
+    if printit != 0:
+        statname = 'Independent samples T-test.'
+        stats.outputpairedstats(printit, writemode,
+                                name1, n1, x1, v1, float(a.min()), float(a.max()),
+                                name2, n2, x2, v2, float(b.min()), float(b.max()),
+                                statname, t, prob)
+    return t, prob
+
+
+def chisquare(f_obs, f_exp=None):
+    """As lchisquare: the one-way chi square and its p-value."""
+    f_obs = _values(f_obs)
+    k = len(f_obs)
+    if f_exp is None:
+        f_exp = N.repeat(f_obs.sum() / float(k), k)
+    else:
+        f_exp = _values(f_exp)
+    chisq = float(N.sum((f_obs - f_exp) ** 2 / f_exp))
+    return chisq, stats.lchisqprob(chisq, k - 1)
+
+
+def F_oneway(*lists):
+    """As lF_oneway: the F value and its p-value for a one-way ANOVA."""
+    groups = [_values(i) for i in lists]
+    alldata = N.concatenate(groups)
+    bign = len(alldata)
+    correction = alldata.sum() ** 2 / float(bign)
+    sstot = N.dot(alldata, alldata) - correction
+    ssbn = N.sum([g.sum() ** 2 / float(len(g)) for g in groups]) - correction
+    sswn = sstot - ssbn
+    dfbn = len(groups) - 1
+    dfwn = bign - len(groups)
+    f = float((ssbn / float(dfbn)) / (sswn / float(dfwn)))
+    return f, stats.lfprob(dfbn, dfwn, f)
+
+
+def tiecorrect(rankvals):
+    """As ltiecorrect: the correction factor for ties in U and H tests."""
+    ranks = N.sort(_values(rankvals))
+    n = float(len(ranks))
+    starts, counts = _groups(ranks)
+    counts = counts[counts > 1].astype(N.float64)
+    return 1.0 - float(N.sum(counts ** 3 - counts)) / (n ** 3 - n)
+
+
+def mannwhitneyu(x, y):
+    """As lmannwhitneyu: the smaller U and its one-tailed p-value."""
+    n1 = len(x)
+    n2 = len(y)
+    ranked = _ranks(N.concatenate([_values(x), _values(y)]))
+    u1 = n1 * n2 + (n1 * (n1 + 1)) / 2.0 - float(ranked[:n1].sum())
+    u2 = n1 * n2 - u1
+    bigu = max(u1, u2)
+    smallu = min(u1, u2)
+    T = math.sqrt(tiecorrect(ranked))
+    if T == 0:
+        raise ValueError('All numbers are identical in lmannwhitneyu')
+    sd = math.sqrt(T * n1 * n2 * (n1 + n2 + 1) / 12.0)
+    z = abs((bigu - n1 * n2 / 2.0) / sd)
+    return smallu, 1.0 - stats.lzprob(z)
+
+
+def ranksums(x, y):
+    """As lranksums: the rank sums z and its two-tailed p-value."""
+    n1 = len(x)
+    n2 = len(y)
+    ranked = _ranks(N.concatenate([_values(x), _values(y)]))
+    s = float(ranked[:n1].sum())
+    expected = n1 * (n1 + n2 + 1) / 2.0
+    z = (s - expected) / math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12.0)
+    prob = 2 * (1.0 - stats.lzprob(abs(z)))
+    return z, prob
+
+
+def wilcoxont(x, y):
+    """As lwilcoxont: the Wilcoxon T for related samples and its two-tailed p-value."""
+    if len(x) != len(y):
+        raise ValueError('Unequal N in wilcoxont.  Aborting.')
+    d = _values(x) - _values(y)
+    d = d[d != 0]
+    count = len(d)
+    absranked = _ranks(N.abs(d))
+    r_minus = float(absranked[d < 0].sum())
+    r_plus = float(absranked[d >= 0].sum())
+    wt = min(r_plus, r_minus)
+    mn = count * (count + 1) * 0.25
+    se = math.sqrt(count * (count + 1) * (2.0 * count + 1.0) / 24.0)
+    z = math.fabs(wt - mn) / se
+    prob = 2 * (1.0 - stats.lzprob(abs(z)))
+    return wt, prob
+
+
+def kruskalwallish(*args):
+    """As lkruskalwallish: H (corrected for ties) and its p-value."""
+    n = N.array([len(i) for i in args], dtype=N.float64)
+    ranked = _ranks(N.concatenate([_values(i) for i in args]))
+    T = tiecorrect(ranked)
+    rsums = N.add.reduceat(ranked, N.r_[0, N.cumsum(n)[:-1]].astype(N.int64))
+    ssbn = float(N.sum(rsums ** 2 / n))
+    totaln = float(n.sum())
+    h = 12.0 / (totaln * (totaln + 1)) * ssbn - 3 * (totaln + 1)
+    df = len(args) - 1
+    if T == 0:
+        raise ValueError('All numbers are identical in lkruskalwallish')
+    h = h / float(T)
+    return h, stats.lchisqprob(h, df)
+
+
+####################################
+########  SUPPORT FUNCTIONS  #######
+####################################
+
+def _number(value, *arrays):
+    # integer input gives an integer, as with the list functions
+    if all(a.dtype.kind in 'iub' for a in arrays):
+        return int(value)
+    return float(value)
+
+
+def sum(inlist):
+    """As lsum: the sum of the values in inlist."""
+    a = N.asarray(inlist)
+    return _number(a.sum(), a)
+
+
+def ss(inlist):
+    """As lss: the sum of the squared values in inlist."""
+    a = N.asarray(inlist)
+    return _number(N.dot(a, a), a)
+
+
+def summult(list1, list2):
+    """As lsummult: the sum of the products of paired values."""
+    if len(list1) != len(list2):
+        raise ValueError("Lists not equal length in summult.")
+    a = N.asarray(list1)
+    b = N.asarray(list2)
+    return _number(N.dot(a, b), a, b)
+
+
+def sumdiffsquared(x, y):
+    """As lsumdiffsquared: the sum of the squared paired differences."""
+    a = N.asarray(x)
+    b = N.asarray(y)
+    return _number(N.sum((a - b) ** 2), a, b)
+
+
+def square_of_sums(inlist):
+    """As lsquare_of_sums: the square of the sum of the values."""
+    s = float(_values(inlist).sum())
+    return s * s
+
+
+def shellsort(inlist):
+    """As lshellsort: (sorted list, list of the original positions of the sorted values).
+
+    Tied values keep their original order.
+    """
+    a = N.asarray(inlist)
+    ivec = N.argsort(a, kind='stable')
+    return a[ivec].tolist(), ivec.tolist()
+
+
+def _ranks(inlist):
+    a = N.asarray(inlist)
+    order = N.argsort(a, kind='stable')
+    starts, counts = _groups(a[order])
+    averank = starts + (counts - 1) / 2.0 + 1
+    ranks = N.empty(len(a), dtype=N.float64)
+    ranks[order] = N.repeat(averank, counts)
+    return ranks
+
+
+def rankdata(inlist):
+    """As lrankdata: the ranks of the values in inlist, ties given their average rank."""
+    return _ranks(inlist).tolist()
+
+
+# stats.py imports this module when defining its dispatches, so import it last
+from . import stats
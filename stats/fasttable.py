@@ -0,0 +1,251 @@
+"""
+fasttable.py module
+
+(Requires NumPy.)
+
+Faster versions of the list-of-lists table functions in pstat.py.
+Each takes the same arguments and returns exactly what the pstat function
+of the same name returns: new lists of the original python values, in the
+same order, never NumPy arrays or scalars.
+
+  * collapse groups rows in one pass, sorting the key columns with
+    N.lexsort when each holds only numbers or only strings and hashing
+    them otherwise; default means are N.bincount sums.  pstat.collapse calls
+    linexand once per group, so its cost grows with rows * groups.
+  * sortby sorts numeric tables with N.lexsort and other tables with
+    a key function, rather than abutting and slicing copies of every row.
+  * unique and recode use dictionaries rather than list searches, falling
+    back to list searches for unhashable values.
+  * colex and abut build rows directly, without the deep copies and
+    repeated concatenation of pstat.simpleabut.
+
+linexand and linexor are not here: pstat's versions already take a single
+filter() pass, which is quicker than building the column arrays a boolean
+mask needs from a list of lists.
+
+When NumPy is available, pstat.py uses these functions for tables of at
+least FAST_TABLE_ROWS rows (see pstat.use_fast_tables, which can switch
+back).
+
+FUNCTIONS:  abut, colex, collapse, recode, sortby, unique
+"""
+
+import numpy as N
+
+FUNCTIONS = ['abut', 'colex', 'collapse', 'recode', 'sortby', 'unique']
+
+_LIST = object()       # marks hash keys made from lists, so [1, 2] != (1, 2)
+
+
+def _sequence(x):
+    return type(x) in (list, tuple)
+
+
+def _column(listoflists, col):
+    """One column as an array: numbers, strings, or (if mixed) python objects."""
+    values = [row[col] for row in listoflists]
+    try:
+        a = N.asarray(values)
+    except ValueError:                        # e.g. lists of different lengths
+        a = None
+    if a is None or a.ndim != 1 or a.dtype.kind not in 'biufU' or \
+            (a.dtype.kind == 'U' and not all(isinstance(v, str) for v in values)):
+        a = N.empty(len(values), dtype=object)   # N.asarray([1, 'a']) gives strings
+        for i, v in enumerate(values):
+            a[i] = v
+    return a
+
+
+def _hashable(item):
+    return (_LIST, tuple(item)) if type(item) is list else item
+
+
+####################################
+########  COLUMNS AND ROWS  ########
+####################################
+
+def _cycle(x, n):
+    # x repeated until it is n long, as the loops in pstat.abut
+    return (x * (n // len(x) + 1))[:n]
+
+
+def abut(source, *args):
+    """As pstat.abut: lists concatenated side-by-side, shorter ones repeated."""
+    if not _sequence(source):
+        source = [source]
+    for addon in args:
+        if not _sequence(addon):
+            addon = [addon]
+        n = max(len(source), len(addon))
+        source, addon = _cycle(list(source), n), _cycle(list(addon), n)
+        if _sequence(source[0]):
+            if _sequence(addon[0]):
+                source = [s + a for s, a in zip(source, addon)]
+            else:
+                source = [s + [a] for s, a in zip(source, addon)]
+        elif _sequence(addon[0]):
+            source = [[s] + a for s, a in zip(source, addon)]
+        else:
+            source = [[s, a] for s, a in zip(source, addon)]
+    return source
+
+
+def colex(listoflists, cnums):
+    """As pstat.colex: a column, or rows of the columns listed in cnums."""
+    if _sequence(cnums):
+        if len(cnums) == 1:
+            return [x[cnums[0]] for x in listoflists]
+        return [[x[c] for c in cnums] for x in listoflists]
+    elif isinstance(cnums, str):
+        return list(map(eval('lambda x: x' + cnums), listoflists))
+    return [x[cnums] for x in listoflists]
+
+
+def sortby(listoflists, sortcols):
+    """As pstat.sortby: rows sorted on sortcols, then on the whole row."""
+    if not _sequence(sortcols):
+        sortcols = [sortcols]
+    try:
+        a = N.asarray(listoflists)
+    except ValueError:                        # rows of different lengths
+        a = None
+    if a is not None and a.ndim == 2 and len(a) and a.dtype.kind in 'biuf':
+        # N.lexsort sorts on its last key first, and is stable like list.sort
+        keys = [a[:, c] for c in range(a.shape[1] - 1, -1, -1)]
+        keys += [a[:, c] for c in reversed(sortcols)]
+        order = N.lexsort(keys).tolist()
+    else:
+        order = sorted(range(len(listoflists)),
+                       key=lambda i: [listoflists[i][c] for c in sortcols] + list(listoflists[i]))
+    return [list(listoflists[i]) for i in order]
+
+
+####################################
+##########  GROUPS AND SETS  #######
+####################################
+
+def unique(inlist):
+    """As pstat.unique: the unique items (or rows) in inlist, in order of first appearance."""
+    seen = set()
+    uniques = []
+    try:
+        for item in inlist:
+            key = _hashable(item)
+            if key not in seen:
+                seen.add(key)
+                uniques.append(item)
+    except TypeError:                         # unhashable items
+        uniques = []
+        for item in inlist:
+            if item not in uniques:
+                uniques.append(item)
+    return uniques
+
+
+def _groups(listoflists, keepcols):
+    """Group the rows by the values in keepcols, groups in sorted order of those values.
+
+    Returns (the group of each row, the first row of each group), as arrays.
+    """
+    n = len(listoflists)
+    columns = [_column(listoflists, c) for c in keepcols]
+    if all(a.dtype.kind != 'O' for a in columns):
+        order = N.lexsort(columns[::-1])
+        change = N.zeros(n, dtype=bool)
+        change[:1] = True
+        for a in columns:
+            sorted_a = a[order]
+            change[1:] |= sorted_a[1:] != sorted_a[:-1]
+        codes = N.empty(n, dtype=N.intp)
+        codes[order] = N.cumsum(change) - 1
+        return codes, order[change]
+
+    index = {}
+    codes = N.empty(n, dtype=N.intp)
+    first = []
+    for i, row in enumerate(listoflists):
+        key = tuple(row[c] for c in keepcols)
+        if key not in index:
+            index[key] = len(first)
+            first.append(i)
+        codes[i] = index[key]
+    keys = sorted(index)
+    rank = N.empty(len(keys), dtype=N.intp)
+    rank[[index[k] for k in keys]] = N.arange(len(keys))
+    return rank[codes], N.array(first, dtype=N.intp)[N.argsort(rank)]
+
+
+def _mean(inlist):
+    s = 0
+    for item in inlist:
+        s = s + item
+    return s / float(len(inlist))
+
+
+def collapse(listoflists, keepcols, collapsecols, fcn1=None, fcn2=None, cfcn=None):
+    """As pstat.collapse with keepcols: a row per unique set of keepcols values.
+
+    Each row has the keepcols values, then for each of collapsecols the
+    result of cfcn (default the mean), then of fcn1 and fcn2 if given.
+    """
+    if not _sequence(keepcols):
+        keepcols = [keepcols]
+    if not _sequence(collapsecols):
+        collapsecols = [collapsecols]
+    codes, first = _groups(listoflists, keepcols)
+    counts = N.bincount(codes, minlength=len(first))
+    order = N.argsort(codes, kind='stable').tolist()
+    bounds = N.r_[0, N.cumsum(counts)].tolist()
+
+    newlist = [[listoflists[i][c] for c in keepcols] for i in first.tolist()]
+    for col in collapsecols:
+        values = [row[col] for row in listoflists]
+        a = _column(listoflists, col)
+        if cfcn is None and a.dtype.kind in 'biuf':
+            # bincount adds each group's values in row order, as _mean does
+            results = (N.bincount(codes, weights=a, minlength=len(first)) / counts).tolist()
+        else:
+            results = None
+        if results is None or fcn1 is not None or fcn2 is not None:
+            ordered = [values[i] for i in order]
+            groups = [ordered[bounds[g]:bounds[g + 1]] for g in range(len(first))]
+        for g, item in enumerate(newlist):
+            item.append(results[g] if results is not None else (cfcn or _mean)(groups[g]))
+            for fcn in (fcn1, fcn2):
+                if fcn is not None:
+                    try:
+                        test = fcn(groups[g])
+                    except Exception:
+                        test = 'N/A'
+                    item.append(test)
+    return newlist
+
+
+def recode(inlist, listmap, cols=None):
+    """As pstat.recode: a copy of inlist with values found in listmap[i][0] replaced by listmap[i][1]."""
+    lst = [list(row) for row in inlist]
+    olds = [row[0] for row in listmap]
+    mapping = {}
+    try:
+        for i in range(len(olds) - 1, -1, -1):   # the first match wins, as list.index
+            mapping[olds[i]] = listmap[i][1]
+    except TypeError:                           # unhashable old values
+        mapping = None
+
+    def new(value):
+        if mapping is not None:
+            try:
+                return mapping.get(value, value)
+            except TypeError:
+                pass
+        try:
+            return listmap[olds.index(value)][1]
+        except ValueError:
+            return value
+
+    if cols is not None and not _sequence(cols):
+        cols = [cols]
+    for row in lst:
+        for col in (cols if cols is not None else range(len(row))):
+            row[col] = new(row[col])
+    return lst
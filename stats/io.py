@@ -27,9 +27,15 @@ Defines a number of functions for pseudo-command-line OS functionality.
     getstrings(namepatterns,verbose=1)
     put(outlist,filename,writetype='w')
     aget(namepatterns,verbose=1)
+    afastget(namepattern,verbose=1,dtype=N.float64,blocksize=16777216)
     aput(outarray,filename,writetype='w')
     bget(filename,numslices=1,xsize=64,ysize=64)
     braw(filename,btype)
+    brawmap(filename,btype,shp=None,byteorder='=',offset=0,mode='r')
+    bingetmap(filename,btype=None)
+    mghbgetmap(filename,numslices=-1,xsize=64,ysize=64,unpackstr=N.int16,byteorder='>')
+    mgetmap(filename,btype,byteorder='=')
+    brikgetmap(filename,byteorder=None)
     bput(outarray,filename,writeheader=0,packstring='h',writetype='wb')
     mrget(filename)
     find_dirs(sourcedir)
@@ -69,6 +75,10 @@ except:
 from . import pstat
 import glob, re, string, types, os, struct, copy, time, tempfile, sys
 from types import *
+try:
+    from types import ListType, TupleType, IntType, FloatType, StringType
+except ImportError:        # python 3
+    ListType, TupleType, IntType, FloatType, StringType = list, tuple, int, float, str
 import numpy as N
 
 __version__ = 0.6
@@ -181,14 +191,14 @@ Returns: a 1D or 2D list of lists from whitespace delimited text files
     elements = []
     for i in range(len(fnames)):
         file = open(fnames[i])
-        newelements = list(map(string.split,file.readlines()))
+        newelements = list(map(str.split,file.readlines()))
         for i in range(len(newelements)):
             for j in range(len(newelements[i])):
                 try:
-                    newelements[i][j] = string.atoi(newelements[i][j])
+                    newelements[i][j] = int(newelements[i][j])
                 except ValueError:
                     try:
-                        newelements[i][j] = string.atof(newelements[i][j])
+                        newelements[i][j] = float(newelements[i][j])
                     except:
                         pass
         elements = elements + newelements
@@ -216,7 +226,7 @@ Returns: a list of strings, one per line in each text file specified by
     elements = []
     for filename in fnames:
         file = open(filename)
-        newelements = list(map(string.split,file.readlines()))
+        newelements = list(map(str.split,file.readlines()))
         elements = elements + newelements
     return elements
 
@@ -289,11 +299,11 @@ Returns: an array of integers, floats or objects (type='O'), depending on the
         del_list.reverse()
         for i in del_list:
             newelements.pop(i)
-        newelements = list(map(string.split,newelements))
+        newelements = list(map(str.split,newelements))
         for i in range(len(newelements)):
             for j in range(len(newelements[i])):
                 try:
-                    newelements[i][j] = string.atof(newelements[i][j])
+                    newelements[i][j] = float(newelements[i][j])
                 except:
                     pass
         elements = elements + newelements
@@ -308,6 +318,69 @@ Returns: an array of integers, floats or objects (type='O'), depending on the
     return elements
 
 
+def afastget (namepattern,verbose=1,dtype=N.float64,blocksize=16777216):
+    """
+Loads an array from 2D text files of NUMBERS ONLY, as aget() does but
+reading blocksize bytes at a time and converting each block in one call
+to N.fromstring, rather than a value at a time.  Lines beginning with # or %
+and blank lines are skipped.  Every line must have the same number of
+columns; use aget() for files containing strings.
+
+Usage:   afastget (namepattern,verbose=1,dtype=N.float64,blocksize=16777216)
+Returns: a 2D array of dtype, with a row per line of the files specified
+         by namepattern
+"""
+    fnames = glob.glob(namepattern)
+    if len(fnames) == 0:
+        if verbose:
+            print('NO FILENAMES MATCH ('+namepattern+') !!')
+        return None
+    if verbose:
+        print(fnames)
+    blocks = []
+    numcols = None
+    for filename in fnames:
+        file = open(filename,'rb')
+        carryover = b''
+        while 1:
+            block = file.read(blocksize)
+            if block:                        # keep any partial last line
+                d = carryover + block
+                cutindex = d.rfind(b'\n')+1
+                carryover = d[cutindex:]
+                d = d[:cutindex]
+            else:
+                d, carryover = carryover, b''
+            lines = [line for line in d.split(b'\n')
+                     if line.strip() and line[:1] not in (b'#', b'%')]
+            if lines:
+                if numcols is None:
+                    numcols = len(lines[0].split())
+                d = b'\n'.join(lines)
+                # count the numbers on each line: a number starts wherever
+                # a non-space character follows a space or a line's start
+                chars = N.frombuffer(d,N.uint8)
+                space = N.isin(chars,N.frombuffer(b' \t\r\n\x0b\x0c',N.uint8))
+                starts = ~space & N.r_[True,space[:-1]]
+                lineno = N.cumsum(chars == ord('\n'))
+                counts = N.bincount(lineno[starts],minlength=len(lines))
+                try:
+                    values = N.fromstring(d,dtype=dtype,sep=' ')
+                except ValueError:   # older NumPy returns the numbers it could read
+                    values = None
+                if values is None or (counts != numcols).any() or \
+                   len(values) != len(lines)*numcols:
+                    file.close()
+                    raise ValueError("afastget() needs the same number of numbers on every line; use aget()")
+                blocks.append(values.reshape(len(lines),numcols))
+            if not carryover and not block:
+                break
+        file.close()
+    if not blocks:
+        return N.zeros((0,0),dtype)
+    return N.concatenate(blocks)
+
+
 def aput (outarray,fname,writetype='w',delimit=' '):
     """
 Sends passed 1D or 2D array to an output file and closes the file.
@@ -322,7 +395,7 @@ Returns: None
         raise TypeError("put() and aput() require 1D or 2D arrays.  Otherwise use some kind of pickling.")
     else: # must be a 2D array
         for row in outarray:
-            outfile.write(string.join(list(map(str,row)),delimit))
+            outfile.write(delimit.join(list(map(str,row))))
             outfile.write('\n')
         outfile.close()
     return None
@@ -406,18 +479,18 @@ Usage:  brikget(imfile,unpackstr=N.int16,shp=None)  default shp: (-1,48,61,51)
         header = imfile[0:-4]+'HEAD'
         lines = open(header).readlines()
         for i in range(len(lines)):
-            if string.find(lines[i],'DATASET_DIMENSIONS') != -1:
-                dims = string.split(lines[i+2][0:string.find(lines[i+2],' 0')])
-                dims = list(map(string.atoi,dims))
-            if string.find(lines[i],'BRICK_FLOAT_FACS') != -1:
-                count = string.atoi(string.split(lines[i+1])[2])
+            if lines[i].find('DATASET_DIMENSIONS') != -1:
+                dims = lines[i+2][0:lines[i+2].find(' 0')].split()
+                dims = list(map(int,dims))
+            if lines[i].find('BRICK_FLOAT_FACS') != -1:
+                count = int(lines[i+1].split()[2])
                 mults = []
                 for j in range(int(N.ceil(count/5.))):
-                    mults += list(map(string.atof,string.split(lines[i+2+j])))
+                    mults += list(map(float,lines[i+2+j].split()))
                 mults = N.array(mults)
-            if string.find(lines[i],'BRICK_TYPES') != -1:
+            if lines[i].find('BRICK_TYPES') != -1:
                 first5 = lines[i+2]
-                first5 = list(map(string.atoi,string.split(first5)))
+                first5 = list(map(int,first5.split()))
                 if first5[0] == 0:
                     unpackstr = N.uint8
                 elif first5[0] == 1:
@@ -425,7 +498,7 @@ Usage:  brikget(imfile,unpackstr=N.int16,shp=None)  default shp: (-1,48,61,51)
                 elif first5[0] == 3:
                     unpackstr = N.float32
                 elif first5[0] == 5:
-                    unpackstr = N.complex32
+                    unpackstr = N.complex64
         dims.reverse()
         shp = [-1]+dims
     except IOError:
@@ -436,12 +509,11 @@ Usage:  brikget(imfile,unpackstr=N.int16,shp=None)  default shp: (-1,48,61,51)
     print('Using unpackstr:',unpackstr)  #,', bytesperpixel=',bytesperpixel
 
     file = open(imfile, "rb")
-    bdata = file.read()
 
     # the > forces big-endian (for or from Sun/SGI)
-    bdata = N.fromstring(bdata,unpackstr)
+    bdata = N.fromfile(file,unpackstr)
 #    littleEndian = ( struct.pack('i',1)==struct.pack('<i',1) )
-    if (max(bdata)>1e30):
+    if (bdata.max()>1e30):
         bdata = bdata.byteswap()
     try:
         bdata.shape = shp
@@ -509,21 +581,20 @@ Usage:   mghbget(imfile, numslices=-1, xsize=64, ysize=64,
 
     imsize = xsize*ysize
     file = open(imfile, "rb")
-    bdata = file.read()
 
-    numpixels = len(bdata) / bytesperpixel
+    numpixels = os.path.getsize(imfile) / bytesperpixel
     if numpixels%1 != 0:
         raise ValueError("Incorrect file size in fmri.bget()")
     else:  # the > forces big-endian (for or from Sun/SGI)
-        bdata = N.fromstring(bdata,unpackstr)
+        bdata = N.fromfile(file,unpackstr)
 #        littleEndian = ( struct.pack('i',1)==struct.pack('<i',1) )
 #        if littleEndian:
 #            bdata = bdata.byteswap()
-        if (max(bdata)>1e30):
+        if (bdata.max()>1e30):
             bdata = bdata.byteswap()
     if suffix[-3:] == 'img':
         if numslices == -1:
-            numslices = len(bdata)/8200  # 8200=(64*64*2)+8 bytes per image
+            numslices = len(bdata)//8200  # 8200=(64*64*2)+8 bytes per image
             xsize = 64
             ysize = 128
         slices = N.zeros((numslices,xsize,ysize),N.int32)
@@ -551,12 +622,12 @@ Usage:   braw(fname,btype,shp=None)
 Returns: flat array of floats, or ints (if btype=N.int16)
 """
     file = open(fname,'rb')
-    bdata = file.read()
-    bdata = N.fromstring(bdata,btype)
+    bdata = N.fromfile(file,btype)   # read straight into the array
+    file.close()
 #    littleEndian = ( struct.pack('i',1)==struct.pack('<i',1) )
 #    if littleEndian:
 #        bdata = bdata.byteswap()  # didn't used to need this with '>' above
-    if (max(bdata)>1e30):
+    if (bdata.max()>1e30):
         bdata = bdata.byteswap()
     if shp:
         try:
@@ -564,7 +635,7 @@ Returns: flat array of floats, or ints (if btype=N.int16)
             return bdata
         except:
             pass
-    return N.array(bdata)
+    return bdata
 
 
 def glget(fname,btype):
@@ -579,7 +650,7 @@ Returns: array of 'btype elements with shape 'shape', suitable for im.ashow()
     f = open(fname,'rb')
     shp = f.read(8)
     f.close()
-    shp = N.fromstring(shp,N.int32)
+    shp = N.frombuffer(shp,N.int32).copy()
     shp[0],shp[1] = shp[1],shp[0]
     try:
         carray = N.reshape(d,shp)
@@ -635,13 +706,13 @@ Save a file for use in matlab.
 """
     outarray = N.transpose(outarray)
     outdata = N.ravel(outarray).astype(btype)
-    outdata = outdata.tostring()
+    outdata = outdata.tobytes()
     outfile = open(fname,'wb')
     outfile.write(outdata)
     outfile.close()
     if writeheader == 1:
         try:
-            suffixindex = string.rfind(fname,'.')
+            suffixindex = fname.rfind('.')
             hdrname = fname[0:suffixindex]
         except ValueError:
             hdrname = fname
@@ -675,13 +746,13 @@ Usage:   bput (outarray,filename,writeheader=0,packtype=N.int16,writetype='wb')
 #    littleEndian = ( struct.pack('i',1)==struct.pack('<i',1) )
 #    if littleEndian:
 #        outdata = outdata.byteswap()
-    outdata = outdata.tostring()
+    outdata = outdata.tobytes()
     outfile = open(fname,writetype)
     outfile.write(outdata)
     outfile.close()
     if writeheader == 1:
         try:
-            suffixindex = string.rfind(fname,'.')
+            suffixindex = fname.rfind('.')
             hdrname = fname[0:suffixindex]
         except ValueError:
             hdrname = fname
@@ -946,17 +1017,15 @@ formats are ...
 Usage:   binget(fname,btype=None)
 Returns: data in file fname of type btype
 """
-    file = open(fname,'rb')
-    bdata = file.read()
-    file.close()
-
     # if none given, assume character preceeding 'bin' is the unpacktype
     if not btype:
         btype = fname[-4]
+    file = open(fname,'rb')
     try:
-        bdata = N.fromstring(bdata,btype)
+        bdata = N.fromfile(file,btype)
     except:
         raise ValueError("Bad unpacking type.")
+    file.close()
 
     # force the data on disk to be LittleEndian (for more efficient PC/Linux use)
     if not N.little_endian:
@@ -1003,14 +1072,14 @@ Usage:  binput(outarray,filename,packtype=None,writetype='wb')
     # force the data on disk to be little_endian (for more efficient PC/Linux use)
     if not N.little_endian:
         outdata = outdata.byteswap()
-    outdata = outdata.tostring()
+    outdata = outdata.tobytes()
     outfile = open(fname,writetype)
     outfile.write(outdata)
     outfile.close()
 
     # Now, write the header file
     try:
-        suffixindex = string.rfind(fname,'.')
+        suffixindex = fname.rfind('.')
         hdrname = fname[0:suffixindex+2]+'hdr'  # include .s or .f or .1 or whatever
     except ValueError:
         hdrname = fname
@@ -1021,6 +1090,127 @@ Usage:  binput(outarray,filename,packtype=None,writetype='wb')
     outfile.close()
     return None
 
+
+def brawmap(fname,btype,shp=None,byteorder='=',offset=0,mode='r'):
+    """
+Maps a binary file into memory with numpy.memmap rather than reading it,
+as braw() but loading nothing until the result is used: d[3] (e.g. one
+volume) or d[...,7] reads only those values from disk, so single volumes
+or columns can be pulled from files larger than memory.  braw() guesses
+the byte order from the values; here it is given, as byteorder = '<'
+(little-endian), '>' (big-endian) or '=' (this machine's).  One dimension
+of shp can be -1, as for braw().  Use mode='r+' to write back to the file.
+
+Usage:   brawmap(fname,btype,shp=None,byteorder='=',offset=0,mode='r')
+Returns: a numpy.memmap of btype elements, of shape shp (default flat)
+"""
+    dtype = N.dtype(btype).newbyteorder(byteorder)
+    count = (os.path.getsize(fname)-offset) // dtype.itemsize
+    if shp is None:
+        shp = [count]
+    shp = list(shp)
+    if -1 in shp:
+        others = [n for n in shp if n != -1]
+        shp[shp.index(-1)] = count // int(N.prod(others))
+    return N.memmap(fname,dtype=dtype,mode=mode,offset=offset,shape=tuple(shp))
+
+
+def bingetmap(fname,btype=None):
+    """
+Maps a file written by binput() into memory, as binget() but without
+loading it (see brawmap()).  The data are little-endian, as binput() writes
+them, and shaped from the associated hdr file if there is one.
+
+Usage:   bingetmap(fname,btype=None)
+Returns: a numpy.memmap of the data in fname
+"""
+    if not btype:
+        btype = fname[-4]
+    shp = None
+    try:
+        vals = get(fname[:-3]+'hdr',0)
+        if type(vals[0]) != ListType:
+            shp = vals
+    except:
+        print("No (or bad) header file. Returning unshaped array.")
+    return brawmap(fname,btype,shp,'<')
+
+
+def mghbgetmap(imfile,numslices=-1,xsize=64,ysize=64,unpackstr=N.int16,byteorder='>'):
+    """
+Maps a .bshort or .bfloat file into memory, as mghbget() but without
+loading it (see brawmap()), so d[i] reads just slice i.  The sizes come
+from the associated .hdr file if there is one.  The data are big-endian
+unless byteorder says otherwise.
+
+Usage:   mghbgetmap(imfile,numslices=-1,xsize=64,ysize=64,unpackstr=N.int16,byteorder='>')
+Returns: a numpy.memmap of shape (numslices,xsize,ysize), or (xsize,ysize)
+         for a single slice
+"""
+    if imfile[-3:] == 'img':
+        raise ValueError("mghbgetmap() can't map .img files; use mghbget()")
+    try:
+        vals = get(imfile[0:-6]+'hdr',0)
+        if type(vals[0]) == ListType:  # it's an extended header
+            vals = vals[0]
+        xsize, ysize, numslices = int(vals[0]), int(vals[1]), int(vals[2])
+    except:
+        print("No header file.  Continuing ...")
+    if imfile[-6:] == 'bfloat':
+        unpackstr = N.float32
+    slices = brawmap(imfile,unpackstr,[numslices,xsize,ysize],byteorder)
+    if len(slices) == 1:
+        slices = slices[0]
+    return slices
+
+
+def mgetmap(fname,btype,byteorder='='):
+    """
+Maps a file saved from matlab into memory, as mget() but without loading
+it (see brawmap()).  The result is a transposed view of the file, so
+d[...,i] reads just slice i.
+
+Usage:   mgetmap(fname,btype,byteorder='=')
+Returns: a numpy.memmap, shaped from the associated hdr file if there is one
+"""
+    shp = None
+    try:
+        vals = get(fname[0:-6]+'hdr',0)
+        if type(vals[0]) == ListType:  # it's an extended header
+            vals = vals[0]
+        xsize, ysize, numslices = int(vals[0]), int(vals[1]), int(vals[2])
+        if numslices == 1:
+            shp = [ysize,xsize]
+        else:
+            shp = [numslices,ysize,xsize]
+    except:
+        print("No header file.  Continuing ...")
+    return N.transpose(brawmap(fname,btype,shp,byteorder))
+
+
+def brikgetmap(imfile,byteorder=None):
+    """
+Maps an AFNI BRIK file into memory, as brikget() but without loading it
+(see brawmap()), so d[i] reads just sub-brick i.  The type, shape and byte
+order come from the HEAD file (give byteorder to override it).  Unlike
+brikget(), the BRICK_FLOAT_FACS scale factors are not applied; multiply a
+sub-brick by getafniparam(imfile,'BRICK_FLOAT_FACS')[i] where non-zero.
+
+Usage:   brikgetmap(imfile,byteorder=None)
+Returns: a numpy.memmap of shape (sub-bricks,z,y,x)
+"""
+    headfile = imfile[:-4]+'HEAD'
+    dims = getafniparam(headfile,'DATASET_DIMENSIONS')[:3]
+    types = getafniparam(headfile,'BRICK_TYPES')
+    btypes = {0:N.uint8, 1:N.int16, 3:N.float32, 5:N.complex64}
+    if len(set(types)) != 1 or types[0] not in btypes:
+        raise ValueError("brikgetmap() needs sub-bricks all of one type (byte, short, float or complex)")
+    if byteorder is None:
+        order = getafniparam(headfile,'BYTEORDER_STRING')
+        byteorder = {'LSB_FIRST':'<', 'MSB_FIRST':'>'}.get(order,'=')
+    dims.reverse()
+    return brawmap(imfile,btypes[types[0]],[-1]+dims,byteorder)
+
 def getafniparam(headfilename,paramname):
     """
 Loads in an AFNI header file, and returns the values of 'paramname'.
@@ -1033,7 +1223,7 @@ Returns: appropriate "type" for params, or None if fails
     d = get(headfilename)
     lines = open(headfilename,'r').readlines()
     for i in range(len(lines)):
-        if string.find(lines[i],paramname) != -1:
+        if lines[i].find(paramname) != -1:
             count = d[i+1][-1]
             gotten = 0
             result = []
@@ -1063,7 +1253,7 @@ Returns: None
     d = get(headfilename)
     lines = open(headfilename,'r').readlines()
     for i in range(len(lines)):
-        if string.find(lines[i],'HISTORY_NOTE') != -1:
+        if lines[i].find('HISTORY_NOTE') != -1:
             bytecount = d[i+1][-1]
             oldstr = lines[i+2][:-2]
             date = '[python:***  %s] ' %time.asctime()
@@ -105,12 +105,27 @@ functions/methods.  Their inclusion here is for function name consistency.
 ##
 ## 11/08/98 ... fixed aput to output large arrays correctly
 
-import stats  # required 3rd party module
+from . import stats  # required 3rd party module
 import string, copy
 from types import *
+try:
+    from types import ListType, TupleType, IntType, FloatType, StringType
+except ImportError:        # python 3
+    ListType, TupleType, IntType, FloatType, StringType = list, tuple, int, float, str
 
 __version__ = 0.4
 
+fasttable = None       # the NumPy table functions, imported below if possible
+FAST_TABLE_ROWS = None # use them for tables of at least this many rows
+
+def _fast_table(*tables):
+    if fasttable is None or FAST_TABLE_ROWS is None:
+        return 0
+    for table in tables:
+        if type(table) in [ListType,TupleType] and len(table) >= FAST_TABLE_ROWS:
+            return 1
+    return 0
+
 ###===========================  LIST FUNCTIONS  ==========================
 ###
 ### Here are the list functions, DEFINED FOR ALL SYSTEMS.
@@ -129,6 +144,8 @@ Usage:   abut(source, args)   where args=any # of lists
 Returns: a list of lists as long as the LONGEST list past, source on the
          'left', lists in <args> attached consecutively on the 'right'
 """
+    if _fast_table(source,*args):
+        return fasttable.abut(source,*args)
 
     if type(source) not in [ListType,TupleType]:
         source = [source]
@@ -137,24 +154,24 @@ Returns: a list of lists as long as the LONGEST list past, source on the
             addon = [addon]
         if len(addon) < len(source):                # is source list longer?
             if len(source) % len(addon) == 0:        # are they integer multiples?
-                repeats = len(source)/len(addon)    # repeat addon n times
+                repeats = len(source)//len(addon)   # repeat addon n times
                 origadd = copy.deepcopy(addon)
                 for i in range(repeats-1):
                     addon = addon + origadd
             else:
-                repeats = len(source)/len(addon)+1  # repeat addon x times,
+                repeats = len(source)//len(addon)+1 # repeat addon x times,
                 origadd = copy.deepcopy(addon)      #    x is NOT an integer
                 for i in range(repeats-1):
                     addon = addon + origadd
                     addon = addon[0:len(source)]
         elif len(source) < len(addon):                # is addon list longer?
             if len(addon) % len(source) == 0:        # are they integer multiples?
-                repeats = len(addon)/len(source)    # repeat source n times
+                repeats = len(addon)//len(source)   # repeat source n times
                 origsour = copy.deepcopy(source)
                 for i in range(repeats-1):
                     source = source + origsour
             else:
-                repeats = len(addon)/len(source)+1  # repeat source x times,
+                repeats = len(addon)//len(source)+1 # repeat source x times,
                 origsour = copy.deepcopy(source)    #   x is NOT an integer
                 for i in range(repeats-1):
                     source = source + origsour
@@ -211,6 +228,8 @@ Usage:   colex (listoflists,cnums)
 Returns: a list-of-lists corresponding to the columns from listoflists
          specified by cnums, in the order the column numbers appear in cnums
 """
+    if _fast_table(listoflists):
+        return fasttable.colex(listoflists,cnums)
     global index
     column = 0
     if type(cnums) in [ListType,TupleType]:   # if multiple columns to get
@@ -220,7 +239,7 @@ Returns: a list-of-lists corresponding to the columns from listoflists
             index = col
             column = abut(column,[x[index] for x in listoflists])
     elif type(cnums) == StringType:              # if an 'x[3:]' type expr.
-        evalstring = 'map(lambda x: x'+cnums+', listoflists)'
+        evalstring = 'list(map(lambda x: x'+cnums+', listoflists))'
         column = eval(evalstring)
     else:                                     # else it's just 1 col to get
         index = cnums
@@ -255,6 +274,8 @@ Returns: a list of lists with all unique permutations of entries appearing in
          keepcols = [keepcols]
      if type(collapsecols) not in [ListType,TupleType]:
          collapsecols = [collapsecols]
+     if keepcols != [] and _fast_table(listoflists):
+         return fasttable.collapse(listoflists,keepcols,collapsecols,fcn1,fcn2,cfcn)
      if cfcn == None:
          cfcn = collmean
      if keepcols == []:
@@ -302,7 +323,7 @@ Returns: a list of lists with all unique permutations of entries appearing in
                      except:
                          test = 'N/A'
                      item.append(test)
-                 newlist.append(item)
+             newlist.append(item)
          return newlist
 
 
@@ -356,7 +377,7 @@ Returns: the rows of listoflists where columnlist[i]=valuelist[i] for ALL i
             critval = str(valuelist[i])
         criterion = criterion + ' x['+str(columnlist[i])+']=='+critval+' and'
     criterion = criterion[0:-3]         # remove the "and" after the last crit
-    function = 'filter(lambda x: '+criterion+',listoflists)'
+    function = 'list(filter(lambda x: '+criterion+',listoflists))'
     lines = eval(function)
     return lines
 
@@ -386,7 +407,7 @@ Returns: the rows of listoflists where columnlist[i]=valuelist[i] for ANY i
             critval = str(valuelist[i])
         criterion = criterion + ' x['+str(columnlist[i])+']=='+critval+' or'
     criterion = criterion[0:-2]         # remove the "or" after the last crit
-    function = 'filter(lambda x: '+criterion+',listoflists)'
+    function = 'list(filter(lambda x: '+criterion+',listoflists))'
     lines = eval(function)
     return lines
 
@@ -464,7 +485,7 @@ Usage:   list2string (inlist,delimit=' ')
 Returns: the string created from inlist
 """
     stringlist = list(map(makestr,inlist))
-    return string.join(stringlist,delimit)
+    return delimit.join(stringlist)
 
 
 def makelol(inlist):
@@ -583,6 +604,8 @@ to None (meaning all columns are recoded).
 Usage:   recode (inlist,listmap,cols=None)  cols=recode cols, listmap=2D list
 Returns: inlist with the appropriate values replaced with new ones
 """
+    if _fast_table(inlist):
+        return fasttable.recode(inlist,listmap,cols)
     lst = copy.deepcopy(inlist)
     if cols != None:
         if type(cols) not in [ListType,TupleType]:
@@ -596,7 +619,7 @@ Returns: inlist with the appropriate values replaced with new ones
                     pass
     else:
         for row in range(len(lst)):
-            for col in range(len(lst)):
+            for col in range(len(lst[row])):
                 try:
                     idx = colex(listmap,0).index(lst[row][col])
                     lst[row][col] = listmap[idx][1]
@@ -645,6 +668,8 @@ sortcols.
 Usage:   sortby(listoflists,sortcols)
 Returns: sorted list, unchanged column ordering
 """
+    if _fast_table(listoflists) and type(sortcols) != StringType:
+        return fasttable.sortby(listoflists,sortcols)
     newlist = abut(colex(listoflists,sortcols),listoflists)
     newlist.sort()
     try:
@@ -665,6 +690,8 @@ compared).
 Usage:   unique (inlist)
 Returns: the unique elements (or rows) in inlist
 """
+    if _fast_table(inlist):
+        return fasttable.unique(inlist)
     uniques = []
     for item in inlist:
         if item not in uniques:
@@ -1064,5 +1091,20 @@ Usage:   aunique (inarray)
         dups = N.array(dups)
     return dups
 
+ from . import fasttable     # linear-time versions of some list functions
+
+ def use_fast_tables(rows=1000):
+    """
+Uses the NumPy versions in fasttable.py of the table functions in
+fasttable.FUNCTIONS for lists of at least rows rows (by default 1000), or
+the list functions for any size if rows=None.
+
+Usage:   use_fast_tables(rows=1000)
+"""
+    global FAST_TABLE_ROWS
+    FAST_TABLE_ROWS = rows
+
+ use_fast_tables()
+
 except ImportError:    # IF NUMERIC ISN'T AVAILABLE, SKIP ALL arrayfuncs
  pass
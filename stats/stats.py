@@ -224,9 +224,13 @@ SUPPORT FUNCTIONS:  writecc
 ##              changed name of skewness and askewness to skew and askew
 ##              fixed (a)histogram (which sometimes counted points <lowerlimit)
 
-import pstat               # required 3rd party module
+from . import pstat        # required 3rd party module
 import math, string, copy  # required python modules
 from types import *
+try:
+    from types import ListType, TupleType, IntType, FloatType
+except ImportError:        # python 3
+    ListType, TupleType, IntType, FloatType = list, tuple, int, float
 
 __version__ = 0.6
 
@@ -1581,8 +1585,8 @@ Returns: F value, one-tailed p-value
     bign = len(alldata)
     sstot = ass(alldata)-(asquare_of_sums(alldata)/float(bign))
     ssbn = 0
-    for list in lists:
-        ssbn = ssbn + asquare_of_sums(N.array(list))/float(len(list))
+    for group in lists:
+        ssbn = ssbn + asquare_of_sums(N.array(group))/float(len(group))
     ssbn = ssbn - (asquare_of_sums(alldata)/float(bign))
     sswn = sstot-ssbn
     dfbn = a-1
@@ -1758,7 +1762,7 @@ Returns: sorted-inlist, sorting-index-vector (for original list)
     n = len(inlist)
     svec = copy.deepcopy(inlist)
     ivec = list(range(n))
-    gap = n/2   # integer division needed
+    gap = n//2   # integer division needed
     while gap >0:
         for i in range(gap,n):
             for j in range(i-gap,-1,-gap):
@@ -1769,7 +1773,7 @@ Returns: sorted-inlist, sorting-index-vector (for original list)
                     itemp       = ivec[j]
                     ivec[j]     = ivec[j+gap]
                     ivec[j+gap] = itemp
-        gap = gap / 2  # integer division needed
+        gap = gap // 2  # integer division needed
 # svec is now sorted inlist, and ivec has the order svec[i] = vec[ivec[i]]
     return svec, ivec
 
@@ -1996,6 +2000,7 @@ findwithin = Dispatch ( (lfindwithin, (ListType, TupleType)), )
 try:                         # DEFINE THESE *ONLY* IF NUMERIC IS AVAILABLE
  import numpy as N
  import numpy.linalg as LA
+ from . import fast          # vectorised versions of some list functions
 
 
 #####################################
@@ -2015,7 +2020,7 @@ inarray, with only 1 'level' per dim that was collapsed over.
 Usage:   ageometricmean(inarray,dimension=None,keepdims=0)
 Returns: geometric mean computed over dim(s) listed in dimension
 """
-    inarray = N.array(inarray,N.float_)
+    inarray = N.array(inarray,N.float64)
     if dimension == None:
         inarray = N.ravel(inarray)
         size = len(inarray)
@@ -2033,7 +2038,7 @@ Returns: geometric mean computed over dim(s) listed in dimension
         dims = list(dimension)
         dims.sort()
         dims.reverse()
-        size = N.array(N.multiply.reduce(N.take(inarray.shape,dims)),N.float_)
+        size = N.array(N.multiply.reduce(N.take(inarray.shape,dims)),N.float64)
         mult = N.power(inarray,1.0/size)
         for dim in dims:
             mult = N.multiply.reduce(mult,dim)
@@ -2058,7 +2063,7 @@ inarray, with only 1 'level' per dim that was collapsed over.
 Usage:   aharmonicmean(inarray,dimension=None,keepdims=0)
 Returns: harmonic mean computed over dim(s) in dimension
 """
-    inarray = inarray.astype(N.float_)
+    inarray = inarray.astype(N.float64)
     if dimension == None:
         inarray = N.ravel(inarray)
         size = len(inarray)
@@ -2087,7 +2092,7 @@ Returns: harmonic mean computed over dim(s) in dimension
         else:
             idx[0] = -1
             loopcap = N.array(tinarray.shape[0:len(nondims)]) -1
-            s = N.zeros(loopcap+1,N.float_)
+            s = N.zeros(loopcap+1,N.float64)
             while incr(idx,loopcap) != -1:
                 s[idx] = asum(1.0/tinarray[idx])
             size = N.multiply.reduce(N.take(inarray.shape,dims))
@@ -2113,7 +2118,7 @@ Usage:   amean(inarray,dimension=None,keepdims=0)
 Returns: arithematic mean calculated over dim(s) in dimension
 """
     if inarray.dtype in [N.int_, N.short,N.ubyte]:
-        inarray = inarray.astype(N.float_)
+        inarray = inarray.astype(N.float64)
     if dimension == None:
         inarray = N.ravel(inarray)
         sum = N.add.reduce(inarray)
@@ -2132,7 +2137,7 @@ Returns: arithematic mean calculated over dim(s) in dimension
         sum = inarray *1.0
         for dim in dims:
             sum = N.add.reduce(sum,dim)
-        denom = N.array(N.multiply.reduce(N.take(inarray.shape,dims)),N.float_)
+        denom = N.array(N.multiply.reduce(N.take(inarray.shape,dims)),N.float64)
         if keepdims == 1:
             shp = list(inarray.shape)
             for dim in dims:
@@ -2229,7 +2234,7 @@ inclusive list/tuple determines whether the lower and upper limiting bounds
 Usage:   atmean(a,limits=None,inclusive=(1,1))
 """
      if a.dtype in [N.int_, N.short,N.ubyte]:
-         a = a.astype(N.float_)
+         a = a.astype(N.float64)
      if limits == None:
          return mean(a)
      assert type(limits) in [ListType,TupleType,N.ndarray], "Wrong type for limits in atmean"
@@ -2261,7 +2266,7 @@ closed/inclusive (1). ASSUMES A FLAT ARRAY (OR ELSE PREFLATTENS).
 
 Usage:   atvar(a,limits=None,inclusive=(1,1))
 """
-     a = a.astype(N.float_)
+     a = a.astype(N.float64)
      if limits == None or limits == [None,None]:
          return avar(a)
      assert type(limits) in [ListType,TupleType,N.ndarray], "Wrong type for limits in atvar"
@@ -2681,12 +2686,12 @@ Returns: transformed data for use in an ANOVA
 """
     TINY = 1e-10
     k = len(args)
-    n = N.zeros(k,N.float_)
-    v = N.zeros(k,N.float_)
-    m = N.zeros(k,N.float_)
+    n = N.zeros(k,N.float64)
+    v = N.zeros(k,N.float64)
+    m = N.zeros(k,N.float64)
     nargs = []
     for i in range(k):
-        nargs.append(args[i].astype(N.float_))
+        nargs.append(args[i].astype(N.float64))
         n[i] = float(len(nargs[i]))
         v[i] = var(nargs[i])
         m[i] = mean(nargs[i])
@@ -3279,8 +3284,8 @@ Returns: slope, intercept, r, two-tailed prob, sterr-of-the-estimate, n
     else:
         x = args[0]
         y = args[1]
-    x = x.astype(N.float_)
-    y = y.astype(N.float_)
+    x = x.astype(N.float64)
+    y = y.astype(N.float64)
     n = len(x)
     xmean = amean(x)
     ymean = amean(y,0)
@@ -3405,8 +3410,8 @@ Returns: an array of t-values with the shape of pval
     pval = N.array(pval)
     signs = N.sign(pval)
     pval = abs(pval)
-    t = N.ones(pval.shape,N.float_)*50
-    step = N.ones(pval.shape,N.float_)*25
+    t = N.ones(pval.shape,N.float64)*50
+    step = N.ones(pval.shape,N.float64)*25
     print("Initial ap2t() prob calc")
     prob = abetai(0.5*df,0.5,float(df)/(df+t*t))
     print('ap2t() iter: ', end=' ')
@@ -3485,8 +3490,8 @@ Returns: chisquare-statistic, associated p-value
 
     k = len(f_obs)
     if f_exp == None:
-        f_exp = N.array([sum(f_obs)/float(k)] * len(f_obs),N.float_)
-    f_exp = f_exp.astype(N.float_)
+        f_exp = N.array([sum(f_obs)/float(k)] * len(f_obs),N.float64)
+    f_exp = f_exp.astype(N.float64)
     chisq = N.add.reduce((f_obs-f_exp)**2 / f_exp)
     return chisq, achisqprob(chisq, k-1)
 
@@ -3502,13 +3507,13 @@ Returns: KS D-value, p-value
 """
     j1 = 0    # N.zeros(data1.shape[1:]) TRIED TO MAKE THIS UFUNC-LIKE
     j2 = 0    # N.zeros(data2.shape[1:])
-    fn1 = 0.0 # N.zeros(data1.shape[1:],N.float_)
-    fn2 = 0.0 # N.zeros(data2.shape[1:],N.float_)
+    fn1 = 0.0 # N.zeros(data1.shape[1:],N.float64)
+    fn2 = 0.0 # N.zeros(data2.shape[1:],N.float64)
     n1 = data1.shape[0]
     n2 = data2.shape[0]
     en1 = n1*1
     en2 = n2*1
-    d = N.zeros(data1.shape[1:],N.float_)
+    d = N.zeros(data1.shape[1:],N.float64)
     data1 = N.sort(data1,0)
     data2 = N.sort(data2,0)
     while j1 < n1 and j2 < n2:
@@ -3691,7 +3696,7 @@ Returns: chi-square statistic, associated p-value
         raise ValueError('\nLess than 3 levels.  Friedman test not appropriate.\n')
     n = len(args[0])
     data = pstat.aabut(*args)
-    data = data.astype(N.float_)
+    data = data.astype(N.float64)
     for i in range(len(data)):
         data[i] = arankdata(data[i])
     ssbn = asum(asum(args,1)**2)
@@ -3724,7 +3729,7 @@ Usage:   achisqprob(chisq,df)    chisq=chisquare stat., df=degrees of freedom
         chisq = N.array([chisq])
     if df < 1:
         return N.ones(chisq.shape,N.float)
-    probs = N.zeros(chisq.shape,N.float_)
+    probs = N.zeros(chisq.shape,N.float64)
     probs = N.where(N.less_equal(chisq,0),1.0,probs)  # set prob=1 for chisq<0
     a = 0.5 * chisq
     if df > 1:
@@ -3740,17 +3745,17 @@ Usage:   achisqprob(chisq,df)    chisq=chisquare stat., df=degrees of freedom
     if (df > 2):
         chisq = 0.5 * (df - 1.0)
         if even:
-            z = N.ones(probs.shape,N.float_)
+            z = N.ones(probs.shape,N.float64)
         else:
-            z = 0.5 *N.ones(probs.shape,N.float_)
+            z = 0.5 *N.ones(probs.shape,N.float64)
         if even:
-            e = N.zeros(probs.shape,N.float_)
+            e = N.zeros(probs.shape,N.float64)
         else:
-            e = N.log(N.sqrt(N.pi)) *N.ones(probs.shape,N.float_)
+            e = N.log(N.sqrt(N.pi)) *N.ones(probs.shape,N.float64)
         c = N.log(a)
         mask = N.zeros(probs.shape)
         a_big = N.greater(a,BIG)
-        a_big_frozen = -1 *N.ones(probs.shape,N.float_)
+        a_big_frozen = -1 *N.ones(probs.shape,N.float64)
         totalelements = N.multiply.reduce(N.array(probs.shape))
         while asum(mask)!=totalelements:
             e = N.log(z) + e
@@ -3761,16 +3766,16 @@ Usage:   achisqprob(chisq,df)    chisq=chisquare stat., df=degrees of freedom
             a_big_frozen = N.where(newmask*N.equal(mask,0)*a_big, s, a_big_frozen)
             mask = N.clip(newmask+mask,0,1)
         if even:
-            z = N.ones(probs.shape,N.float_)
-            e = N.ones(probs.shape,N.float_)
+            z = N.ones(probs.shape,N.float64)
+            e = N.ones(probs.shape,N.float64)
         else:
-            z = 0.5 *N.ones(probs.shape,N.float_)
-            e = 1.0 / N.sqrt(N.pi) / N.sqrt(a) * N.ones(probs.shape,N.float_)
+            z = 0.5 *N.ones(probs.shape,N.float64)
+            e = 1.0 / N.sqrt(N.pi) / N.sqrt(a) * N.ones(probs.shape,N.float64)
         c = 0.0
         mask = N.zeros(probs.shape)
-        a_notbig_frozen = -1 *N.ones(probs.shape,N.float_)
+        a_notbig_frozen = -1 *N.ones(probs.shape,N.float64)
         while asum(mask)!=totalelements:
-            e = e * (a/z.astype(N.float_))
+            e = e * (a/z.astype(N.float64))
             c = c + e
             z = z + 1.0
 #            print '#2', z, e, c, s, c*y+s2
@@ -3830,7 +3835,7 @@ Usage:   azprob(z)    where z is a z-value
         return x
 
     Z_MAX = 6.0    # maximum meaningful z-value
-    x = N.zeros(z.shape,N.float_) # initialize
+    x = N.zeros(z.shape,N.float64) # initialize
     y = 0.5 * N.fabs(z)
     x = N.where(N.less(y,1.0),wfunc(y*y),yfunc(y-2.0)) # get x's
     x = N.where(N.greater(y,Z_MAX*0.5),1.0,x)          # kill those with big Z
@@ -3854,9 +3859,9 @@ Usage:   aksprob(alam)
          alam = N.array(alam,N.float64)
          arrayflag = 1
      mask = N.zeros(alam.shape)
-     fac = 2.0 *N.ones(alam.shape,N.float_)
-     sum = N.zeros(alam.shape,N.float_)
-     termbf = N.zeros(alam.shape,N.float_)
+     fac = 2.0 *N.ones(alam.shape,N.float64)
+     sum = N.zeros(alam.shape,N.float64)
+     termbf = N.zeros(alam.shape,N.float64)
      a2 = N.array(-2.0*alam*alam,N.float64)
      totalelements = N.multiply.reduce(N.array(mask.shape))
      for j in range(1,201):
@@ -3907,7 +3912,7 @@ Usage:   abetacf(a,b,x,verbose=1)
 
     arrayflag = 1
     if type(x) == N.ndarray:
-        frozen = N.ones(x.shape,N.float_) *-1  #start out w/ -1s, should replace all
+        frozen = N.ones(x.shape,N.float64) *-1  #start out w/ -1s, should replace all
     else:
         arrayflag = 0
         frozen = N.array([-1])
@@ -4158,7 +4163,7 @@ Usage:   asum(a, dimension=None, keepdims=0)
 Returns: array summed along 'dimension'(s), same _number_ of dims if keepdims=1
 """
      if type(a) == N.ndarray and a.dtype in [N.int_, N.short, N.ubyte]:
-         a = a.astype(N.float_)
+         a = a.astype(N.float64)
      if dimension == None:
          s = N.sum(N.ravel(a))
      elif type(dimension) in [IntType,FloatType]:
@@ -4256,7 +4261,7 @@ Returns: the square of the sum over dim(s) in dimension
         dimension = 0
     s = asum(inarray,dimension,keepdims)
     if type(s) == N.ndarray:
-        return s.astype(N.float_)*s
+        return s.astype(N.float64)*s
     else:
         return float(s)*s
 
@@ -4288,7 +4293,7 @@ Returns: sorted-inarray, sorting-index-vector (for original array)
     n = len(inarray)
     svec = inarray *1.0
     ivec = list(range(n))
-    gap = n/2   # integer division needed
+    gap = n//2   # integer division needed
     while gap >0:
         for i in range(gap,n):
             for j in range(i-gap,-1,-gap):
@@ -4299,7 +4304,7 @@ Returns: sorted-inarray, sorting-index-vector (for original array)
                     itemp       = ivec[j]
                     ivec[j]     = ivec[j+gap]
                     ivec[j+gap] = itemp
-        gap = gap / 2  # integer division needed
+        gap = gap // 2  # integer division needed
 #    svec is now sorted input vector, ivec has the order svec[i] = vec[ivec[i]]
     return svec, ivec
 
@@ -4316,7 +4321,7 @@ Returns: array of length equal to inarray, containing rank scores
     svec, ivec = ashellsort(inarray)
     sumranks = 0
     dupcount = 0
-    newarray = N.zeros(n,N.float_)
+    newarray = N.zeros(n,N.float64)
     for i in range(n):
         sumranks = sumranks + i
         dupcount = dupcount + 1
@@ -4518,6 +4523,24 @@ Usage:   afindwithin(data)     data in |Stat format
  findwithin = Dispatch ( (lfindwithin, (ListType, TupleType)),
                          (afindwithin, (N.ndarray,)) )
 
+ def use_fast_functions(enabled=1):
+    """
+Dispatches list and tuple arguments of the functions in fast.FUNCTIONS to
+their NumPy versions in fast.py (the default when NumPy is available), or
+back to the list functions if enabled=0.
+
+Usage:   use_fast_functions(enabled=1)
+"""
+    for name in fast.FUNCTIONS:
+        if enabled:
+            func = getattr(fast, name)
+        else:
+            func = globals()['l' + name]
+        for t in (ListType, TupleType):
+            globals()[name]._dispatch[t] = func
+
+ use_fast_functions()
+
 ######################  END OF NUMERIC FUNCTION BLOCK  #####################
 
 ######################  END OF STATISTICAL FUNCTIONS  ######################
@@ -8,6 +8,7 @@ from django.db import models
 from twilio.rest import TwilioRestClient
 import twilio
 from ask.models import Asker
+from signalbox.utilities.phone import normalise_phone, reversed_digits
 
 
 class TwilioNumber(models.Model):
@@ -21,9 +22,30 @@ class TwilioNumber(models.Model):
         blank to populate automatically from the account details""")
     answerphone_script = models.ForeignKey(Asker, blank=True, null=True)
 
+    # maintained by save(); see signalbox.utilities.phone
+    phone_number_e164 = models.CharField(max_length=20, blank=True, null=True, db_index=True,
+        editable=False)
+    phone_number_reversed = models.CharField(max_length=20, blank=True, null=True, db_index=True,
+        editable=False)
+
+    def set_normalised_numbers(self):
+        self.phone_number_e164 = normalise_phone(self.phone_number)
+        self.phone_number_reversed = reversed_digits(self.phone_number_e164)
+
     def __unicode__(self):
         return self.phone_number
 
+    @classmethod
+    def for_number(cls, numberstring):
+        """Return the TwilioNumber for an international number, with or without the leading +.
+
+        Twilio always sends numbers in international form, so this is an
+        indexed equality lookup on the E.164 column.
+        """
+
+        digits = "".join(c for c in numberstring if c.isdigit())
+        return cls.objects.get(phone_number_e164="+" + digits)
+
     def number(self):
         return self.phone_number
 
@@ -60,6 +82,7 @@ class TwilioNumber(models.Model):
 
         if not TwilioNumber.objects.filter(is_default_account=True).count():
             self.is_default_account = True
+        self.set_normalised_numbers()
         super(TwilioNumber, self).save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
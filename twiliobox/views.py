@@ -8,15 +8,17 @@ except:
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
+from django.db import transaction
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from .question_methods import say_or_play_phrase, reply_to_twilio
 
-from signalbox.models import Observation, Reply, Answer, TextMessageCallback
+from signalbox.models import Observation, Reply, Answer, PendingTextMessageCallback
 from signalbox.utilities.djangobits import conditional_decorator
 from signalbox.utilities.more_itertools import first
 from signalbox.utils import current_site_url
+from signalbox.wide import record_answer
 from twilio import twiml
 from twiliobox.exceptions import TwilioBoxException
 from twiliobox.models import TwilioNumber
@@ -87,13 +89,14 @@ def save_answer(reply, question, querydict):
     answer.answer = user_answer
     answer.meta = extra_json,
     answer.choices = question and question.choices_as_json()
-    answer.save(force_save=True)  # force save because answer may be readonly if versioning off
+    with transaction.atomic():
+        answer.save(force_save=True)  # force save because answer may be readonly if versioning off
+        record_answer(answer)
     return answer
 
 
 def _lookup_asker_for_inbound_number(numberstring):
-    number = TwilioNumber.objects.get(
-        phone_number__icontains=numberstring.replace("+", ""))
+    number = TwilioNumber.for_number(numberstring)
     return number.answerphone_script
 
 
@@ -186,9 +189,10 @@ def sms_callback(request):
 
     sid = get_from_post_or_get(request, 'SmsSid')
 
-    callbackrecord, created = TextMessageCallback.objects.get_or_create(sid=sid, post=json.dumps(request.POST))
-    callbackrecord.save()
-    return HttpResponse(str(callbackrecord))
+    # queued for signalbox.callbacks.ingest_text_message_callbacks, to answer Twilio quickly
+    PendingTextMessageCallback.objects.create(sid=sid,
+        status=get_from_post_or_get(request, 'SmsStatus'), post=json.dumps(request.POST.dict()))
+    return HttpResponse(sid)
 
 
 @csrf_exempt
@@ -200,7 +204,7 @@ def answerphone(request):
     blob = request.POST or request.GET
     incoming_data = {i: blob.get(i, None) for i in call_data_fields}
     incoming = urllib.parse.unquote(incoming_data['Called']).replace("+", "")
-    twilio_number = TwilioNumber.objects.get(phone_number__icontains=incoming)
+    twilio_number = TwilioNumber.for_number(incoming)
     asker = twilio_number.answerphone_script
 
     reply = Reply(